@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   bench_crontab.py
+@Time    :   2026/10/19 11:02:47
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Micro-benchmark of the compiled cron engine against the legacy one
+'''
+
+
+import timeit
+
+from datetime import datetime, timedelta
+from itertools import product
+from typing import Union
+
+from runner import benchmark
+
+from utils.crontab import compile_cron, get_next_run, parse_cron_field
+
+
+EXPRESSIONS = [
+    "0 0 0 * * *",          # Daily
+    "*/15 * * * * *",       # Dense
+    "0 30 9 * * 1-5",       # Working days
+    "0 0 0 13 * 5",         # Friday or 13th
+    "0 0 12 29 2 *",        # Leap day
+]
+
+NOW = datetime(2024, 3, 1, 12, 0, 0)
+
+
+def legacy_get_next_run(cron_expression: str, now: datetime) -> Union[datetime, None]:
+    """The day walking implementation used before `CronSchedule`."""
+    second_field, minute_field, hour_field, \
+        day_field, month_field, weekday_field = cron_expression.split()
+
+    seconds = parse_cron_field(second_field, 0, 59)
+    minutes = parse_cron_field(minute_field, 0, 59)
+    hours = parse_cron_field(hour_field, 0, 23)
+    days = parse_cron_field(day_field, 1, 31)
+    months = parse_cron_field(month_field, 1, 12)
+    weekdays = parse_cron_field(weekday_field, 0, 6)
+
+    for day_offset in range(0, 365):
+        potential_time = now + timedelta(days=day_offset)
+
+        if (
+            potential_time.month in months
+            and potential_time.day in days
+            and ((potential_time.weekday() + 1) % 7) in weekdays
+        ):
+
+            for hour, minute, second in product(hours, minutes, seconds):
+                next_time = potential_time.replace(hour=hour, minute=minute, second=second, microsecond=0)
+                if (next_time > now):
+                    return next_time
+
+    return None
+
+
+@benchmark("cron.get_next_run", ops=5000, group="cron")
+def cron_get_next_run(workdir: str, ops: int):
+    def run():
+        for index in range(ops):
+            get_next_run(EXPRESSIONS[index % len(EXPRESSIONS)], NOW)
+
+    yield run
+
+
+def measure(func, number: int) -> float:
+    """Best of 3 runs, microseconds per call."""
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def main() -> None:
+    print(f"{'EXPRESSION':<20}{'LEGACY(us)':>14}{'COMPILED(us)':>14}{'SPEEDUP':>10}")
+
+    for expression in EXPRESSIONS:
+        legacy = measure(lambda: legacy_get_next_run(expression, NOW), 20)
+        compiled = measure(lambda: compile_cron(expression).next_fire(NOW), 2000)
+
+        print(f"{expression:<20}{legacy:>14.2f}{compiled:>14.2f}{legacy / compiled:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   bench_database.py
+@Time    :   2026/10/19 16:41:27
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Benchmarks of the database layer
+'''
+
+
+import os
+import uuid
+
+from runner import BenchmarkSkipped, benchmark, get_setting
+
+from database import IDBCommon, MySQL, SQLite
+from database.sqlite import ConnectionRegistry
+
+
+ROW = {'id': 0, 'name': "name", 'price': 1.5, 'created': "2024-10-25 12:00:00"}
+
+SELECT_ROWS = 1000
+
+
+def open_sqlite(workdir: str) -> SQLite:
+    db = SQLite(workdir)
+    db.create_database("bench")
+    db.switch_database("bench")
+
+    return db
+
+
+def open_mysql() -> MySQL:
+    if (os.environ.get("TSDAP_BENCH_MYSQL") != "1"):
+        raise BenchmarkSkipped("use --mysql")
+
+    try:
+        db = MySQL(
+            get_setting("Spiders.MYSQL_HOST"),
+            get_setting("Spiders.MYSQL_PORT"),
+            get_setting("Spiders.MYSQL_USER"),
+            get_setting("Spiders.MYSQL_PASS")
+        )
+
+    except Exception as e:
+        raise BenchmarkSkipped(f"no MySQL server ({e})")
+
+    database_name = f"tsdap_bench_{uuid.uuid4().hex[:8]}"
+    db.create_database(database_name)
+    db.switch_database(database_name)
+
+    return db
+
+
+def close_sqlite(workdir: str) -> None:
+    ConnectionRegistry.close(workdir, "bench")
+
+
+def sqlite_benchmark(workdir: str, func, ops: int):
+    try:
+        yield func(open_sqlite(workdir), ops)
+
+    finally:
+        close_sqlite(workdir)
+
+
+def make_row(index: int) -> dict:
+    return dict(ROW, id=index)
+
+
+def fill_table(db: IDBCommon, rows: int) -> None:
+    with db.transaction() as transaction:
+        for index in range(rows):
+            transaction.insert("items", make_row(index))
+
+
+def insert_single(db: IDBCommon, ops: int):
+    db.create_table("items", list(ROW.items()))
+
+    def run():
+        for index in range(ops):
+            db.insert("items", make_row(index))
+
+    return run
+
+
+def insert_transaction(db: IDBCommon, ops: int):
+    db.create_table("items", list(ROW.items()))
+
+    def run():
+        fill_table(db, ops)
+
+    return run
+
+
+def select_all(db: IDBCommon, ops: int):
+    db.create_table("items", list(ROW.items()))
+    fill_table(db, SELECT_ROWS)
+
+    def run():
+        for _ in range(ops):
+            db.select("items", "")
+
+    return run
+
+
+def select_where(db: IDBCommon, ops: int):
+    db.create_table("items", list(ROW.items()))
+    fill_table(db, SELECT_ROWS)
+
+    def run():
+        for index in range(ops):
+            db.select("items", f"WHERE id={index % SELECT_ROWS}")
+
+    return run
+
+
+@benchmark("sqlite.insert.single", ops=300, group="sqlite")
+def sqlite_insert_single(workdir: str, ops: int):
+    yield from sqlite_benchmark(workdir, insert_single, ops)
+
+
+@benchmark("sqlite.insert.transaction", ops=3000, group="sqlite")
+def sqlite_insert_transaction(workdir: str, ops: int):
+    yield from sqlite_benchmark(workdir, insert_transaction, ops)
+
+
+@benchmark("sqlite.select.all", ops=50, group="sqlite")
+def sqlite_select_all(workdir: str, ops: int):
+    yield from sqlite_benchmark(workdir, select_all, ops)
+
+
+@benchmark("sqlite.select.where", ops=500, group="sqlite")
+def sqlite_select_where(workdir: str, ops: int):
+    yield from sqlite_benchmark(workdir, select_where, ops)
+
+
+@benchmark("sqlite.execute.raw_insert", ops=3000, group="sqlite")
+def sqlite_execute_raw_insert(workdir: str, ops: int):
+    """Same rows as `sqlite.insert.transaction`, without any decorator."""
+    db = open_sqlite(workdir)
+    db.create_table("items", list(ROW.items()))
+
+    columns = ",".join(ROW.keys())
+    holders = ",".join("?" for _ in ROW)
+    sql = f"INSERT INTO `items` ({columns}) VALUES ({holders})"
+
+    def run():
+        with db.transaction() as transaction:
+            for index in range(ops):
+                transaction.execute(sql, tuple(make_row(index).values()))
+
+    yield run
+    close_sqlite(workdir)
+
+
+@benchmark("sqlite.decorators.insert", ops=20000, group="sqlite")
+def sqlite_decorators_insert(workdir: str, ops: int):
+    """`insert` with a no-op `execute`, only the checks and the SQL formatting are left."""
+    db = open_sqlite(workdir)
+    db.create_table("items", list(ROW.items()))
+    db.insert("items", make_row(0))
+
+    db.execute = lambda sql, data=(): (True, 0, ("name",), [("items",)], None)
+
+    def run():
+        for index in range(ops):
+            db.insert("items", make_row(index))
+
+    yield run
+    close_sqlite(workdir)
+
+
+@benchmark("database.check_datatype", ops=50000, group="sqlite")
+def database_check_datatype(workdir: str, ops: int):
+    db = open_sqlite(workdir)
+    db.create_table("items", list(ROW.items()))
+    db.insert("items", make_row(0))
+
+    row = make_row(1)
+
+    def run():
+        for _ in range(ops):
+            db._check_datatype_correct("items", row)
+
+    yield run
+    close_sqlite(workdir)
+
+
+def mysql_benchmark(func, ops: int):
+    db = open_mysql()
+    try:
+        yield func(db, ops)
+
+    finally:
+        db.drop_database(db._curr_database_name)
+
+
+@benchmark("mysql.insert.single", ops=300, group="mysql")
+def mysql_insert_single(workdir: str, ops: int):
+    yield from mysql_benchmark(insert_single, ops)
+
+
+@benchmark("mysql.insert.transaction", ops=3000, group="mysql")
+def mysql_insert_transaction(workdir: str, ops: int):
+    yield from mysql_benchmark(insert_transaction, ops)
+
+
+@benchmark("mysql.select.all", ops=50, group="mysql")
+def mysql_select_all(workdir: str, ops: int):
+    yield from mysql_benchmark(select_all, ops)
+
+
+@benchmark("mysql.select.where", ops=500, group="mysql")
+def mysql_select_where(workdir: str, ops: int):
+    yield from mysql_benchmark(select_where, ops)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   bench_ingest.py
+@Time    :   2026/10/19 16:58:40
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Benchmarks of the spider ingest path
+'''
+
+
+import logging
+import os
+
+from multiprocessing import Manager
+
+from runner import benchmark, init_runtime
+
+from database.sqlite import ConnectionRegistry
+from runtime import RuntimeContext as ctx
+from spider import ISpider, SpiderContext
+from spider.common import SpiderShares
+from spider.control import ControlSlots
+from spider.context import DatabaseLogHandler, SpiderVirtualIO
+from spider.spider import spider_stop_checkpoint
+
+
+ROW = {'id': 0, 'name': "name", 'price': 1.5, 'created': "2024-10-25 12:00:00"}
+
+WIDE_ROW = dict({'id': 0}, **{f"c{index}": f"value {index}" for index in range(40)})
+
+
+class BenchSpider(ISpider):
+    def run(self) -> None:
+        pass
+
+    def unload(self) -> None:
+        pass
+
+
+def open_context(workdir: str, manager, ref_data: dict = ROW, is_daemon: bool = True) -> SpiderContext:
+    init_runtime()
+
+    spider_shares = SpiderShares(manager)
+    spider_shares.control.set(ControlSlots.DAEMON, is_daemon)
+    spider_shares.spider_db_dir.set(workdir)
+
+    context = SpiderContext(BenchSpider, "bench", spider_shares)
+    context._init_db_spider()
+    context._new_table("items", ref_data)
+
+    return context
+
+
+def close_context(workdir: str) -> None:
+    ConnectionRegistry.close(workdir, "bench")
+    ConnectionRegistry.close(os.path.join(workdir, "data"), "bench")
+
+
+def buffer_flush(workdir: str, ops: int, row: dict):
+    with Manager() as manager:
+        context = open_context(workdir, manager, row)
+        submit_queue = context._SpiderContext__submit_queue
+
+        def run():
+            for index in range(ops):
+                if (context.row_buffers.full()):
+                    submit_queue()
+
+                context._write_row("items", dict(row, id=index))
+
+            submit_queue()
+
+        yield run
+        close_context(workdir)
+
+
+@benchmark("context.queue_flush", ops=3000, group="ingest")
+def context_queue_flush(workdir: str, ops: int):
+    """Rows buffered by the context and flushed to the SQLite sink, one flush per full buffer."""
+    yield from buffer_flush(workdir, ops, ROW)
+
+
+@benchmark("context.queue_flush.wide", ops=3000, group="ingest")
+def context_queue_flush_wide(workdir: str, ops: int):
+    yield from buffer_flush(workdir, ops, WIDE_ROW)
+
+
+@benchmark("context.feed_dog", ops=2000, group="ingest")
+def context_feed_dog(workdir: str, ops: int):
+    """Watch dog feeding of a non-daemon spider, done by every checkpoint."""
+    with Manager() as manager:
+        context = open_context(workdir, manager, is_daemon=False)
+
+        def run():
+            for _ in range(ops):
+                context._feed_dog()
+
+        yield run
+        close_context(workdir)
+
+
+@benchmark("spider.checkpoint", ops=100000, group="ingest")
+def spider_checkpoint(workdir: str, ops: int):
+    """Stop checkpoint around a spider call, the stop flag read and the watch dog feeding."""
+    with Manager() as manager:
+        context = open_context(workdir, manager, is_daemon=False)
+
+        spider = BenchSpider()
+        spider._bind_context(context)
+        checkpoint = spider_stop_checkpoint(lambda spider: None)
+
+        def run():
+            for _ in range(ops):
+                checkpoint(spider)
+
+        yield run
+        close_context(workdir)
+
+
+@benchmark("context.log_handler", ops=2000, group="ingest")
+def context_log_handler(workdir: str, ops: int):
+    with Manager() as manager:
+        context = open_context(workdir, manager)
+
+        handler = DatabaseLogHandler(
+            lambda datetime, level, msg:
+                context.db_spider.insert('logs', {'DATETIME': datetime, 'LEVEL': level, 'MESSAGE': msg}),
+            SpiderVirtualIO(),
+            context.metrics
+        )
+        handler.setFormatter(logging.Formatter("[%(asctime)s][%(levelname)s] - %(message)s"))
+
+        logger = logging.getLogger("tsdap_bench")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        logger.addHandler(handler)
+
+        def run():
+            for index in range(ops):
+                logger.info("Crawled page %d", index)
+
+        yield run
+        logger.removeHandler(handler)
+        close_context(workdir)
+
+
+@benchmark("shares.ipc.get", ops=2000, group="ipc")
+def shares_ipc_get(workdir: str, ops: int):
+    """One flag read through the manager proxy, as the stop checkpoints did before the control block."""
+    with Manager() as manager:
+        spider_shares = SpiderShares(manager)
+
+        def run():
+            for _ in range(ops):
+                spider_shares.is_dog_trigger.get()
+
+        yield run
+
+
+@benchmark("shares.ipc.set", ops=2000, group="ipc")
+def shares_ipc_set(workdir: str, ops: int):
+    with Manager() as manager:
+        spider_shares = SpiderShares(manager)
+
+        def run():
+            for index in range(ops):
+                spider_shares.ret_code.set(index & 0x7F)
+
+        yield run
+
+
+@benchmark("runtime.get_global", ops=100000, group="ipc")
+def runtime_get_global(workdir: str, ops: int):
+    """Setting read from the snapshot of this process, then the unchanged check of the context loop."""
+    init_runtime()
+
+    def run():
+        for _ in range(ops):
+            ctx.multiprocess_get_global("Spiders.WATCH_DOG_MAX_TIME")
+            ctx.multiprocess_refresh()
+
+    yield run
+
+
+@benchmark("runtime.get_global.proxy", ops=2000, group="ipc")
+def runtime_get_global_proxy(workdir: str, ops: int):
+    """Setting read through the manager proxy, as every read did before the snapshot."""
+    init_runtime()
+
+    def run():
+        for _ in range(ops):
+            ctx._multiprocess_globals.get("Spiders.WATCH_DOG_MAX_TIME")
+
+    yield run
+
+
+@benchmark("shares.metrics.add", ops=100000, group="ipc")
+def shares_metrics_add(workdir: str, ops: int):
+    """Counter update in the raw shared block, for comparison with the proxies."""
+    with Manager() as manager:
+        metrics = SpiderShares(manager).metrics
+
+        def run():
+            for _ in range(ops):
+                metrics.add(0)
+
+        yield run
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   loadtest.py
+@Time    :   2026/10/19 17:20:13
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   End-to-end load harness, N synthetic containers against a local SQLite sink
+'''
+
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import zipfile
+
+from time import monotonic, perf_counter, sleep, time
+from typing import Any, Callable, Dict, List, Optional
+
+from runner import SRC_DIR
+
+from runtime import RuntimeContext as ctx
+from spider import SpiderManager
+from spider.metrics import ProcSampler, percentile
+from utils.files import covert_size_to_str
+
+
+PACKAGE_NAME = "loadgen"
+PACKAGE_TAG = "1.0"
+
+# Rows carry their creation time, the sink lag is measured against it
+SPIDER_SOURCE = '''
+import os
+import time
+
+from spider import ISpider
+
+
+class LoadGenerator(ISpider):
+    def run(self) -> None:
+        rate = float(os.environ["LOADGEN_ROWS_PER_SEC"])
+        columns = int(os.environ["LOADGEN_COLUMNS"])
+        text = "x" * int(os.environ["LOADGEN_TEXT_SIZE"])
+
+        row = {'seq': 0, 'ts': time.time()}
+        row.update({f"c{index}": text for index in range(columns)})
+        self.new_table("rows", row)
+
+        interval = 1 / rate if rate > 0 else 0
+        next_time = time.monotonic()
+        seq = 0
+
+        while True:
+            seq += 1
+            self.write_data("rows", dict(row, seq=seq, ts=time.time()))
+
+            if (interval):
+                next_time += interval
+                delay = next_time - time.monotonic()
+                if (delay > 0):
+                    time.sleep(delay)
+
+    def unload(self) -> None:
+        pass
+'''
+
+
+def build_package(output_dir: str) -> str:
+    """Write the synthetic spider package, returns the zip path."""
+    compose = {
+        'infos': {'name': PACKAGE_NAME, 'tag': PACKAGE_TAG, 'desc': "Synthetic load generator", 'author': "loadtest"},
+        'runtimes': {'entry': "loadgen/main", 'daemon': True, 'envs': {}, 'dependencies': []},
+        'schedules': {'cron': "0 0 0 * * *"}
+    }
+
+    pkg_path = os.path.join(output_dir, f"{PACKAGE_NAME}.zip")
+    with zipfile.ZipFile(pkg_path, 'w') as pkg:
+        pkg.writestr("compose.json", json.dumps(compose))
+        pkg.writestr("loadgen/__init__.py", "")
+        pkg.writestr("loadgen/main.py", SPIDER_SOURCE)
+
+    return pkg_path
+
+
+def init_runtime(workspace: str) -> None:
+    ctx.initialize()
+
+    with open(os.path.join(SRC_DIR, "configs", "settings.json")) as fp:
+        configs = json.load(fp)
+
+    configs["Runtimes"]["DB_ROOT_DIR"] = os.path.join(workspace, "db")
+    configs["Spiders"]["PACKAGE_ROOT_DIR"] = os.path.join(workspace, "packages")
+    configs["Spiders"]["CONTAINER_ROOT_DIR"] = os.path.join(workspace, "containers")
+    configs["Spiders"]["DATA_BACKEND"] = "SQLITE"
+
+    for key, value in configs["Runtimes"].items():
+        ctx.process_set_global(f"Runtimes.{key}", value)
+
+    for key, value in configs["Spiders"].items():
+        ctx.multiprocess_set_global(f"Spiders.{key}", value)
+
+    os.makedirs(os.path.join(workspace, "db", "spider"), exist_ok=True)
+    os.makedirs(configs["Spiders"]["PACKAGE_ROOT_DIR"], exist_ok=True)
+    os.makedirs(configs["Spiders"]["CONTAINER_ROOT_DIR"], exist_ok=True)
+
+
+def timed(func: Callable, *args, **kwargs) -> float:
+    """Seconds taken by a manager call, its console output is dropped."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = perf_counter()
+        func(*args, **kwargs)
+        return perf_counter() - start_time
+
+
+def read_sink_lag(data_db_path: str) -> Optional[float]:
+    """Seconds between now and the newest row visible in the sink."""
+    if (not os.path.isfile(data_db_path)):
+        return None
+
+    try:
+        with contextlib.closing(sqlite3.connect(f"file:{data_db_path}?mode=ro", uri=True, timeout=1)) as db:
+            newest = db.execute("SELECT MAX(ts) FROM rows").fetchone()[0]
+
+    except sqlite3.Error:
+        return None
+
+    return None if newest is None else time() - newest
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    values = sorted(values)
+    return {
+        'p50': percentile(values, 50),
+        'p99': percentile(values, 99),
+        'max': values[-1] if values else None
+    }
+
+
+def run_load(args: argparse.Namespace, workspace: str) -> Dict[str, Any]:
+    init_runtime(workspace)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = SpiderManager()
+        manager.load(build_package(workspace))
+
+    envs = {
+        'LOADGEN_ROWS_PER_SEC': str(args.rate),
+        'LOADGEN_COLUMNS': str(args.columns),
+        'LOADGEN_TEXT_SIZE': str(args.text_size)
+    }
+
+    names = [f"loadgen-{index}" for index in range(args.containers)]
+    run_latencies = [
+        timed(manager.run, f"{PACKAGE_NAME}:{PACKAGE_TAG}", name=name, daemon=True, envs=envs)
+        for name in names
+    ]
+
+    sleep(args.warmup)
+
+    with manager.spider_contexts_lock:
+        contexts = {
+            context['name']: (container_id, context['process'].pid, context['shares'].metrics)
+            for container_id, context in manager.spider_contexts.items()
+        }
+
+    sampler = ProcSampler()
+    for _, pid, _ in contexts.values():
+        sampler.sample(pid)
+
+    start_rows = {name: metrics.snapshot()['rows_written'] for name, (_, _, metrics) in contexts.items()}
+    start_time = monotonic()
+
+    cpu_samples: Dict[str, List[float]] = {name: [] for name in contexts}
+    rss_samples: Dict[str, List[int]] = {name: [] for name in contexts}
+    lag_samples: List[float] = []
+    responsiveness: List[float] = []
+
+    while monotonic() - start_time < args.duration:
+        sleep(args.interval)
+
+        # Manager responsiveness, while every container is ingesting
+        responsiveness.append(timed(manager.ps, is_all=True))
+
+        for name, (container_id, pid, _) in contexts.items():
+            usage = sampler.sample(pid)
+            if (usage is not None):
+                if (usage['cpu_percent'] is not None):
+                    cpu_samples[name].append(usage['cpu_percent'])
+                rss_samples[name].append(usage['rss'])
+
+            lag = read_sink_lag(os.path.join(
+                workspace, "containers", container_id, "db", "data", f"{name}.db"
+            ))
+            if (lag is not None):
+                lag_samples.append(lag)
+
+    elapsed = monotonic() - start_time
+    rows = {
+        name: metrics.snapshot()['rows_written'] - start_rows[name]
+        for name, (_, _, metrics) in contexts.items()
+    }
+    flush_p99 = [
+        metrics.snapshot()['flush_p99'] for _, _, metrics in contexts.values()
+        if metrics.snapshot()['flush_p99'] is not None
+    ]
+
+    stop_latencies = [timed(manager.stop, name) for name in names]
+
+    # Stop is asynchronous, wait for the monitor to reap every process
+    deadline = monotonic() + 60
+    while manager.spider_contexts and monotonic() < deadline:
+        sleep(0.5)
+
+    rm_latencies = [timed(manager.rm, name, is_force=True) for name in names]
+
+    return {
+        'containers': args.containers,
+        'running': len(contexts),
+        'rate_per_container': args.rate,
+        'duration': elapsed,
+        'rows': sum(rows.values()),
+        'rows_per_sec': sum(rows.values()) / elapsed,
+        'sink_lag_seconds': summarize(lag_samples),
+        'flush_p99_ms': max(flush_p99) if flush_p99 else None,
+        'cpu_percent_per_container': summarize([statistics.mean(values) for values in cpu_samples.values() if values]),
+        'rss_bytes_per_container': summarize([max(values) for values in rss_samples.values() if values]),
+        'manager_ps_seconds': summarize(responsiveness),
+        'manager_run_seconds': summarize(run_latencies),
+        'manager_stop_seconds': summarize(stop_latencies),
+        'manager_rm_seconds': summarize(rm_latencies)
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    def seconds(summary: Dict[str, Optional[float]], key: str) -> str:
+        return "--" if summary[key] is None else f"{summary[key] * 1000:.1f}ms"
+
+    def percent(summary: Dict[str, Optional[float]], key: str) -> str:
+        return "--" if summary[key] is None else f"{summary[key]:.1f}%"
+
+    def size(summary: Dict[str, Optional[float]], key: str) -> str:
+        return "--" if summary[key] is None else covert_size_to_str(summary[key])
+
+    print(f"Containers:           {report['running']}/{report['containers']} running, "
+          f"{report['rate_per_container']} rows/s each")
+    print(f"Ingest:               {report['rows']} rows in {report['duration']:.1f}s, {report['rows_per_sec']:.0f} rows/s")
+    print(f"Sink lag:             p50 {seconds(report['sink_lag_seconds'], 'p50')}, "
+          f"p99 {seconds(report['sink_lag_seconds'], 'p99')}")
+
+    flush_p99 = report['flush_p99_ms']
+    print(f"Flush p99 (worst):    {'--' if flush_p99 is None else f'{flush_p99:.1f}ms'}")
+
+    cpu = report['cpu_percent_per_container']
+    rss = report['rss_bytes_per_container']
+    print(f"CPU per container:    p50 {percent(cpu, 'p50')}, max {percent(cpu, 'max')}")
+    print(f"RSS per container:    p50 {size(rss, 'p50')}, max {size(rss, 'max')}")
+
+    for name in ("ps", "run", "stop", "rm"):
+        summary = report[f"manager_{name}_seconds"]
+        print(f"Manager {name + ':':<13} p50 {seconds(summary, 'p50')}, p99 {seconds(summary, 'p99')}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scale up N synthetic containers against a local SQLite sink.")
+    parser.add_argument('-n', '--containers', type=int, default=4,
+                        help="Number of containers.")
+    parser.add_argument('--rate', type=float, default=200,
+                        help="Rows per second of each container, 0 for as fast as possible.")
+    parser.add_argument('--columns', type=int, default=4,
+                        help="Text columns per row.")
+    parser.add_argument('--text-size', type=int, default=32,
+                        help="Characters per text column.")
+    parser.add_argument('--duration', type=float, default=20,
+                        help="Seconds of measurement.")
+    parser.add_argument('--warmup', type=float, default=3,
+                        help="Seconds between the last start and the measurement.")
+    parser.add_argument('--interval', type=float, default=1,
+                        help="Seconds between two samples.")
+    parser.add_argument('--workspace', type=str, default=None,
+                        help="Keep the platform files in this directory instead of a temporary one.")
+    parser.add_argument('--output', type=str, default=None,
+                        help="Write the report as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    workspace = args.workspace or tempfile.mkdtemp(prefix="tsdap-load-")
+    try:
+        report = run_load(args, os.path.abspath(workspace))
+
+    finally:
+        if (args.workspace is None):
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    print_report(report)
+
+    if (args.output):
+        with open(args.output, 'w', encoding='utf-8') as fp:
+            json.dump(report, fp, indent=4)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
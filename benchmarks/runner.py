@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   runner.py
+@Time    :   2026/10/19 16:20:05
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Benchmark registry, runner and baseline comparison
+'''
+
+
+import argparse
+import fnmatch
+import importlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+
+from datetime import datetime
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCHMARKS_DIR, "..", "src", "TSDAP")
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+
+sys.path.insert(0, SRC_DIR)
+
+from runtime import RuntimeContext as ctx     # noqa: E402
+
+
+class Benchmark():
+    def __init__(self, name: str, factory: Callable[..., Iterator[Callable[[], None]]], ops: int, group: str) -> None:
+        self.name = name
+        self.factory = factory
+        self.ops = ops
+        self.group = group
+
+
+class BenchmarkSkipped(Exception):
+    """Raised by a benchmark whose requirements are not met, e.g. no MySQL server."""
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, ops: int, group: str = "default"):
+    """Register a benchmark.
+
+    The decorated function is a generator called as `func(workdir, ops)`: it prepares the state,
+    yields one callable doing `ops` operations, which is the only timed part, then cleans up.
+    """
+    def decorator(factory):
+        BENCHMARKS[name] = Benchmark(name, factory, ops, group)
+        return factory
+
+    return decorator
+
+
+def init_runtime(data_backend: str = "SQLITE") -> None:
+    """Load the platform settings into the runtime context, once."""
+    if (ctx._multiprocess_manager is not None):
+        return
+
+    ctx.initialize()
+
+    with open(os.path.join(SRC_DIR, "configs", "settings.json")) as fp:
+        configs = json.load(fp)
+
+    for key, value in configs["Runtimes"].items():
+        ctx.process_set_global(f"Runtimes.{key}", value)
+
+    for key, value in configs["Spiders"].items():
+        ctx.multiprocess_set_global(f"Spiders.{key}", value)
+
+    ctx.multiprocess_set_global("Spiders.DATA_BACKEND", data_backend)
+
+
+def get_setting(key: str) -> Any:
+    init_runtime()
+    return ctx.multiprocess_get_global(key)
+
+
+def run_benchmark(bench: Benchmark, repeat: int) -> Dict[str, Any]:
+    timings = []
+
+    for _ in range(repeat):
+        workdir = tempfile.mkdtemp(prefix="tsdap-bench-")
+        try:
+            steps = bench.factory(workdir, bench.ops)
+            func = next(steps)
+
+            start_time = perf_counter()
+            func()
+            timings.append(perf_counter() - start_time)
+
+            # Clean up
+            next(steps, None)
+
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    median = statistics.median(timings)
+
+    return {
+        'group': bench.group,
+        'ops': bench.ops,
+        'repeat': repeat,
+        'best_us_per_op': min(timings) / bench.ops * 1e6,
+        'median_us_per_op': median / bench.ops * 1e6,
+        'ops_per_sec': bench.ops / median if median > 0 else None
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    """Names of the benchmarks slower than the baseline by more than `threshold`."""
+    regressions = []
+
+    for name, result in results.items():
+        base = baseline.get(name)
+        if (base is None or result.get('skipped')):
+            continue
+
+        ratio = result['median_us_per_op'] / base['median_us_per_op']
+        result['baseline_us_per_op'] = base['median_us_per_op']
+        result['ratio'] = ratio
+
+        if (ratio > 1 + threshold):
+            regressions.append(name)
+
+    return regressions
+
+
+def load_modules() -> None:
+    for filename in sorted(os.listdir(BENCHMARKS_DIR)):
+        if (filename.startswith("bench_") and filename.endswith(".py")):
+            importlib.import_module(filename[:-3])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the TSDAP benchmarks.")
+    parser.add_argument('-k', '--filter', type=str, default="*",
+                        help="Only run the benchmarks matching this glob pattern.")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Runs of each benchmark, the median is reported.")
+    parser.add_argument('--output', type=str, default=None,
+                        help="Write the results as JSON to this file.")
+    parser.add_argument('--baseline', type=str, default=DEFAULT_BASELINE,
+                        help="Baseline to compare with, if it exists.")
+    parser.add_argument('--save-baseline', action='store_true', default=False,
+                        help="Save the results as the new baseline.")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed slowdown against the baseline, 0.25 means 25%%.")
+    parser.add_argument('--mysql', action='store_true', default=False,
+                        help="Also run the MySQL benchmarks, against the server in settings.json.")
+    args = parser.parse_args(argv)
+
+    if (args.mysql):
+        os.environ["TSDAP_BENCH_MYSQL"] = "1"
+
+    load_modules()
+
+    results: Dict[str, Dict] = {}
+    for name, bench in BENCHMARKS.items():
+        if (not fnmatch.fnmatch(name, args.filter)):
+            continue
+
+        try:
+            results[name] = run_benchmark(bench, args.repeat)
+
+        except BenchmarkSkipped as e:
+            results[name] = {'group': bench.group, 'skipped': str(e)}
+
+    regressions = []
+    if (not args.save_baseline and os.path.isfile(args.baseline)):
+        with open(args.baseline, 'r', encoding='utf-8') as fp:
+            baseline = json.load(fp)['results']
+
+        regressions = compare(results, baseline, args.threshold)
+
+    print(f"{'BENCHMARK':<36}{'US/OP':>12}{'OPS/S':>14}{'BASELINE':>12}{'RATIO':>8}")
+    for name, result in results.items():
+        if (result.get('skipped')):
+            print(f"{name:<36}{'skipped: ' + result['skipped']}")
+            continue
+
+        base = f"{result['baseline_us_per_op']:.2f}" if 'baseline_us_per_op' in result else "--"
+        ratio = f"{result['ratio']:.2f}" if 'ratio' in result else "--"
+        mark = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<36}{result['median_us_per_op']:>12.2f}{result['ops_per_sec']:>14.0f}{base:>12}{ratio:>8}{mark}")
+
+    report = {
+        'meta': {
+            'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'threshold': args.threshold
+        },
+        'results': results,
+        'regressions': regressions
+    }
+
+    output_paths = [args.output] if args.output else []
+    if (args.save_baseline):
+        output_paths.append(args.baseline)
+
+    for output_path in output_paths:
+        with open(output_path, 'w', encoding='utf-8') as fp:
+            json.dump(report, fp, indent=4)
+
+    if (regressions):
+        print(f"{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}.")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    # Run through the `runner` module, the one the benchmark modules register into
+    from runner import main as runner_main
+    sys.exit(runner_main())
@@ -12,8 +12,123 @@
 import logging
 
 from abc import ABC, abstractmethod
-from threading import Thread
-from typing import Any, Callable, Dict, Iterable, Mapping
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Mapping, Sequence
+
+
+class PooledThread():
+    name: str | None
+
+    def start(self) -> None:
+        """Queue the task on the thread pool of the spider."""
+        ...
+
+    def join(self, timeout: float | None = None) -> None: ...
+
+    def is_alive(self) -> bool: ...
+
+
+class HttpResponse():
+    url: str
+    status: int
+    reason: str
+    body: bytes
+    """Decoded body, gzip, deflate and brotli (when installed) are handled"""
+    from_cache: bool
+    """Served by the HTTP cache, fresh or revalidated with a 304"""
+
+    @property
+    def ok(self) -> bool: ...
+
+    def text(self, encoding: str | None = None) -> str: ...
+
+    def json(self) -> Any: ...
+
+    def raise_for_status(self) -> None: ...
+
+
+class HttpClient():
+    def request(self,
+                method: str,
+                url: str,
+                params: Mapping[str, Any] | None = None,
+                headers: Mapping[str, str] | None = None,
+                data: bytes | str | Mapping[str, Any] | None = None,
+                json_data: Any = None,
+                timeout: float | None = None,
+                allow_redirects: bool = True,
+                cache: bool | None = None
+                ) -> HttpResponse:
+        """Send a request, blocking until the response is read.
+
+        Network errors (for idempotent methods) and 429/502/503/504 answers are retried
+        with an exponential backoff, `Retry-After` is honoured.
+
+        Args:
+            method (str): HTTP method
+            url (str): Absolute http or https URL
+            params (Mapping[str, Any] | None, optional): Query string parameters. Defaults to None.
+            headers (Mapping[str, str] | None, optional): Extra headers. Defaults to None.
+            data (bytes | str | Mapping[str, Any] | None, optional): Body, a mapping is form encoded. Defaults to None.
+            json_data (Any, optional): Body encoded as JSON. Defaults to None.
+            timeout (float | None, optional): Socket timeout in seconds. Defaults to the platform setting.
+            allow_redirects (bool, optional): Follow redirects. Defaults to True.
+            cache (bool | None, optional): Use the HTTP cache for a GET request. Defaults to the host setting,
+                see `set_host_cache`, then to the `HTTP_CACHE` platform setting.
+
+        Returns:
+            HttpResponse: The last response, also when its status is an error
+        """
+        ...
+
+    def get(self, url: str, **kwargs) -> HttpResponse: ...
+
+    def post(self, url: str, **kwargs) -> HttpResponse: ...
+
+    async def arequest(self, method: str, url: str, **kwargs) -> HttpResponse:
+        """`request` for asyncio code, it does not block the event loop.
+
+        The request runs on a thread of the client, at most `HTTP_ASYNC_WORKERS` (a platform setting,
+        32 by default) requests of a spider are in flight at once, the others wait for a thread.
+        """
+        ...
+
+    async def aget(self, url: str, **kwargs) -> HttpResponse:
+        """`arequest` with GET, at most `HTTP_ASYNC_WORKERS` requests are in flight at once."""
+        ...
+
+    async def apost(self, url: str, **kwargs) -> HttpResponse:
+        """`arequest` with POST, at most `HTTP_ASYNC_WORKERS` requests are in flight at once."""
+        ...
+
+    def set_host_limits(self,
+                        host: str,
+                        max_connections: int | None = None,
+                        rate: float | None = None,
+                        burst: int | None = None
+                        ) -> None:
+        """Limits of one host instead of the platform defaults, to call before its first request.
+
+        Args:
+            host (str): Host name, as in the URLs
+            max_connections (int | None, optional): Concurrent requests to the host. Defaults to None.
+            rate (float | None, optional): Requests per second, 0 for unlimited. Defaults to None.
+            burst (int | None, optional): Requests allowed at once above the rate. Defaults to None.
+        """
+        ...
+
+    def set_host_cache(self, host: str, enabled: bool = True) -> None:
+        """Turn the HTTP cache on or off for every GET request to a host.
+
+        Cached responses are stored in the `db` directory of the container. They are served while fresh
+        (`Cache-Control`, `Expires`), revalidated with `ETag`/`Last-Modified` once stale, and the least
+        recently used ones are dropped above `HTTP_CACHE_MAX_SIZE` bytes.
+
+        Args:
+            host (str): Host name, as in the URLs
+            enabled (bool, optional): Use the cache. Defaults to True.
+        """
+        ...
 
 
 class ISpider(ABC):
@@ -25,6 +140,11 @@ class ISpider(ABC):
         self.logger: logging.Logger
         """Spider's Log Recorder
         """
+        self.http: HttpClient
+        """HTTP client of the spider, shared by all its threads.
+        Connections are kept alive, each host has a concurrency cap and a rate limit,
+        and failed requests are retried.
+        """
         ...
 
     def alloc_thread(self,
@@ -32,8 +152,11 @@ class ISpider(ABC):
                      thread_name: str | None = None,
                      args: Iterable[Any] = (),
                      kwargs: Mapping[str, Any] | None = None
-                     ) -> Thread | None:
+                     ) -> PooledThread:
         """To apply for a thread.
+        The task runs on a worker of the thread pool once started, see `submit`.
+        Starting it warns `SpiderWarnings.ThreadRepeatWarning` if a thread with the same name is still running,
+        and `SpiderWarnings.ThreadLimitWarning` if every worker is busy and it has to wait.
 
         Args:
             target_func (Callable): Thread's function
@@ -42,13 +165,78 @@ class ISpider(ABC):
             kwargs (Mapping[str, Any] | None, optional): Parameters of thread tasks. Defaults to None.
 
         Returns:
-            Thread | None: Thread instance object
+            PooledThread: Thread handle, with `start`, `join` and `is_alive`
+        """
+        ...
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """To run a task on the thread pool of the spider.
+
+        The pool has `THREAD_MAXIMUM` workers. Once `THREAD_QUEUE_SIZE` tasks are waiting
+        the call blocks until one of them starts.
+        An exception of the task is logged and marks the run as failed, like an exception of `run`.
+        Queued tasks are cancelled when the spider is stopped, and the spider only ends
+        once the pool has no task left.
+
+        Args:
+            func (Callable): Task's function
+            *args, **kwargs: Parameters of the task
+
+        Returns:
+            Future: Result of the task
+        """
+        ...
+
+    def map(self, func: Callable, *iterables: Iterable[Any]) -> Iterator[Any]:
+        """To run `func` over the iterables on the thread pool, like the builtin `map`.
+        Results come in order, tasks are submitted as they are consumed.
+
+        Args:
+            func (Callable): Task's function
+            *iterables (Iterable[Any]): Parameters of the tasks
+
+        Returns:
+            Iterator[Any]: Results of the tasks, raises the exception of a failed task
+        """
+        ...
+
+    def offload(self, func: Callable, *args, **kwargs) -> Future:
+        """To run a CPU bound task, e.g. parsing, on a worker process of the container.
+        The threads of a spider share one interpreter lock, the workers don't.
+
+        The pool has `OFFLOAD_WORKERS` processes, one per core when 0, and is started by the first call.
+        `func` and the parameters are pickled, `func` has to be defined at the top level of a module.
+        Bytes and strings of at least `OFFLOAD_SHM_THRESHOLD` bytes, as parameters or as the result,
+        go through shared memory.
+        A finished task feeds the watch dog. Unfinished tasks are cancelled and the workers
+        terminated when the spider is stopped.
+
+        Args:
+            func (Callable): Task's function
+            *args, **kwargs: Parameters of the task
+
+        Returns:
+            Future: Result of the task
+        """
+        ...
+
+    def offload_map(self, func: Callable, *iterables: Iterable[Any]) -> Iterator[Any]:
+        """To run `func` over the iterables on the worker processes, like the builtin `map`.
+        Results come in order, tasks are submitted as they are consumed.
+
+        Args:
+            func (Callable): Task's function, see `offload`
+            *iterables (Iterable[Any]): Parameters of the tasks
+
+        Returns:
+            Iterator[Any]: Results of the tasks, raises the exception of a failed task
         """
         ...
 
     def new_table(self,
                   table_name: str,
-                  ref_data: Dict[str, Any]
+                  ref_data: Dict[str, Any],
+                  dedup_keys: Sequence[str] | None = None
                   ) -> bool:
         """To create a new table.
 
@@ -60,6 +248,11 @@ class ISpider(ABC):
 
                 E.g: {'column_name': value}
 
+            dedup_keys (Sequence[str] | None, optional): Columns identifying a row.
+                When given, rows whose keys are already in the table are dropped before insert.
+                The keys are remembered by a Bloom filter kept in the container `db` directory,
+                and indexed in the table. Defaults to None.
+
         Returns:
             bool: Is successful
         """
@@ -77,6 +270,73 @@ class ISpider(ABC):
         """
         ...
 
+    def write_many(self,
+                   table_name: str,
+                   rows: Iterable[Dict[str, Any]]
+                   ) -> None:
+        """Write a batch of rows to appointed table.
+        The batch is checked once and written with a single batched insert.
+
+        Args:
+            table_name (str): Table's name
+            rows (Iterable[Dict[str, Any]]): The rows to be written, all with the same columns
+
+        Raises:
+            ValueError: The rows do not have the same columns
+        """
+        ...
+
+    def write_columns(self,
+                      table_name: str,
+                      columns: Dict[str, Sequence[Any]]
+                      ) -> None:
+        """Write a batch given by columns to appointed table.
+
+        Args:
+            table_name (str): Table's name
+            columns (Dict[str, Sequence[Any]]): Values of each column, lists or numpy arrays
+                of the same length.
+
+                E.g: {'column_name': [value, value]}
+
+        Raises:
+            ValueError: The columns do not have the same length
+        """
+        ...
+
+    def get_watermark(self,
+                      source: str,
+                      default: Any = None
+                      ) -> Any:
+        """Read the watermark of a source, e.g. the newest timestamp already crawled.
+        Cron runs start from it to only fetch what is new.
+
+        Args:
+            source (str): Source's name
+            default (Any, optional): Returned when the source has no watermark yet. Defaults to None.
+
+        Returns:
+            Any: The last advanced watermark
+        """
+        ...
+
+    def advance_watermark(self,
+                          source: str,
+                          value: Any
+                          ) -> bool:
+        """Move the watermark of a source forward, after writing the data it covers.
+        It is saved in the same transaction as the data written before it,
+        so a crash never leaves it ahead of the saved data.
+
+        Args:
+            source (str): Source's name
+            value (Any): New watermark, comparable with the previous one, e.g. a timestamp or an id
+
+        Returns:
+            bool: False if the value is not greater than the current watermark, which is kept
+        """
+        ...
+
     def read_stores(self,
                     name: str
                     ) -> Dict[str, Any] | None:
@@ -98,12 +358,15 @@ class ISpider(ABC):
         """Some variables or data that need to be persistently stored, but are not datasets.
         This function will write it.
 
+        The value is pickled at once and kept in memory, it is written back to the database
+        every few seconds and when the spider exits.
+
         Args:
             name (str): Variables name
             store_data (Dict[str, Any]): Variables dictionary
 
         Returns:
-            bool: Is the writing successful
+            bool: Is the value accepted
         """
         ...
 
@@ -122,11 +385,133 @@ class ISpider(ABC):
         ...
 
 
+class IAsyncSpider(ABC):
+    """Spider written with asyncio, for many concurrent requests on one thread.
+    Like `ISpider`, only one class of the package inherits it.
+
+    `run` runs on an event loop owned by the platform. The database calls are coroutines
+    and never block the loop. A stop request or the watch dog cancels `run`, `unload` is awaited then.
+
+    `self.http` runs the requests on threads, at most `HTTP_ASYNC_WORKERS` (32 by default)
+    are in flight however many coroutines await them.
+    """
+    def __init__(self) -> None:
+        self.logger: logging.Logger
+        """Spider's Log Recorder
+        """
+        self.http: HttpClient
+        """HTTP client of the spider, use `aget`, `apost` and `arequest` from the loop.
+        """
+        ...
+
+    async def new_table(self,
+                        table_name: str,
+                        ref_data: Dict[str, Any],
+                        dedup_keys: Sequence[str] | None = None
+                        ) -> bool:
+        """`ISpider.new_table` for the event loop."""
+        ...
+
+    async def write_data(self,
+                         table_name: str,
+                         data: Dict[str, Any]
+                         ) -> None:
+        """`ISpider.write_data` for the event loop, waits without blocking while the buffers are full."""
+        ...
+
+    async def write_many(self,
+                         table_name: str,
+                         rows: Iterable[Dict[str, Any]]
+                         ) -> None:
+        """`ISpider.write_many` for the event loop."""
+        ...
+
+    async def write_columns(self,
+                            table_name: str,
+                            columns: Dict[str, Sequence[Any]]
+                            ) -> None:
+        """`ISpider.write_columns` for the event loop."""
+        ...
+
+    def get_watermark(self,
+                      source: str,
+                      default: Any = None
+                      ) -> Any:
+        """Same as `ISpider.get_watermark`."""
+        ...
+
+    async def advance_watermark(self,
+                                source: str,
+                                value: Any
+                                ) -> bool:
+        """`ISpider.advance_watermark` for the event loop."""
+        ...
+
+    async def read_stores(self,
+                          name: str
+                          ) -> Dict[str, Any] | None:
+        """`ISpider.read_stores` for the event loop."""
+        ...
+
+    async def write_stores(self,
+                           name: str,
+                           store_data: Dict[str, Any]
+                           ) -> bool:
+        """`ISpider.write_stores` for the event loop."""
+        ...
+
+    async def offload(self, func: Callable, *args, **kwargs) -> Any:
+        """To await a CPU bound task run on a worker process of the container, see `ISpider.offload`.
+
+        Args:
+            func (Callable): Task's function
+            *args, **kwargs: Parameters of the task
+
+        Returns:
+            Any: Result of the task
+        """
+        ...
+
+    async def fan_out(self,
+                      func: Callable[[Any], Awaitable[Any]],
+                      items: Iterable[Any],
+                      limit: int | None = None
+                      ) -> List[Any]:
+        """Await `func(item)` for every item, with at most `limit` of them at once.
+
+        Items are read as they are started, a long iterable is not held in memory as tasks.
+        The first exception cancels the other calls and is raised.
+
+        Args:
+            func (Callable[[Any], Awaitable[Any]]): Coroutine function of one item
+            items (Iterable[Any]): Items
+            limit (int | None, optional): Calls at once. Defaults to the `ASYNC_CONCURRENCY` platform setting.
+
+        Returns:
+            List[Any]: Results, in the order of the items
+        """
+        ...
+
+    @abstractmethod
+    async def run(self) -> None:
+        """The entrance coroutine of the spider must be rewritten.
+        """
+        ...
+
+    @abstractmethod
+    async def unload(self) -> None:
+        """Awaited when the platform stops the spider, after `run` was cancelled.
+        """
+        ...
+
+
 class SpiderWarnings:
     class ThreadLimitWarning(Warning):
+        """A started thread waits, all the workers of the pool are busy."""
         def __init__(self, *args: object) -> None:
             ...
 
     class ThreadRepeatWarning(Warning):
+        """A thread was started with the name of a running one."""
         def __init__(self, *args: object) -> None:
             ...
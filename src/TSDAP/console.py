@@ -83,6 +83,10 @@ class SpiderConsole(cmd.Cmd):
                             help="Set environment variable in the format key=value.")
     run_parser.add_argument('--cron', type=str, default=None,
                             help="Configure the spider to start at a scheduled time, using the cron format string.")
+    run_parser.add_argument('--overlap', type=str, default=None, choices=["skip", "queue"],
+                            help="What to do when a cron run is due while the previous one is still running.")
+    run_parser.add_argument('--jitter', type=int, default=None,
+                            help="Delay each cron run by a random number of seconds up to this value.")
     run_parser.add_argument('pkg_name_tag', type=str,
                             help="Specify name and tag in the format name:tag.")
 
@@ -96,6 +100,29 @@ class SpiderConsole(cmd.Cmd):
     rm_parser.add_argument('spider_name_or_id', type=str,
                            help="Specify full name or partial ID.")
 
+    stats_parser = argparse.ArgumentParser()
+    stats_parser.add_argument('--no-stream', action='store_true', default=False,
+                              help="Print a single snapshot instead of refreshing.")
+    stats_parser.add_argument('--interval', type=float, default=1.0,
+                              help="Seconds between two samples.")
+    stats_parser.add_argument('spider_names_or_ids', type=str, nargs='*',
+                              help="Specify full names or partial IDs, all running spiders by default.")
+
+    profile_parser = argparse.ArgumentParser()
+    profile_parser.add_argument('--seconds', type=float, default=10,
+                                help="How long to sample the spider.")
+    profile_parser.add_argument('spider_name_or_id', type=str,
+                                help="Specify full name or partial ID.")
+
+    memsnap_parser = argparse.ArgumentParser()
+    memsnap_group = memsnap_parser.add_mutually_exclusive_group()
+    memsnap_group.add_argument('--on', action='store_true', default=False,
+                               help="Start tracing allocations.")
+    memsnap_group.add_argument('--off', action='store_true', default=False,
+                               help="Stop tracing allocations and drop the snapshots.")
+    memsnap_parser.add_argument('spider_name_or_id', type=str,
+                                help="Specify full name or partial ID.")
+
     def do_load(self, *args):
         pkg_filepath = args[0]
         spider_manager.load(pkg_filepath)
@@ -121,7 +148,9 @@ class SpiderConsole(cmd.Cmd):
             entry=args.entry,
             daemon=args.daemon,
             envs=envs,
-            cron=args.cron
+            cron=args.cron,
+            overlap=args.overlap,
+            jitter=args.jitter
         )
 
     def do_ps(self, *args):
@@ -157,11 +186,38 @@ class SpiderConsole(cmd.Cmd):
         spider_manager.rmi(pkg_name_tag)
 
     def do_inspect(self, *args):
-        pass
+        spider_name_or_id = args[0]
+        spider_manager.inspect(spider_name_or_id)
 
     def do_logs(self, *args):
         spider_name = args[0]
         spider_manager.logs(spider_name)
 
+    def do_profile(self, *args):
+        try:
+            args = self.profile_parser.parse_args(shlex.split(args[0]))
+        except SystemExit:
+            return
+
+        spider_manager.profile(args.spider_name_or_id, seconds=args.seconds)
+
+    def do_memsnap(self, *args):
+        try:
+            args = self.memsnap_parser.parse_args(shlex.split(args[0]))
+        except SystemExit:
+            return
+
+        command = "on" if args.on else "off" if args.off else "snap"
+        spider_manager.memsnap(args.spider_name_or_id, command=command)
+
     def do_stats(self, *args):
-        pass
+        try:
+            args = self.stats_parser.parse_args(shlex.split(args[0]))
+        except SystemExit:
+            return
+
+        spider_manager.stats(
+            spider_names_or_ids=args.spider_names_or_ids,
+            is_stream=not args.no_stream,
+            interval=args.interval
+        )
@@ -16,7 +16,8 @@ from abc import ABC, abstractmethod
 from enum import IntEnum
 from decimal import Decimal
 from functools import wraps
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type, Union
 
 from utils.RWLock import WritePriorityReadWriteLock
 
@@ -56,6 +57,71 @@ def covert_to_sql_type(value: Any) -> str:
         raise TypeError(f"Unsupported value type: {type(value).__name__}")
 
 
+def keyset_conditions(column_names: Sequence[str], after: Optional[Sequence[Any]], holder: str) -> Tuple[str, Tuple]:
+    """Conditions and values of the rows ordered after the row `after` by `column_names`, NULL keys left out.
+    The leading range on the first column lets the database read an index of the columns in order.
+    """
+    columns = [f"`{column}`" for column in column_names]
+
+    conditions = [f"{column} IS NOT NULL" for column in columns]
+    values: List[Any] = []
+
+    if (after is not None):
+        conditions.append(f"{columns[0]} >= {holder}")
+        values.append(after[0])
+
+        alternatives = []
+        for index, column in enumerate(columns):
+            equals = [f"{prefix} = {holder}" for prefix in columns[:index]]
+            alternatives.append(" AND ".join(equals + [f"{column} > {holder}"]))
+            values.extend(after[:index + 1])
+
+        conditions.append(f"(({') OR ('.join(alternatives)}))")
+
+    return (" AND ".join(conditions), tuple(values))
+
+
+# Called with (backend, statement kind, seconds) after every `execute`, None to disable
+_execute_observer: Optional[Callable[[str, str, float], None]] = None
+
+STATEMENT_KINDS = ("select", "insert", "update", "delete", "ddl", "other")
+
+DDL_KEYWORDS = ("create", "drop", "alter", "pragma")
+
+
+def set_execute_observer(observer: Optional[Callable[[str, str, float], None]]) -> None:
+    global _execute_observer
+    _execute_observer = observer
+
+
+def get_statement_kind(sql: str) -> str:
+    keyword = sql.lstrip()[:6].lower()
+
+    if (keyword in STATEMENT_KINDS):
+        return keyword
+
+    if (keyword.startswith(DDL_KEYWORDS)):
+        return "ddl"
+
+    return "other"
+
+
+def observe_execute(func):
+    @wraps(func)
+    def wrapper(self: IDBCommon, sql: str, *args, **kwargs):
+        if (_execute_observer is None):
+            return func(self, sql, *args, **kwargs)
+
+        start_time = perf_counter()
+        try:
+            return func(self, sql, *args, **kwargs)
+
+        finally:
+            _execute_observer(type(self).__name__.lower(), get_statement_kind(sql), perf_counter() - start_time)
+
+    return wrapper
+
+
 def check_database_exists(func):
     @wraps(func)
     def wrapper(self: IDBCommon, *args, **kwargs):
@@ -186,6 +252,31 @@ def check_data_field_type(func):
     return wrapper
 
 
+def check_batch_field_type(func):
+    @wraps(func)
+    def wrapper(self: IDBCommon, table_name: str, column_names: Sequence[str], rows: Sequence[Sequence[Any]]):
+        if (len(rows) == 0):
+            return True
+
+        # Check the whole batch at once
+        status, err_pairs = self._check_batch_datatype_correct(table_name, column_names, rows)
+        if (not status):
+            if (self._logger is not None):
+                self._logger.warning(DBWarnings.TypeMismatchedWarning(f"Error pairs info: {err_pairs}"))    # pragma: no cover
+            else:
+                logging.warning(DBWarnings.TypeMismatchedWarning(f"Error pairs info: {err_pairs}"))
+
+            return status
+
+        status = func(self, table_name, column_names, rows)
+        if (status):
+            self._append_table_datatype_to_map(table_name, dict(zip(column_names, rows[0])))
+
+        return status
+
+    return wrapper
+
+
 class IDBCommon(ABC):
     """ The interface of database. You can inherit and implement interface functions,\n
         then you can call the implemented database in the platform code.
@@ -284,6 +375,58 @@ class IDBCommon(ABC):
         return self.__compare_data_type_maps(data, correct_table_type) \
             if correct_table_type is not None else (True, None)
 
+    def _check_batch_datatype_correct(self,
+                                      table_name: str,
+                                      column_names: Sequence[str],
+                                      rows: Sequence[Sequence[Any]]) -> Tuple[bool, Union[List, None]]:
+
+        err_pairs = []
+
+        for index, row in enumerate(rows):
+            if (len(row) != len(column_names)):
+                err_pairs.append({
+                    'pos': str(index),
+                    'datatype': f"{len(row)} values",
+                    'expection': f"{len(column_names)} values"
+                })
+
+        if (len(err_pairs) != 0):
+            return (False, err_pairs)
+
+        self.__type_map_for_tables_lock.acquire_read()
+
+        correct_table_type = self._type_map_for_tables[self._curr_database_name].get(table_name)
+
+        self.__type_map_for_tables_lock.release_read()
+
+        if (correct_table_type is None):
+            # First submission of the table, same as `_check_datatype_correct`
+            return (True, None)
+
+        for column_index, column_name in enumerate(column_names):
+            column_type = correct_table_type.get(column_name)
+            if (column_type is None):
+                continue
+
+            if (not isinstance(column_type, type)):
+                # Nested values, compare row by row
+                for index, row in enumerate(rows):
+                    status, pairs = self.__compare_data_type_maps({column_name: row[column_index]}, correct_table_type)
+                    err_pairs.extend(dict(pair, pos=f"{index}.{pair['pos']}") for pair in pairs)
+                continue
+
+            for index, row in enumerate(rows):
+                if (not isinstance(row[column_index], column_type)):
+                    err_pairs.append({
+                        'pos': f"{index}.{column_name}",
+                        'datatype': type(row[column_index]).__name__,
+                        'expection': column_type.__name__
+                    })
+
+        status = False if len(err_pairs) else True
+
+        return (status, err_pairs)
+
     def _append_table_datatype_to_map(
             self,
             table_name: str,
@@ -326,7 +469,16 @@ class IDBCommon(ABC):
 
     @abstractmethod
     # pragma: no cover
-    def create_table(self, table_name: str, column_infos: List[Tuple[str, Any]]) -> bool:
+    def create_table(self,
+                     table_name: str,
+                     column_infos: List[Tuple[str, Any]],
+                     primary_keys: Optional[List[str]] = None) -> bool:
+        pass
+
+    @abstractmethod
+    # pragma: no cover
+    def create_index(self, table_name: str, index_name: str, column_names: Sequence[str]) -> bool:
+        """Index the columns of a table, nothing is done when `index_name` exists."""
         pass
 
     @abstractmethod
@@ -339,6 +491,16 @@ class IDBCommon(ABC):
     def insert(self, table_name: str, data: Dict[str, Any]) -> bool:
         pass
 
+    @abstractmethod
+    # pragma: no cover
+    def upsert(self, table_name: str, data: Dict[str, Any], primary_keys: List[str]) -> bool:
+        pass
+
+    @abstractmethod
+    # pragma: no cover
+    def insert_many(self, table_name: str, column_names: Sequence[str], rows: Sequence[Sequence[Any]]) -> bool:
+        pass
+
     @abstractmethod
     # pragma: no cover
     def delete(self, table_name: str, condition: str) -> bool:
@@ -349,6 +511,23 @@ class IDBCommon(ABC):
     def select(self, table_name: str, condition: Optional[str] = None) -> Tuple[Tuple, List]:
         pass
 
+    @abstractmethod
+    # pragma: no cover
+    def select_columns(self,
+                       table_name: str,
+                       column_names: Sequence[str],
+                       limit: int,
+                       after: Optional[Sequence[Any]] = None) -> List:
+        """At most `limit` rows of the given columns ordered by them, the ones after the row `after`.
+        Rows with a NULL in the columns are left out.
+        """
+        pass
+
+    @abstractmethod
+    # pragma: no cover
+    def exists(self, table_name: str, data: Dict[str, Any]) -> bool:
+        pass
+
     @abstractmethod
     # pragma: no cover
     def update(self, table_name: str, data: Dict[str, Any], condition: str) -> bool:
@@ -359,11 +538,20 @@ class IDBCommon(ABC):
     def execute(self, sql: str, data: Tuple = ()) -> Tuple:
         pass
 
+    @abstractmethod
+    # pragma: no cover
+    def execute_many(self, sql: str, data_list: Sequence[Sequence[Any]]) -> Tuple:
+        pass
+
     @abstractmethod
     # pragma: no cover
     def transaction(self):
         pass
 
+    def close(self) -> None:     # pragma: no cover
+        """Release the connection of the database in use, nothing by default."""
+        pass
+
 
 class DBExceptions:     # pragma: no cover
     class DBExistsError(BaseException):
@@ -9,16 +9,17 @@
 '''
 
 
+import logging
 import pymysql
 import threading
 import warnings
 
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from .common import \
     IDBCommon, DBWarnings, RetIndices, \
-    covert_to_sql_type, check_database_selected, check_data_field_type, \
-    check_database_exists, check_table_exists
+    covert_to_sql_type, check_database_selected, check_data_field_type, check_batch_field_type, \
+    check_database_exists, check_table_exists, keyset_conditions, observe_execute
 
 
 SQL_DICT = {
@@ -31,10 +32,18 @@ SQL_DICT = {
     'create_table': "CREATE TABLE IF NOT EXISTS `{table_name}` ({columns})",
     'drop_table': "DROP TABLE IF EXISTS `{table_name}`",
 
+    'check_index_exists': "SELECT INDEX_NAME FROM information_schema.STATISTICS \
+                           WHERE TABLE_SCHEMA = '{database_name}' AND TABLE_NAME = '{table_name}' \
+                           AND INDEX_NAME = '{index_name}' LIMIT 1",
+    'create_index': "CREATE INDEX `{index_name}` ON `{table_name}` ({columns})",
+
     'insert_data': "INSERT INTO `{table_name}` ({columns}) VALUES ({values})",
+    'upsert_data': "INSERT INTO `{table_name}` ({columns}) VALUES ({values}) ON DUPLICATE KEY UPDATE {sets}",
     'delete_data': "DELETE FROM `{table_name}` {condition}",
     'update_data': "UPDATE `{table_name}` SET {sets} {condition}",
-    'select_data': "SELECT * FROM `{table_name}` {condition}"
+    'select_data': "SELECT * FROM `{table_name}` {condition}",
+    'select_columns': "SELECT {columns} FROM `{table_name}` WHERE {conditions} ORDER BY {columns} LIMIT {limit}",
+    'exists_data': "SELECT 1 FROM `{table_name}` WHERE {conditions} LIMIT 1"
 }
 
 
@@ -60,6 +69,9 @@ class MySQL(IDBCommon):
 
         self.lock_exec = threading.RLock()
 
+        # Errors in a transaction are raised, the whole transaction is rolled back by its manager
+        self._in_transaction = False
+
         self._register_database_exists_func(self.__is_database_exists)
         self._register_table_exists_func(self.__is_table_exists)
 
@@ -116,7 +128,8 @@ class MySQL(IDBCommon):
     @check_table_exists
     def create_table(self,
                      table_name: str,
-                     column_infos: List[Tuple[str, Any]]) -> bool:
+                     column_infos: List[Tuple[str, Any]],
+                     primary_keys: Optional[List[str]] = None) -> bool:
 
         columns = []
 
@@ -124,6 +137,9 @@ class MySQL(IDBCommon):
             type_str = covert_to_sql_type(value)
             columns.append(f"{name} {type_str}")
 
+        if (primary_keys):
+            columns.append(f"PRIMARY KEY ({','.join(primary_keys)})")
+
         sql = SQL_DICT['create_table'].format(
             table_name=table_name,
             columns=str(",".join(columns))
@@ -131,6 +147,30 @@ class MySQL(IDBCommon):
 
         return self.execute(sql)[RetIndices.STATUS]
 
+    @check_database_selected
+    @check_table_exists
+    def create_index(self,
+                     table_name: str,
+                     index_name: str,
+                     column_names: Sequence[str]) -> bool:
+
+        # MySQL has no `CREATE INDEX IF NOT EXISTS`
+        sql = SQL_DICT['check_index_exists'].format(
+            database_name=self._curr_database_name,
+            table_name=table_name,
+            index_name=index_name
+        )
+        if (len(self.execute(sql)[RetIndices.RESULT]) != 0):
+            return True
+
+        sql = SQL_DICT['create_index'].format(
+            table_name=table_name,
+            index_name=index_name,
+            columns=",".join(f"`{column}`" for column in column_names)
+        )
+
+        return self.execute(sql)[RetIndices.STATUS]
+
     @check_database_selected
     @check_table_exists
     def drop_table(self, table_name: str) -> bool:
@@ -174,6 +214,51 @@ class MySQL(IDBCommon):
 
         return exec_ret[RetIndices.STATUS]
 
+    @check_database_selected
+    @check_table_exists
+    @check_batch_field_type
+    def insert_many(self,
+                    table_name: str,
+                    column_names: Sequence[str],
+                    rows: Sequence[Sequence[Any]]) -> bool:
+
+        sql = SQL_DICT['insert_data'].format(
+            table_name=table_name,
+            columns=",".join(column_names),
+            values=",".join(["%s" for _ in range(len(column_names))])
+        )
+
+        # `executemany` folds the rows into multi-row INSERT statements
+        exec_ret = self.execute_many(sql, rows)
+
+        if (not exec_ret[RetIndices.STATUS] and exec_ret[RetIndices.ERROR_CODE] in [1366, 1265]):
+            # Mismatched data type, see `insert`
+            warnings.warn(DBWarnings.TypeMismatchedWarning(exec_ret[RetIndices.ERROR_MSG]))
+
+        return exec_ret[RetIndices.STATUS]
+
+    @check_database_selected
+    @check_table_exists
+    @check_data_field_type
+    def upsert(self,
+               table_name: str,
+               data: Dict[str, Any],
+               primary_keys: List[str]) -> bool:
+
+        sets = ",".join(
+            f"`{column}`=VALUES(`{column}`)" for column in data.keys() if column not in primary_keys
+        )
+
+        sql = SQL_DICT['upsert_data'].format(
+            table_name=table_name,
+            columns=",".join(data.keys()),
+            values=",".join(["%s" for _ in range(len(data))]),
+            keys=",".join(primary_keys),
+            sets=sets
+        )
+
+        return self.execute(sql, tuple(data.values()))[RetIndices.STATUS]
+
     @check_database_selected
     @check_table_exists
     def delete(self,
@@ -202,6 +287,43 @@ class MySQL(IDBCommon):
 
         return (exec_ret[RetIndices.COLUMN_NAME], exec_ret[RetIndices.RESULT])
 
+    @check_database_selected
+    @check_table_exists
+    def select_columns(self,
+                       table_name: str,
+                       column_names: Sequence[str],
+                       limit: int,
+                       after: Optional[Sequence[Any]] = None) -> List:
+
+        # Keyset pagination, a chunk costs the same at the end of the table as at its start
+        conditions, values = keyset_conditions(column_names, after, "%s")
+
+        sql = SQL_DICT['select_columns'].format(
+            table_name=table_name,
+            columns=",".join(f"`{column}`" for column in column_names),
+            conditions=conditions,
+            limit=int(limit)
+        )
+
+        return self.execute(sql, values)[RetIndices.RESULT]
+
+    @check_database_selected
+    @check_table_exists
+    def exists(self,
+               table_name: str,
+               data: Dict[str, Any]) -> bool:
+
+        conditions = " AND ".join(
+            f"`{column}`=%s" for column in data.keys()
+        )
+
+        sql = SQL_DICT['exists_data'].format(
+            table_name=table_name,
+            conditions=conditions
+        )
+
+        return len(self.execute(sql, tuple(data.values()))[RetIndices.RESULT]) != 0
+
     @check_database_selected
     @check_table_exists
     @check_data_field_type
@@ -211,7 +333,7 @@ class MySQL(IDBCommon):
                condition: str) -> bool:
 
         sets = ",".join(
-            f"`{column}`={value}" for column, value in data.items()
+            f"`{column}`=%s" for column in data.keys()
         )
 
         sql = SQL_DICT['update_data'].format(
@@ -220,8 +342,9 @@ class MySQL(IDBCommon):
             condition=condition
         )
 
-        return self.execute(sql)[RetIndices.STATUS]
+        return self.execute(sql, tuple(data.values()))[RetIndices.STATUS]
 
+    @observe_execute
     def execute(self, sql: str, data: Tuple = ()) -> Tuple:
         with self.lock_exec:
             status = False
@@ -233,28 +356,71 @@ class MySQL(IDBCommon):
                 status = True
 
             except Exception as e:
-                # log 'e'
-                print(e)
-                self.db.rollback()
-                err_code, err_msg = e.args
+                if (self._in_transaction):
+                    raise
+
+                err_code, err_msg = self.__handle_error(e)
 
             column_name = list(zip(*self.cursor.description))[0] if (self.cursor.description is not None) else None
 
             return (status, err_code, column_name, self.cursor.fetchall(), err_msg)
 
+    @observe_execute
+    def execute_many(self, sql: str, data_list: Sequence[Sequence[Any]]) -> Tuple:
+        with self.lock_exec:
+            status = False
+            err_code = 0
+            err_msg = None
+
+            try:
+                self.cursor.executemany(sql, data_list)
+                status = True
+
+            except Exception as e:
+                if (self._in_transaction):
+                    raise
+
+                err_code, err_msg = self.__handle_error(e)
+
+            return (status, err_code, None, [], err_msg)
+
+    def __handle_error(self, e: Exception) -> Tuple[int, str]:
+        self.db.rollback()
+
+        err_code, err_msg = e.args if (len(e.args) == 2) else (0, str(e))
+
+        logger = self._logger if self._logger is not None else logging
+        logger.error(f"MySQL error {err_code}: {err_msg}")
+
+        return (err_code, err_msg)
+
+    def close(self) -> None:
+        with self.lock_exec:
+            self.db.close()
+
     def transaction(self):
         class TransactionManager():
             def __init__(self, outer: 'MySQL') -> None:
                 self.outer = outer
 
             def __enter__(self) -> 'MySQL':
+                # The connection is shared, other threads wait for the end of the transaction
+                self.outer.lock_exec.acquire()
                 self.outer.db.autocommit(False)
+                self.outer._in_transaction = True
 
                 return self.outer
 
             def __exit__(self, exc_type, exc_val, exc_tb):
-                if exc_type is None:
-                    self.outer.db.commit()
+                try:
+                    if exc_type is None:
+                        self.outer.db.commit()
+                    else:
+                        self.outer.db.rollback()
+
+                finally:
+                    self.outer._in_transaction = False
                     self.outer.db.autocommit(True)
+                    self.outer.lock_exec.release()
 
         return TransactionManager(self)
@@ -13,55 +13,112 @@ import os
 import sqlite3
 import threading
 
-from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from .common import \
     IDBCommon, RetIndices, \
-    covert_to_sql_type, check_database_selected, check_data_field_type, \
-    check_database_exists, check_table_exists
+    covert_to_sql_type, check_database_selected, check_data_field_type, check_batch_field_type, \
+    check_database_exists, check_table_exists, keyset_conditions, observe_execute
 
 
-class Singleton:
-    __instances = {}
+class ConnectionEntry():
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+        # Serialize statements and transactions on the connection
+        self.lock = threading.RLock()
+
+        # Number of executions holding this entry, busy entries are never evicted
+        self.users = 0
+
+
+class ConnectionRegistry():
+    """Long-lived connections keyed by `(root_dir, database)`, shared by every `SQLite` instance
+    of the process. Idle connections are closed in LRU order once there are too many of them.
+    """
+    MAX_CONNECTIONS = 64
+
+    __entries: 'OrderedDict[Tuple[str, str], ConnectionEntry]' = OrderedDict()
     __lock = threading.Lock()
 
+    # Connections of the parent process, kept open but never used again in a forked child
+    __inherited: List[ConnectionEntry] = []
+
     @classmethod
-    def set(cls, raw_key, new_key, prop_dict):
+    def acquire(cls, root_dir: str, database_name: str) -> ConnectionEntry:
+        key = (os.path.abspath(root_dir), database_name)
+
         with cls.__lock:
-            cls.__instances[new_key] = {
-                'count': 1,
-                'value': prop_dict
-            }
-            if (raw_key in cls.__instances):
-                cls.__instances[raw_key]['count'] -= 1
-                if (cls.__instances[raw_key]['count'] == 0):
-                    del cls.__instances[raw_key]
+            entry = cls.__entries.get(key)
+            if (entry is None):
+                file_path = os.path.join(key[0], f"{database_name}.db")
+                entry = ConnectionEntry(sqlite3.connect(file_path, check_same_thread=False))
+                cls.__entries[key] = entry
+                cls.__evict()
+            else:
+                cls.__entries.move_to_end(key)
+
+            entry.users += 1
+
+        return entry
 
     @classmethod
-    def get(cls, raw_key, key):
-        instance = None
+    def release(cls, entry: ConnectionEntry) -> None:
         with cls.__lock:
-            if (raw_key in cls.__instances):
-                cls.__instances[raw_key]['count'] -= 1
-                if (cls.__instances[raw_key]['count'] == 0):
-                    del cls.__instances[raw_key]
+            entry.users -= 1
+
+    @classmethod
+    def close(cls, root_dir: str, database_name: str) -> None:
+        key = (os.path.abspath(root_dir), database_name)
 
-            if (key in cls.__instances):
-                cls.__instances[key]['count'] += 1
-                instance = cls.__instances[key]['value']
+        with cls.__lock:
+            entry = cls.__entries.pop(key, None)
 
-        return instance
+        if (entry is not None):
+            with entry.lock:
+                entry.connection.close()
+
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        """SQLite connections and their locks must not cross a fork, the child opens its own.
+        The inherited ones are not closed either, it would touch the files of the parent.
+        """
+        cls.__inherited.extend(cls.__entries.values())
+        cls.__entries = OrderedDict()
+        cls.__lock = threading.Lock()
+
+    @classmethod
+    def __evict(cls) -> None:
+        for key in list(cls.__entries.keys()):
+            if (len(cls.__entries) <= cls.MAX_CONNECTIONS):
+                break
+
+            entry = cls.__entries[key]
+            if (entry.users != 0):
+                continue
+
+            del cls.__entries[key]
+            entry.connection.close()
+
+
+if (hasattr(os, "register_at_fork")):
+    os.register_at_fork(after_in_child=ConnectionRegistry._reset_after_fork)
 
 
 SQL_DICT = {
     'check_table_exists': "SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'",
     'create_table': "CREATE TABLE IF NOT EXISTS `{table_name}` ({columns})",
     'drop_table': "DROP TABLE IF EXISTS `{table_name}`",
+    'create_index': "CREATE INDEX IF NOT EXISTS `{index_name}` ON `{table_name}` ({columns})",
 
     'insert_data': "INSERT INTO `{table_name}` ({columns}) VALUES ({values})",
+    'upsert_data': "INSERT INTO `{table_name}` ({columns}) VALUES ({values}) ON CONFLICT ({keys}) DO UPDATE SET {sets}",
     'delete_data': "DELETE FROM `{table_name}` {condition}",
     'update_data': "UPDATE `{table_name}` SET {sets} {condition}",
-    'select_data': "SELECT * FROM `{table_name}` {condition}"
+    'select_data': "SELECT * FROM `{table_name}` {condition}",
+    'select_columns': "SELECT {columns} FROM `{table_name}` WHERE {conditions} ORDER BY {columns} LIMIT {limit}",
+    'exists_data': "SELECT 1 FROM `{table_name}` WHERE {conditions} LIMIT 1"
 }
 
 
@@ -70,20 +127,38 @@ class SQLite(IDBCommon):
                  root_dir: str
                  ) -> None:
 
-        super().__init__()
-
-        self.is_db_close: bool = True
-        self.db: sqlite3.Connection | None = None
-        self.cursor: sqlite3.Cursor | None = None
+        # The selected database and the autocommit flag belong to the calling thread,
+        # the database selected by the thread creating the instance is the default of the others.
+        self.__local = threading.local()
+        self.__default_database_name: Optional[str] = None
+        self.__owner_thread = threading.get_ident()
 
-        self.lock_exec = threading.Lock()
-        self.autocommit: bool = True
+        super().__init__()
 
         self.root_dir = root_dir
 
         self._register_database_exists_func(self.is_database_exists)
         self._register_table_exists_func(self.is_table_exists)
 
+    @property
+    def _curr_database_name(self) -> Optional[str]:
+        return getattr(self.__local, 'database_name', self.__default_database_name)
+
+    @_curr_database_name.setter
+    def _curr_database_name(self, database_name: Optional[str]) -> None:
+        self.__local.database_name = database_name
+
+        if (threading.get_ident() == self.__owner_thread):
+            self.__default_database_name = database_name
+
+    @property
+    def autocommit(self) -> bool:
+        return getattr(self.__local, 'autocommit', True)
+
+    @autocommit.setter
+    def autocommit(self, autocommit: bool) -> None:
+        self.__local.autocommit = autocommit
+
     def is_database_exists(self, database_name: str) -> bool:
         file_path = os.path.join(self.root_dir, f"{database_name}.db")
 
@@ -117,33 +192,16 @@ class SQLite(IDBCommon):
 
     @check_database_exists
     def switch_database(self, database_name: str) -> bool:
-        raw_key = (self.root_dir, self._curr_database_name)
-
-        # Detach __dict__ quote
-        self.__dict__ = self.__dict__.copy()
-
-        prop_dict = Singleton.get(raw_key, (self.root_dir, database_name))
-        if (prop_dict is not None):
-            self.__dict__ = prop_dict
-            self._curr_database_name = database_name
-            return True
-
-        file_path = os.path.join(self.root_dir, f"{database_name}.db")
-
-        # Create new database instance
-        self.db = sqlite3.connect(file_path, check_same_thread=False)
-        self.cursor = self.db.cursor()
+        # Connections live in the registry, switching is only a name change
         self._curr_database_name = database_name
 
-        # Update instances
-        Singleton.set(raw_key, (self.root_dir, database_name), self.__dict__)
-
         return True
 
     @check_database_exists
     def drop_database(self, database_name: str) -> bool:
         file_path = os.path.join(self.root_dir, f"{database_name}.db")
 
+        ConnectionRegistry.close(self.root_dir, database_name)
         os.remove(file_path)
 
         return True
@@ -152,7 +210,8 @@ class SQLite(IDBCommon):
     @check_table_exists
     def create_table(self,
                      table_name: str,
-                     column_infos: List[Tuple[str, Any]]) -> bool:
+                     column_infos: List[Tuple[str, Any]],
+                     primary_keys: Optional[List[str]] = None) -> bool:
 
         columns = []
 
@@ -160,6 +219,9 @@ class SQLite(IDBCommon):
             type_str = covert_to_sql_type(value)
             columns.append(f"{name} {type_str}")
 
+        if (primary_keys):
+            columns.append(f"PRIMARY KEY ({','.join(primary_keys)})")
+
         sql = SQL_DICT['create_table'].format(
             table_name=table_name,
             columns=str(",".join(columns))
@@ -167,6 +229,21 @@ class SQLite(IDBCommon):
 
         return self.execute(sql)[RetIndices.STATUS]
 
+    @check_database_selected
+    @check_table_exists
+    def create_index(self,
+                     table_name: str,
+                     index_name: str,
+                     column_names: Sequence[str]) -> bool:
+
+        sql = SQL_DICT['create_index'].format(
+            table_name=table_name,
+            index_name=index_name,
+            columns=",".join(f"`{column}`" for column in column_names)
+        )
+
+        return self.execute(sql)[RetIndices.STATUS]
+
     @check_database_selected
     @check_table_exists
     def drop_table(self, table_name: str) -> bool:
@@ -197,6 +274,44 @@ class SQLite(IDBCommon):
 
         return exec_ret[RetIndices.STATUS]
 
+    @check_database_selected
+    @check_table_exists
+    @check_batch_field_type
+    def insert_many(self,
+                    table_name: str,
+                    column_names: Sequence[str],
+                    rows: Sequence[Sequence[Any]]) -> bool:
+
+        sql = SQL_DICT['insert_data'].format(
+            table_name=table_name,
+            columns=",".join(column_names),
+            values=",".join(["?" for _ in range(len(column_names))])
+        )
+
+        return self.execute_many(sql, rows)[RetIndices.STATUS]
+
+    @check_database_selected
+    @check_table_exists
+    @check_data_field_type
+    def upsert(self,
+               table_name: str,
+               data: Dict[str, Any],
+               primary_keys: List[str]) -> bool:
+
+        sets = ",".join(
+            f"`{column}`=excluded.`{column}`" for column in data.keys() if column not in primary_keys
+        )
+
+        sql = SQL_DICT['upsert_data'].format(
+            table_name=table_name,
+            columns=",".join(data.keys()),
+            values=",".join(["?" for _ in range(len(data))]),
+            keys=",".join(primary_keys),
+            sets=sets
+        )
+
+        return self.execute(sql, tuple(data.values()))[RetIndices.STATUS]
+
     @check_database_selected
     @check_table_exists
     def delete(self,
@@ -225,6 +340,43 @@ class SQLite(IDBCommon):
 
         return (exec_ret[RetIndices.COLUMN_NAME], exec_ret[RetIndices.RESULT])
 
+    @check_database_selected
+    @check_table_exists
+    def select_columns(self,
+                       table_name: str,
+                       column_names: Sequence[str],
+                       limit: int,
+                       after: Optional[Sequence[Any]] = None) -> List:
+
+        # Keyset pagination, a chunk costs the same at the end of the table as at its start
+        conditions, values = keyset_conditions(column_names, after, "?")
+
+        sql = SQL_DICT['select_columns'].format(
+            table_name=table_name,
+            columns=",".join(f"`{column}`" for column in column_names),
+            conditions=conditions,
+            limit=int(limit)
+        )
+
+        return self.execute(sql, values)[RetIndices.RESULT]
+
+    @check_database_selected
+    @check_table_exists
+    def exists(self,
+               table_name: str,
+               data: Dict[str, Any]) -> bool:
+
+        conditions = " AND ".join(
+            f"`{column}`=?" for column in data.keys()
+        )
+
+        sql = SQL_DICT['exists_data'].format(
+            table_name=table_name,
+            conditions=conditions
+        )
+
+        return len(self.execute(sql, tuple(data.values()))[RetIndices.RESULT]) != 0
+
     @check_database_selected
     @check_table_exists
     @check_data_field_type
@@ -234,7 +386,7 @@ class SQLite(IDBCommon):
                condition: str) -> bool:
 
         sets = ",".join(
-            f"`{column}`={value}" for column, value in data.items()
+            f"`{column}`=?" for column in data.keys()
         )
 
         sql = SQL_DICT['update_data'].format(
@@ -243,43 +395,93 @@ class SQLite(IDBCommon):
             condition=condition
         )
 
-        return self.execute(sql)[RetIndices.STATUS]
+        return self.execute(sql, tuple(data.values()))[RetIndices.STATUS]
 
+    @observe_execute
     def execute(self, sql: str, data: Tuple = ()) -> Tuple:
-        with self.lock_exec:
-            status = False
-            err_code = 0
-            err_msg = None
+        entry = ConnectionRegistry.acquire(self.root_dir, self._curr_database_name)
+
+        try:
+            with entry.lock:
+                status = False
+                err_code = 0
+                err_msg = None
+
+                try:
+                    cursor = entry.connection.execute(sql, data)
+                    if self.autocommit:
+                        entry.connection.commit()
+
+                    status = True
+
+                except Exception as e:
+                    entry.connection.rollback()
+                    err_msg = e.args[0]
+                    raise e
+
+                column_name = list(zip(*cursor.description))[0] if (cursor.description is not None) else None
 
-            try:
-                self.cursor.execute(sql, data)
-                if self.autocommit:
-                    self.db.commit()
+                return (status, err_code, column_name, cursor.fetchall(), err_msg)
 
-                status = True
+        finally:
+            ConnectionRegistry.release(entry)
 
-            except Exception as e:
-                self.db.rollback()
-                err_msg = e.args[0]
-                raise e
+    @observe_execute
+    def execute_many(self, sql: str, data_list: Sequence[Sequence[Any]]) -> Tuple:
+        entry = ConnectionRegistry.acquire(self.root_dir, self._curr_database_name)
 
-            column_name = list(zip(*self.cursor.description))[0] if (self.cursor.description is not None) else None
+        try:
+            with entry.lock:
+                status = False
+                err_code = 0
+                err_msg = None
 
-            return (status, err_code, column_name, self.cursor.fetchall(), err_msg)
+                try:
+                    entry.connection.executemany(sql, data_list)
+                    if self.autocommit:
+                        entry.connection.commit()
+
+                    status = True
+
+                except Exception as e:
+                    entry.connection.rollback()
+                    err_msg = e.args[0]
+                    raise e
+
+                return (status, err_code, None, [], err_msg)
+
+        finally:
+            ConnectionRegistry.release(entry)
+
+    def close(self) -> None:
+        """Close the connection of the current database, e.g. one opened by the manager for a container."""
+        if (self._curr_database_name is not None):
+            ConnectionRegistry.close(self.root_dir, self._curr_database_name)
 
     def transaction(self):
         class TransactionManager():
             def __init__(self, outer: 'SQLite') -> None:
                 self.outer = outer
+                self.entry: Optional[ConnectionEntry] = None
 
             def __enter__(self) -> 'SQLite':
+                # Hold the connection for the whole transaction
+                self.entry = ConnectionRegistry.acquire(self.outer.root_dir, self.outer._curr_database_name)
+                self.entry.lock.acquire()
                 self.outer.autocommit = False
 
                 return self.outer
 
             def __exit__(self, exc_type, exc_val, exc_tb):
-                if exc_type is None:
-                    self.outer.db.commit()
+                try:
+                    if exc_type is None:
+                        self.entry.connection.commit()
+                    else:
+                        self.entry.connection.rollback()
+
+                finally:
                     self.outer.autocommit = True
+                    self.entry.lock.release()
+                    ConnectionRegistry.release(self.entry)
 
         return TransactionManager(self)
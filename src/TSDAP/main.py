@@ -18,6 +18,7 @@ from typing import Any, Dict
 from console import MainConsole
 from runtime import RuntimeContext as ctx
 from spider import SpiderManager
+from utils.prometheus import MetricsServer
 
 
 def init_context():
@@ -53,11 +54,30 @@ def init_envs():
     os.makedirs(ctx.multiprocess_get_global("Spiders.CONTAINER_ROOT_DIR"), exist_ok=True)
 
 
+def init_metrics():
+    # Opt-in, disabled when the port is 0 or missing
+    port = ctx.process_get_global("Runtimes.METRICS_PORT")
+    if (not port):
+        return
+
+    spider_manager: SpiderManager = ctx.process_get_instance("SpiderManager")
+
+    metrics_server = MetricsServer(
+        spider_manager.collect_metrics,
+        port,
+        ctx.process_get_global("Runtimes.METRICS_HOST") or "127.0.0.1"
+    )
+    metrics_server.start()
+
+    ctx.process_set_global("metrics_server", metrics_server)
+
+
 def main():
     init_context()
     init_platforms()
     load_configs()
     init_envs()
+    init_metrics()
 
     console = MainConsole()
     console.cmdloop()
@@ -9,8 +9,9 @@
 '''
 
 
-from multiprocessing import Manager
-from typing import Any, Callable, Type
+from multiprocessing import Manager, Value
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Type
 
 
 class RuntimeContext():
@@ -22,11 +23,20 @@ class RuntimeContext():
     _multiprocess_manager = None
     _multiprocess_globals = None
 
+    # Version of the shared globals, bumped by every write
+    _multiprocess_version = None
+
+    # Read only copy of the shared globals in this process, and the version it was taken at
+    _multiprocess_snapshot: Mapping[str, Any] = MappingProxyType({})
+    _multiprocess_snapshot_version = 0
+    _multiprocess_subscribers: List[Callable[[Dict[str, Any]], None]] = []
+
     @classmethod
     def initialize(cls):
         if cls._multiprocess_manager is None:
             cls._multiprocess_manager = Manager()
             cls._multiprocess_globals = cls._multiprocess_manager.dict()
+            cls._multiprocess_version = Value('Q', 0)
 
     @classmethod
     def process_register_creator(cls, key: str, creator: Type[object]) -> None:
@@ -53,13 +63,60 @@ class RuntimeContext():
     def process_get_global(cls, key: Any) -> Any:
         return cls._process_globals.get(key, None)
 
+    @classmethod
+    def multiprocess_attach(cls, _multiprocess_globals, _multiprocess_version) -> None:
+        """Use the shared globals of the parent process, in a child process."""
+        cls._multiprocess_globals = _multiprocess_globals
+        cls._multiprocess_version = _multiprocess_version
+        cls._multiprocess_snapshot_version = -1
+        cls.multiprocess_refresh()
+
     @classmethod
     def multiprocess_set_global(cls, key: str, value: Any) -> None:
         cls._multiprocess_globals[key] = value
 
+        with cls._multiprocess_version.get_lock():
+            cls._multiprocess_version.value += 1
+
+        # The writer sees its own writes at once
+        cls.multiprocess_refresh()
+
     @classmethod
     def multiprocess_get_global(cls, key: str) -> Any:
-        return cls._multiprocess_globals.get(key, None)
+        return cls._multiprocess_snapshot.get(key, None)
+
+    @classmethod
+    def multiprocess_version(cls) -> int:
+        return cls._multiprocess_snapshot_version
+
+    @classmethod
+    def multiprocess_subscribe(cls, callback: Callable[[Dict[str, Any]], None]) -> None:
+        """Call `callback` with the changed keys and their values, when a refresh takes a new snapshot."""
+        cls._multiprocess_subscribers.append(callback)
+
+    @classmethod
+    def multiprocess_refresh(cls) -> bool:
+        """Take a new snapshot if the shared globals were written since the last one.
+        Cheap when they were not, a shared counter is read.
+        """
+        version = cls._multiprocess_version.value
+        if (version == cls._multiprocess_snapshot_version):
+            return False
+
+        snapshot = dict(cls._multiprocess_globals.items())
+        changes = {
+            key: value
+            for key, value in snapshot.items()
+            if (key not in cls._multiprocess_snapshot or cls._multiprocess_snapshot[key] != value)
+        }
+
+        cls._multiprocess_snapshot = MappingProxyType(snapshot)
+        cls._multiprocess_snapshot_version = version
+
+        for callback in cls._multiprocess_subscribers:
+            callback(changes)
+
+        return True
 
     @classmethod
     def unload(cls) -> None:
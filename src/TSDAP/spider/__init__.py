@@ -1,10 +1,11 @@
 from .context import SpiderContext
 from .manager import SpiderManager
-from .spider import ISpider, SpiderWarnings
+from .spider import IAsyncSpider, ISpider, SpiderWarnings
 
 __all__ = [
     "SpiderContext",
     "SpiderManager",
     "ISpider",
+    "IAsyncSpider",
     "SpiderWarnings"
 ]
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   buffer.py
+@Time    :   2026/10/19 18:02:37
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Column-major row buffers between a spider and the data sink
+'''
+
+
+import select
+import socket
+import sys
+import threading
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+class RowBuffer():
+    """Rows of one table with one column set, the values are stored column by column,
+    the column names are kept once instead of once per row.
+    """
+    __slots__ = ("table_name", "column_names", "columns")
+
+    def __init__(self, table_name: str, column_names: Tuple[str, ...]) -> None:
+        self.table_name = table_name
+        self.column_names = column_names
+        self.columns: List[List[Any]] = [[] for _ in column_names]
+
+    def __len__(self) -> int:
+        return len(self.columns[0]) if self.columns else 0
+
+    def append(self, values: Iterable[Any]) -> None:
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+    def extend_rows(self, rows: Sequence[Sequence[Any]]) -> None:
+        for index, column in enumerate(self.columns):
+            column.extend(row[index] for row in rows)
+
+    def extend_columns(self, values: Sequence[Sequence[Any]]) -> None:
+        for column, column_values in zip(self.columns, values):
+            column.extend(column_values)
+
+    def rows(self) -> List[Tuple[Any, ...]]:
+        """Row tuples for `insert_many`."""
+        return list(zip(*self.columns))
+
+    def approx_size(self) -> int:
+        size = sys.getsizeof(self.columns)
+        for column in self.columns:
+            size += sys.getsizeof(column) + sum(sys.getsizeof(value) for value in column)
+
+        return size
+
+
+class RowBuffers():
+    """The row buffers of a container, one per table and column set.
+    Writers block while `max_rows` rows are waiting, until the context drains the buffers.
+
+    Watermarks advanced by the spider wait here too, so a drain always hands over
+    a watermark together with the rows written before it.
+    """
+    def __init__(self, max_rows: int) -> None:
+        self.max_rows = max_rows
+
+        self.__buffers: Dict[Tuple[str, Tuple[str, ...]], RowBuffer] = {}
+        self.__rows = 0
+        self.__watermarks: Dict[str, Any] = {}
+        self.__condition = threading.Condition()
+
+        # Wakes up the context as soon as the buffers are full. A socket rather than an event,
+        # a signal handler can write to it too, through `signal.set_wakeup_fd`.
+        self.__wake_reader, self.__wake_writer = socket.socketpair()
+        self.__wake_reader.setblocking(False)
+        self.__wake_writer.setblocking(False)
+
+    def __len__(self) -> int:
+        return self.__rows
+
+    def full(self) -> bool:
+        return self.__rows >= self.max_rows
+
+    def wait_full(self, timeout: float) -> bool:
+        """Wait until the buffers are full or a byte comes on `wakeup_fd`, at most `timeout` seconds.
+        Returns whether the buffers are full.
+        """
+        if (self.full()):
+            return True
+
+        if (select.select([self.__wake_reader], [], [], timeout)[0]):
+            try:
+                while self.__wake_reader.recv(4096):
+                    pass
+
+            except BlockingIOError:
+                pass
+
+        return self.full()
+
+    def wakeup_fd(self) -> int:
+        """Writing a byte to this descriptor returns from `wait_full`."""
+        return self.__wake_writer.fileno()
+
+    def __added(self, rows: int) -> None:
+        was_full = self.full()
+
+        self.__rows += rows
+        if (not was_full and self.full()):
+            try:
+                self.__wake_writer.send(b"\0")
+
+            except BlockingIOError:
+                # Enough wake ups are pending already
+                pass
+
+    def __get_buffer(self, table_name: str, column_names: Tuple[str, ...], block: bool) -> Optional[RowBuffer]:
+        # Caller holds the condition, waits until there is room
+        while (self.__rows >= self.max_rows):
+            if (not block):
+                return None
+
+            self.__condition.wait()
+
+        key = (table_name, column_names)
+        buffer = self.__buffers.get(key)
+        if (buffer is None):
+            buffer = RowBuffer(table_name, column_names)
+            self.__buffers[key] = buffer
+
+        return buffer
+
+    def put_row(self, table_name: str, data: Dict[str, Any], block: bool = True) -> bool:
+        """Buffer a row, returns False instead of waiting when full and not `block`."""
+        with self.__condition:
+            buffer = self.__get_buffer(table_name, tuple(data.keys()), block)
+            if (buffer is None):
+                return False
+
+            buffer.append(data.values())
+            self.__added(1)
+
+        return True
+
+    def put_rows(self,
+                 table_name: str,
+                 column_names: Tuple[str, ...],
+                 rows: Sequence[Sequence[Any]],
+                 block: bool = True) -> bool:
+
+        # A batch is accepted whole, even past `max_rows`
+        with self.__condition:
+            buffer = self.__get_buffer(table_name, column_names, block)
+            if (buffer is None):
+                return False
+
+            buffer.extend_rows(rows)
+            self.__added(len(rows))
+
+        return True
+
+    def put_columns(self,
+                    table_name: str,
+                    column_names: Tuple[str, ...],
+                    values: Sequence[Sequence[Any]],
+                    block: bool = True) -> bool:
+
+        with self.__condition:
+            buffer = self.__get_buffer(table_name, column_names, block)
+            if (buffer is None):
+                return False
+
+            buffer.extend_columns(values)
+            self.__added(len(values[0]))
+
+        return True
+
+    def put_watermark(self, source: str, value: Any) -> None:
+        with self.__condition:
+            self.__watermarks[source] = value
+
+    def get_watermark(self, source: str) -> Any:
+        with self.__condition:
+            return self.__watermarks.get(source)
+
+    def drain(self) -> Tuple[List[RowBuffer], Dict[str, Any]]:
+        """Take every buffered row and pending watermark, and wake up the blocked writers."""
+        with self.__condition:
+            buffers = [buffer for buffer in self.__buffers.values() if len(buffer) != 0]
+            watermarks = self.__watermarks
+
+            self.__buffers = {}
+            self.__rows = 0
+            self.__watermarks = {}
+            self.__condition.notify_all()
+
+        return (buffers, watermarks)
+
+    def requeue(self, buffers: List[RowBuffer], watermarks: Dict[str, Any]) -> None:
+        """Put drained rows and watermarks back after a failed flush, ahead of the ones written since."""
+        with self.__condition:
+            for buffer in buffers:
+                key = (buffer.table_name, buffer.column_names)
+                rows = len(buffer)
+
+                written = self.__buffers.get(key)
+                if (written is not None):
+                    buffer.extend_columns(written.columns)
+                self.__buffers[key] = buffer
+
+                self.__added(rows)
+
+            self.__watermarks = dict(watermarks, **self.__watermarks)
+
+    def approx_size(self) -> int:
+        with self.__condition:
+            return sys.getsizeof(self.__buffers) + sum(buffer.approx_size() for buffer in self.__buffers.values())
@@ -11,9 +11,12 @@
 
 import ctypes
 
-from enum import IntEnum
+from enum import Enum, IntEnum
 from multiprocessing.managers import SyncManager
 
+from .control import ControlBlock
+from .metrics import ContainerMetrics
+
 
 class SpiderCodes(IntEnum):
     STATUS_SUCCESS = 0
@@ -28,16 +31,31 @@ class ContainerStatus(IntEnum):
     TERMINATED = -1
 
 
+class OverlapPolicy(str, Enum):
+    SKIP = "skip"
+    QUEUE = "queue"
+
+
 class SpiderShares():
     def __init__(self, manager: SyncManager) -> None:
-        self.is_stop_event = manager.Event()
-
-        self.is_daemon = manager.Value(ctypes.c_bool, False)
         self.is_dog_trigger = manager.Value(ctypes.c_bool, False)
 
-        self.is_logs = manager.Value(ctypes.c_bool, False)
         self.logs = manager.Value(ctypes.c_wchar_p, "")
 
         self.spider_db_dir = manager.Value(ctypes.c_wchar_p, "")
 
+        # Profile requests, the report is written back when the profile is done
+        self.profile_seconds = manager.Value(ctypes.c_double, 0)
+        self.profile_report = manager.Value(ctypes.c_wchar_p, "")
+
+        # Memory snapshot requests, the command is one of `snap`, `on` and `off`
+        self.memsnap_command = manager.Value(ctypes.c_wchar_p, "")
+        self.memsnap_report = manager.Value(ctypes.c_wchar_p, "")
+
         self.ret_code = manager.Value(ctypes.c_byte, 0)
+
+        # Raw shared memory, handed over when the context process is spawned
+        self.metrics = ContainerMetrics()
+
+        # Stop, daemon and console request flags, read at every checkpoint
+        self.control = ControlBlock()
@@ -9,29 +9,55 @@
 '''
 
 
-import base64
+import asyncio
 import logging
 import importlib.util
 import io
 import os
 import pickle
+import signal
+import site
 import sys
 
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Event
-from queue import Queue
-from time import sleep
-from threading import Thread, Timer
-from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Tuple, Type, Union
+from time import monotonic, perf_counter, time_ns
+from threading import Lock, Thread
+from typing import Any, Callable, Dict, Iterable, Mapping, Optional, Sequence, Tuple, Type, Union
 
-from database import MySQL, SQLite
+from database import IDBCommon, MySQL, SQLite
+from database.common import set_execute_observer
 from runtime import RuntimeContext as ctx
 
+from .buffer import RowBuffer, RowBuffers
 from .common import SpiderCodes, SpiderShares
-from .spider import SpiderWarnings, ISpider
+from .control import ControlSlots, LocalControl
+from .dedup import ScalableBloomFilter, TableDedup, filter_file_name
+from .http import HttpClient
+from .http_cache import HttpCache
+from .memsnap import MemorySnapshots, approx_size
+from .metrics import ContainerMetrics, MetricSlots
+from .offload import SpiderProcessPool
+from .pool import PooledThread, SpiderThreadPool
+from .profiler import SamplingProfiler
+from .stores import StateStore, Watermarks
+from .spider import IAsyncSpider, ISpider
 
 
 DEFAULT_SPIDER_DIR: Optional[str] = None
 
+# Rows waiting for the sink before the spider blocks
+ROW_BUFFER_MAX_ROWS = 100
+
+# Seconds between two write-backs of the spider states
+STATE_FLUSH_INTERVAL = 5
+
+# Threads of an event loop for the blocking database calls of an async spider
+ASYNC_EXECUTOR_WORKERS = 4
+
+# Seconds between two checks while a stopping spider finishes
+STOP_POLL_INTERVAL = 0.05
+
 
 class SpiderVirtualIO(io.StringIO):
     def __init__(self, initial_value: Optional[str] = None, newline: Optional[str] = None) -> None:
@@ -48,11 +74,15 @@ class SpiderVirtualIO(io.StringIO):
 
 
 class DatabaseLogHandler(logging.Handler):
-    def __init__(self, db_insert_func: Callable[[str, str, str], None], virtual_io: SpiderVirtualIO) -> None:
+    def __init__(self,
+                 db_insert_func: Callable[[str, str, str], None],
+                 virtual_io: SpiderVirtualIO,
+                 metrics: Optional[ContainerMetrics] = None) -> None:
         super().__init__()
 
         self.db_insert_func = db_insert_func
         self.virtual_io = virtual_io
+        self.metrics = metrics
 
     def emit(self, record: logging.LogRecord) -> None:
         if (self.formatter is None):
@@ -65,10 +95,31 @@ class DatabaseLogHandler(logging.Handler):
         )
         self.virtual_io.write(f"{self.formatter.format(record)}\n")
 
+        if (self.metrics is not None):
+            self.metrics.add(MetricSlots.LOG_LINES)
+
+
+def open_data_database(spider_db_dir: str) -> IDBCommon:
+    data_backend = (ctx.multiprocess_get_global("Spiders.DATA_BACKEND") or "MYSQL").upper()
+
+    if (data_backend == "SQLITE"):
+        # Local sink next to the spider database, for machines without a MySQL server
+        data_dir = os.path.join(spider_db_dir, "data")
+        os.makedirs(data_dir, exist_ok=True)
+
+        return SQLite(data_dir)
+
+    return MySQL(
+        ctx.multiprocess_get_global("Spiders.MYSQL_HOST"),
+        ctx.multiprocess_get_global("Spiders.MYSQL_PORT"),
+        ctx.multiprocess_get_global("Spiders.MYSQL_USER"),
+        ctx.multiprocess_get_global("Spiders.MYSQL_PASS")
+    )
+
 
 class SpiderContext():
     def __init__(self,
-                 user_spider_cls: Type['ISpider'],
+                 user_spider_cls: Type[Union['ISpider', 'IAsyncSpider']],
                  spider_name: str,
                  spider_shares: SpiderShares
                  ) -> None:
@@ -79,39 +130,182 @@ class SpiderContext():
 
         self.exception_occurred = Event()
 
-        self.queue: Queue[tuple] = Queue(maxsize=100)
+        self.row_buffers = RowBuffers(ROW_BUFFER_MAX_ROWS)
 
         self.user_spider_cls = user_spider_cls
-        self.thread_spider_main: Union['ISpider', None] = None
+        self.thread_spider_main: Union['ISpider', 'IAsyncSpider', None] = None
+
+        # Event loop and main task of an async spider
+        self.event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.async_main_task: Optional[asyncio.Task] = None
 
         self.spider_shares = spider_shares
+        self.metrics: ContainerMetrics = spider_shares.metrics
 
         self.spider_name = spider_name
 
-        if (not self.spider_shares.is_daemon.get()):
-            self.watch_dog = Timer(ctx.multiprocess_get_global("Spiders.WATCH_DOG_MAX_TIME"), self.__dog_trigger)
+        # Control flags mirrored in plain attributes, the checkpoints read them at every call
+        self.control = LocalControl(self.spider_shares.control)
+        self.is_daemon = self.control.daemon
+        self.WATCH_DOG_MAX_TIME = ctx.multiprocess_get_global("Spiders.WATCH_DOG_MAX_TIME")
 
-        self.db_data = MySQL(
-            ctx.multiprocess_get_global("Spiders.MYSQL_HOST"),
-            ctx.multiprocess_get_global("Spiders.MYSQL_PORT"),
-            ctx.multiprocess_get_global("Spiders.MYSQL_USER"),
-            ctx.multiprocess_get_global("Spiders.MYSQL_PASS")
-        )
+        # Monotonic deadline of the watch dog, checked by the context loop
+        self.dog_deadline = float("inf")
+
+        self.db_data = open_data_database(self.spider_shares.spider_db_dir.get())
         self.db_spider = SQLite(self.spider_shares.spider_db_dir.get())
+        self.state_store = StateStore(self.db_spider)
+        self.watermarks = Watermarks(self.db_data)
+        self.dedups: Dict[str, TableDedup] = {}
+
+        self.http_client: Optional[HttpClient] = None
+        self.__http_client_lock = Lock()
+
+        # Started by the first offload only, most spiders never need it
+        self.process_pool: Optional[SpiderProcessPool] = None
+        self.__process_pool_lock = Lock()
+        self.__watermarks_lock = Lock()
 
         self.THREAD_MAXIMUM = ctx.multiprocess_get_global("Spiders.THREAD_MAXIMUM")
+        self.ASYNC_CONCURRENCY = ctx.multiprocess_get_global("Spiders.ASYNC_CONCURRENCY") or 100
+        self.thread_pool = SpiderThreadPool(
+            self.THREAD_MAXIMUM,
+            ctx.multiprocess_get_global("Spiders.THREAD_QUEUE_SIZE") or self.THREAD_MAXIMUM * 4,
+            f"spider_<{self.spider_name}>_worker",
+            self.__on_task_exception
+        )
+
+        self.profile_thread: Optional[Thread] = None
+        self.memory_snapshots = MemorySnapshots()
+
+    def __submit_queue(self) -> int:
+        """Flush the buffers in one transaction, returns the number of rows committed."""
+        rows = 0
+        start_time = perf_counter()
+
+        buffers, watermarks = self.row_buffers.drain()
+
+        try:
+            with self.db_data.transaction() as transaction:
+                for buffer in buffers:
+                    rows += self.__insert_buffer(transaction, buffer)
+
+                # Same transaction as the rows, a watermark never gets ahead of them
+                if (watermarks):
+                    self.watermarks.write(transaction, watermarks)
+
+        except BaseException as e:
+            # Rolled back, the rows wait for the next flush or the spill at exit
+            self.row_buffers.requeue(buffers, watermarks)
+
+            if (isinstance(e, Exception)):
+                self.metrics.add(MetricSlots.DB_ERRORS)
+            raise
+
+        finally:
+            self.metrics.set(MetricSlots.QUEUE_DEPTH, len(self.row_buffers))
+
+        if (watermarks):
+            self.watermarks.mark_committed()
+
+        if (rows != 0):
+            self.metrics.observe_flush(rows, perf_counter() - start_time)
+
+        return rows
+
+    def __insert_buffer(self, transaction: IDBCommon, buffer: RowBuffer) -> int:
+        rows = buffer.rows()
+
+        dedup = self.dedups.get(buffer.table_name)
+        if (dedup is not None):
+            rows = dedup.filter(transaction, buffer.column_names, rows)
+            if (len(rows) == 0):
+                return 0
+
+        # A database error raises and aborts the whole flush, the rows are requeued.
+        # False is only the type check, which runs before the database is touched.
+        if (not transaction.insert_many(buffer.table_name, buffer.column_names, rows)):
+            # A mismatched type rejects the whole batch, insert row by row to only drop the bad rows
+            for row in rows:
+                transaction.insert(buffer.table_name, dict(zip(buffer.column_names, row)))
+
+        return len(rows)
+
+    def __get_spill_dir(self) -> str:
+        return os.path.join(self.spider_shares.spider_db_dir.get(), "spill")
+
+    def __spill(self) -> None:
+        buffers, watermarks = self.row_buffers.drain()
+        if (not buffers and not watermarks):
+            return
+
+        spill_dir = self.__get_spill_dir()
+        os.makedirs(spill_dir, exist_ok=True)
+
+        file_path = os.path.join(spill_dir, f"{self.spider_name}-{time_ns()}.pkl")
+        with open(f"{file_path}.tmp", "wb") as fp:
+            pickle.dump((
+                [(buffer.table_name, buffer.column_names, buffer.columns) for buffer in buffers],
+                watermarks
+            ), fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        # A spill file is whole or missing
+        os.replace(f"{file_path}.tmp", file_path)
+
+        self.logger.warning(f"{sum(len(buffer) for buffer in buffers)} rows spilled to '{file_path}'.")
+
+    def _replay_spills(self) -> None:
+        """Buffer again the rows spilled by the previous runs, before the spider starts."""
+        spill_dir = self.__get_spill_dir()
+        if (not os.path.isdir(spill_dir)):
+            return
+
+        for file_name in sorted(os.listdir(spill_dir)):
+            if (not file_name.endswith(".pkl")):
+                continue
+
+            file_path = os.path.join(spill_dir, file_name)
+            with open(file_path, "rb") as fp:
+                spilled_buffers, watermarks = pickle.load(fp)
+
+            buffers = []
+            for table_name, column_names, columns in spilled_buffers:
+                buffer = RowBuffer(table_name, column_names)
+                buffer.extend_columns(columns)
+                buffers.append(buffer)
+
+            # Buffered again before the file goes, a failure spills them once more
+            self.row_buffers.requeue(buffers, watermarks)
+            os.remove(file_path)
+
+            self.__submit_queue()
+
+    def _final_flush(self) -> None:
+        """Write the rows left in the buffers, to a spill file when the database fails,
+        then tell the manager they are safe.
+        """
+        try:
+            self.__submit_queue()
+
+        except Exception:
+            self.logger.error("Unable to write the buffered rows, spilling them to disk.", exc_info=True)
+
+            try:
+                self.__spill()
+
+            except Exception:
+                self.logger.error("Unable to spill the buffered rows, they are lost.", exc_info=True)
+                return
 
-    def __submit_queue(self) -> bool:
-        with self.db_data.transaction() as transaction:
-            while not self.queue.empty():
-                table_name, data = self.queue.get()
-                transaction.insert(table_name, data)
+        self.control.set(ControlSlots.FLUSHED)
 
     def _init_db_spider(self) -> None:
         self.db_spider.create_database(self.spider_name)
         self.db_spider.switch_database(self.spider_name)
 
-        self.db_spider.create_table("stores", list({'name': 'name', 'store_data': 'YQ=='}.items()))
+        self.state_store.init_table()
         self.db_spider.create_table("logs", list({
             'DATETIME': 'time_str',
             'LEVEL': 'level_str',
@@ -127,63 +321,158 @@ class SpiderContext():
         self.db_data.create_database(self.spider_name)
         self.db_data.switch_database(self.spider_name)
 
+        self.watermarks.init_table()
+
     def _feed_dog(self) -> None:
-        if (not self.spider_shares.is_daemon.get()):
-            self.watch_dog.cancel()
-            self.watch_dog = Timer(ctx.multiprocess_get_global("Spiders.WATCH_DOG_MAX_TIME"), self.__dog_trigger)
-            self.watch_dog.start()
+        # A single store, safe from any spider thread
+        self.dog_deadline = monotonic() + self.WATCH_DOG_MAX_TIME
+
+    def __check_dog(self) -> None:
+        if (not self.is_daemon and monotonic() > self.dog_deadline):
+            self.__dog_trigger()
 
     def __dog_trigger(self) -> None:
         self.spider_shares.is_dog_trigger.set(True)
-        self.spider_shares.is_stop_event.set()
+        self.control.set(ControlSlots.STOP)
 
     def __copy_logs(self) -> None:
         logs = self.spider_to_master_io.get_logs()
         self.spider_shares.logs.set(logs)
 
+    def __profile(self, seconds: float) -> None:
+        try:
+            profiler = SamplingProfiler()
+            profiler.run(seconds)
+
+            file_path = profiler.write_collapsed(self.spider_shares.spider_db_dir.get())
+
+            self.spider_shares.profile_report.set(f"{profiler.report()}\nCollapsed stacks written to '{file_path}'.")
+
+        except Exception as e:
+            self.logger.error("Unable to profile the spider.", exc_info=True)
+            self.spider_shares.profile_report.set(f"Unable to profile the spider: {e!r}")
+
+        finally:
+            # Left set, the context loop would start the profiler again on every iteration
+            self.control.set(ControlSlots.PROFILE, False)
+
+    def __start_profile(self) -> None:
+        if (self.profile_thread is not None and self.profile_thread.is_alive()):
+            return
+
+        # Sampled from its own thread, the context loop keeps running
+        self.profile_thread = Thread(target=self.__profile,
+                                     args=(self.spider_shares.profile_seconds.get(),),
+                                     name=f"spider_<{self.spider_name}>_profiler",
+                                     daemon=True)
+        self.profile_thread.start()
+
     def start(self) -> None:
-        self._init_spider()
+        # Not daemon spider, stop it when it didn't do something
+        self._feed_dog()
 
-        if (not self.spider_shares.is_daemon.get()):
-            # Not daemon spider, stop it when it didn't do something
-            self.watch_dog.start()
+        self._init_spider()
 
         # Context thread loop here
         main_thread = self.spider_threads[f"spider_<{self.spider_name}>_main"]
+        last_stores_flush = monotonic()
         while True:
-            if (self.queue.full()):
-                # Submit queue to database
+            if (self.row_buffers.full()):
+                # Submit buffered rows to database
                 self.__submit_queue()
 
-            if (self.spider_shares.is_logs.get()):
+            if (monotonic() - last_stores_flush >= STATE_FLUSH_INTERVAL):
+                self._flush_stores()
+                last_stores_flush = monotonic()
+
+            # Also refreshed by the control signal, this bounds the delay without it
+            self.control.refresh()
+
+            # Live updates of the settings, the others are only read at start
+            if (ctx.multiprocess_refresh()):
+                watch_dog_max_time = ctx.multiprocess_get_global("Spiders.WATCH_DOG_MAX_TIME")
+                self.dog_deadline += watch_dog_max_time - self.WATCH_DOG_MAX_TIME
+                self.WATCH_DOG_MAX_TIME = watch_dog_max_time
+
+            if (self.control.logs):
                 self.__copy_logs()
-                self.spider_shares.is_logs.set(False)
+                self.control.set(ControlSlots.LOGS, False)
 
-            if (self.spider_shares.is_stop_event.is_set()):
-                # Submit last queue
-                self.__submit_queue()
+            if (self.control.profile):
+                self.__start_profile()
+
+            if (self.control.memsnap):
+                self.__memsnap()
 
+            self.__check_dog()
+
+            if (self.control.stop):
+                # Queued tasks never start, the running ones stop at their next checkpoint
+                self.thread_pool.shutdown(cancel_futures=True)
+                self._close_process_pool()
+                self.__cancel_async_spider()
+
+                # The spider hangs, the rows it wrote are flushed at exit
                 if (self.spider_shares.is_dog_trigger.get()):
                     self.spider_shares.ret_code.set(SpiderCodes.STATUS_DOG_TRIGGER)
                     return
 
-                # Waiting spider main thread exit
-                while main_thread.is_alive():
-                    sleep(0.5)
+                # Waiting spider main thread exit, its writers must not block on full buffers meanwhile
+                while (main_thread.is_alive() or self.thread_pool.busy()):
+                    if (self.row_buffers.wait_full(STOP_POLL_INTERVAL)):
+                        self.__submit_queue()
 
-                # Kill self thread
+                # Kill self thread, the rows left are flushed at exit
                 self.spider_shares.ret_code.set(SpiderCodes.STATUS_SUCCESS)
                 return
 
-            if (not main_thread.is_alive()):
-                # Spider exit Unexpected
+            if (not main_thread.is_alive() and not self.thread_pool.busy() and not self.__is_offload_busy()):
+                # Spider exit Unexpected, what the spider and its tasks wrote is flushed at exit
                 status = SpiderCodes.STATUS_SUCCESS \
                     if not self.exception_occurred.is_set() else SpiderCodes.STATUS_EXIT_UNEXPECTED
 
                 self.spider_shares.ret_code.set(status.value)
                 return
 
-            sleep(0.5)    # Surrender CPU control
+            # Surrender CPU control, until the buffers are full
+            self.row_buffers.wait_full(0.5)
+
+    def _get_buffer_sizes(self) -> Dict[str, Tuple[int, int]]:
+        """`(items, bytes)` of the buffers owned by the platform."""
+        logs = self.spider_to_master_io.getvalue()
+
+        return {
+            'row_buffers': (len(self.row_buffers), self.row_buffers.approx_size()),
+            'virtual_io': (logs.count("\n"), sys.getsizeof(logs)),
+            'data_type_maps': (
+                sum(len(tables) for tables in self.db_data._type_map_for_tables.values()),
+                approx_size(self.db_data._type_map_for_tables, 4)
+            ),
+            'spider_type_maps': (
+                sum(len(tables) for tables in self.db_spider._type_map_for_tables.values()),
+                approx_size(self.db_spider._type_map_for_tables, 4)
+            ),
+            'spider_threads': (len(self.spider_threads), approx_size(self.spider_threads, 1)),
+            'thread_pool_tasks': (self.thread_pool.stats()[2], 0),
+            'offload_tasks': (self.process_pool.stats()[1] if self.process_pool is not None else 0, 0)
+        }
+
+    def __memsnap(self) -> None:
+        command = self.spider_shares.memsnap_command.get()
+
+        if (command == "on"):
+            self.memory_snapshots.enable()
+            report = "Allocation tracing started."
+
+        elif (command == "off"):
+            self.memory_snapshots.disable()
+            report = "Allocation tracing stopped."
+
+        else:
+            report = self.memory_snapshots.report(self._get_buffer_sizes())
+
+        self.spider_shares.memsnap_report.set(report)
+        self.control.set(ControlSlots.MEMSNAP, False)
 
     def _init_spider(self) -> None:
         self.thread_spider_main = self.user_spider_cls()
@@ -191,7 +480,8 @@ class SpiderContext():
         self.thread_spider_main.logger = self.logger
 
         thread = Thread(
-            target=self.thread_spider_main._run,
+            target=self.__run_async_spider if isinstance(self.thread_spider_main, IAsyncSpider)
+            else self.thread_spider_main._run,
             name=f"spider_<{self.spider_name}>_main",
             daemon=True
         )
@@ -200,72 +490,221 @@ class SpiderContext():
 
         thread.start()
 
-    def __clean_dead_threads(self) -> None:
-        threads_to_remove = []
-        for thread_name, thread in self.spider_threads.items():
-            if (not thread.is_alive()):
-                threads_to_remove.append(thread_name)
+    def __run_async_spider(self) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.set_default_executor(ThreadPoolExecutor(
+            max_workers=ASYNC_EXECUTOR_WORKERS,
+            thread_name_prefix=f"spider_<{self.spider_name}>_executor"
+        ))
+
+        self.event_loop = loop
+        self.async_main_task = loop.create_task(self.thread_spider_main._run())
+
+        # The stop request may have come before the task existed
+        if (self.control.stop):
+            self.async_main_task.cancel()
+
+        try:
+            loop.run_until_complete(self.async_main_task)
+
+        finally:
+            # Tasks left behind by the spider
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+
+    def __cancel_async_spider(self) -> None:
+        if (self.event_loop is None or self.async_main_task is None):
+            return
+
+        try:
+            self.event_loop.call_soon_threadsafe(self.async_main_task.cancel)
+
+        except RuntimeError:
+            # The loop is already closed
+            pass
 
-        # Delete recorded thread
-        for thread_name in threads_to_remove:
-            self.spider_threads.pop(thread_name)
+    def __on_task_exception(self, exception: BaseException) -> None:
+        self.logger.error("!!!Spider Exception!!!", exc_info=(type(exception), exception, exception.__traceback__))
+        self.exception_occurred.set()
 
     def _add_thread(self,
                     target_func: Callable,
                     thread_name: Union[str, None] = None,
                     args: Iterable[Any] = (),
-                    kwargs: Union[Mapping[str, Any], None] = None,
-                    daemon: Union[bool, None] = None) -> Union[Thread, None]:
+                    kwargs: Union[Mapping[str, Any], None] = None) -> PooledThread:
+
+        return PooledThread(self.thread_pool, target_func, thread_name, args, kwargs)
+
+    def _write_row(self, table_name: str, data: Dict[str, Any], block: bool = True) -> bool:
+        if (not self.row_buffers.put_row(table_name, data, block)):
+            return False
+
+        self.metrics.set(MetricSlots.QUEUE_DEPTH, len(self.row_buffers))
+        return True
+
+    def _write_columns(self,
+                       table_name: str,
+                       column_names: Tuple[str, ...],
+                       values: Sequence[Sequence[Any]],
+                       block: bool = True) -> bool:
+
+        if (not self.row_buffers.put_columns(table_name, column_names, values, block)):
+            return False
 
-        # Clean dead threads
-        self.__clean_dead_threads()
+        self.metrics.set(MetricSlots.QUEUE_DEPTH, len(self.row_buffers))
+        return True
 
-        if (len(self.spider_threads) > self.THREAD_MAXIMUM):
-            self.logger.warning(
-                SpiderWarnings.ThreadLimitWarning(f"Too many thread allocated, maximum is {self.THREAD_MAXIMUM}.")
-            )
-            return None
+    def _get_watermark(self, source: str, default: Any = None) -> Any:
+        value = self.row_buffers.get_watermark(source)
+        if (value is None):
+            value = self.watermarks.get(source)
 
-        if (thread_name is not None and thread_name in self.spider_threads):
-            self.logger.warning(
-                SpiderWarnings.ThreadRepeatWarning(f"Duplicate thread names: {thread_name}.")
-            )
-            return None
+        return default if value is None else value
 
-        thread = Thread(target=target_func, name=thread_name, args=args, kwargs=kwargs, daemon=daemon)
+    def _advance_watermark(self, source: str, value: Any) -> bool:
+        if (value is None):
+            raise ValueError("Watermark cannot be None")
 
-        self.spider_threads[thread.name] = thread
+        with self.__watermarks_lock:
+            current = self._get_watermark(source)
+            if (current is not None and value <= current):
+                return False
 
-        return thread
+            self.row_buffers.put_watermark(source, value)
 
-    def _push_data_to_queue(self, data: Tuple[str, Dict[str, Any]]) -> None:
-        self.queue.put(data)
+        return True
 
     def _new_table(self,
                    table_name: str,
-                   ref_data: Dict[str, Any]) -> bool:
+                   ref_data: Dict[str, Any],
+                   dedup_keys: Optional[Sequence[str]] = None) -> bool:
 
-        return self.db_data.create_table(table_name, list(ref_data.items()))
+        if (dedup_keys and any(column not in ref_data for column in dedup_keys)):
+            raise ValueError(f"Deduplication keys {tuple(dedup_keys)} are not all columns of '{table_name}'")
 
-    def _read_stores(self, name: str) -> Union[Dict[str, Any], None]:
-        status, results = self.db_spider.select("stores", f"WHERE name='{name}'")
-        if (len(results) != 0):
-            return pickle.loads(base64.b64decode(results[0][1]))
+        try:
+            status = self.db_data.create_table(table_name, list(ref_data.items()))
+
+        except Exception:
+            self.metrics.add(MetricSlots.DB_ERRORS)
+            raise
+
+        if (status and dedup_keys):
+            self.__enable_dedup(table_name, dedup_keys)
+
+        return status
+
+    def __enable_dedup(self, table_name: str, key_columns: Sequence[str]) -> None:
+        bloom_filter = ScalableBloomFilter(
+            os.path.join(self.spider_shares.spider_db_dir.get(), "dedup"),
+            filter_file_name(self.spider_name, table_name, key_columns),
+            ctx.multiprocess_get_global("Spiders.DEDUP_INITIAL_CAPACITY") or 100000,
+            ctx.multiprocess_get_global("Spiders.DEDUP_ERROR_RATE") or 0.001,
+            ctx.multiprocess_get_global("Spiders.DEDUP_MAX_SIZE") or 64 * 1024 * 1024
+        )
 
-        return None
+        dedup = TableDedup(table_name, key_columns, bloom_filter, self.metrics)
+        if (not dedup.create_index(self.db_data)):
+            # Still correct, each possible hit scans the table
+            self.logger.warning(f"Unable to index the deduplication keys of '{table_name}'.")
+
+        if (bloom_filter.is_new):
+            # The filter is younger than the table, e.g. dedup was just turned on
+            dedup.fill(self.db_data)
+
+        previous = self.dedups.get(table_name)
+        self.dedups[table_name] = dedup
+
+        if (previous is not None):
+            previous.bloom_filter.close()
+
+    def _get_http_client(self) -> HttpClient:
+        with self.__http_client_lock:
+            if (self.http_client is None):
+                retries = ctx.multiprocess_get_global("Spiders.HTTP_RETRIES")
+                cache = HttpCache(
+                    os.path.join(self.spider_shares.spider_db_dir.get(), "http_cache"),
+                    ctx.multiprocess_get_global("Spiders.HTTP_CACHE_MAX_SIZE") or 256 * 1024 * 1024
+                )
+                self.http_client = HttpClient(
+                    max_per_host=ctx.multiprocess_get_global("Spiders.HTTP_MAX_PER_HOST") or 8,
+                    rate_per_host=ctx.multiprocess_get_global("Spiders.HTTP_RATE_PER_HOST") or 0,
+                    retries=3 if retries is None else retries,
+                    timeout=ctx.multiprocess_get_global("Spiders.HTTP_TIMEOUT") or 30,
+                    cache=cache,
+                    cache_enabled=bool(ctx.multiprocess_get_global("Spiders.HTTP_CACHE")),
+                    metrics=self.metrics,
+                    async_workers=ctx.multiprocess_get_global("Spiders.HTTP_ASYNC_WORKERS") or 0
+                )
+
+            return self.http_client
+
+    def _get_process_pool(self) -> SpiderProcessPool:
+        with self.__process_pool_lock:
+            if (self.process_pool is None):
+                self.process_pool = SpiderProcessPool(
+                    ctx.multiprocess_get_global("Spiders.OFFLOAD_WORKERS") or os.cpu_count() or 1,
+                    ctx.multiprocess_get_global("Spiders.OFFLOAD_SHM_THRESHOLD") or 1024 * 1024,
+                    # Work done by the workers is progress of the spider
+                    self._feed_dog
+                )
+
+            return self.process_pool
+
+    def __is_offload_busy(self) -> bool:
+        return self.process_pool is not None and self.process_pool.busy()
+
+    def _close_process_pool(self) -> None:
+        with self.__process_pool_lock:
+            if (self.process_pool is not None):
+                self.process_pool.shutdown()
+
+    def _close_http_client(self) -> None:
+        if (self.http_client is not None):
+            self.http_client.close()
+
+    def _close_dedups(self) -> None:
+        for dedup in self.dedups.values():
+            dedup.bloom_filter.close()
+
+    def _read_stores(self, name: str) -> Union[Dict[str, Any], None]:
+        return self.state_store.get(name)
 
     def _write_stores(self, name: str, store_data: Dict[str, Any]) -> bool:
-        status, results = self.db_spider.select("stores", f"WHERE name='{name}'")
-        if (len(results) != 0):
-            self.db_spider.delete("stores", f"WHERE name=`{name}`")
+        self.state_store.set(name, store_data)
+        return True
+
+    def _flush_stores(self) -> None:
+        try:
+            self.state_store.flush()
+
+        except Exception:
+            self.metrics.add(MetricSlots.DB_ERRORS)
+            raise
+
+
+def __add_site_dir(site_dir: Optional[str]) -> None:
+    if (site_dir is None or not os.path.isdir(site_dir)):
+        return
+
+    site_dir = os.path.abspath(site_dir)
 
-        return self.db_spider.insert("stores", {
-            'name': name,
-            'store_data': str(base64.b64encode(pickle.dumps(store_data)), 'utf-8')
-        })
+    # Handle `.pth` files, then make the package environment win over the platform one
+    site.addsitedir(site_dir)
+    if (site_dir in sys.path):
+        sys.path.remove(site_dir)
+    sys.path.insert(0, site_dir)
 
 
-def __import_from_path(work_path: str, entry_relative_path: str, entry_filename: str) -> Union['ISpider', None]:
+def __import_from_path(work_path: str,
+                       entry_relative_path: str,
+                       entry_filename: str) -> Union[Type['ISpider'], Type['IAsyncSpider'], None]:
     # Add work directory to sys.path
     sys.path.insert(0, os.path.abspath(work_path))
     sys.path.insert(0, os.path.abspath(os.path.join(work_path, entry_relative_path)))
@@ -279,18 +718,20 @@ def __import_from_path(work_path: str, entry_relative_path: str, entry_filename:
     sys.modules[entry_filename] = module
     spec.loader.exec_module(module)
 
-    sub_classes = ISpider.__subclasses__()
+    sub_classes = ISpider.__subclasses__() + IAsyncSpider.__subclasses__()
 
     return sub_classes[0] if (len(sub_classes) == 1) else None
 
 
-def __create_logger(db_insert_func: Callable[[str, str], None], virtual_io: SpiderVirtualIO):
+def __create_logger(db_insert_func: Callable[[str, str], None],
+                    virtual_io: SpiderVirtualIO,
+                    metrics: Optional[ContainerMetrics] = None):
     logger_formatter = logging.Formatter("[%(asctime)s][%(levelname)s] - %(message)s")
 
     logger_sqlite = logging.getLogger("spider1")
     logger_sqlite.setLevel(logging.INFO)
 
-    logger_sqlite_handler = DatabaseLogHandler(db_insert_func, virtual_io)
+    logger_sqlite_handler = DatabaseLogHandler(db_insert_func, virtual_io, metrics)
     logger_sqlite_handler.setFormatter(logger_formatter)
     logger_sqlite.addHandler(logger_sqlite_handler)
 
@@ -305,12 +746,18 @@ def __init_envs(envs: Dict[str, str]):
 def context_main(context_infos: Dict[str, str],
                  envs: Dict[str, str],
                  _multiprocess_globals,
+                 _multiprocess_version,
                  spider_shares) -> bool:
 
-    ctx._multiprocess_globals = _multiprocess_globals
+    # Settings are read from a local snapshot from now on
+    ctx.multiprocess_attach(_multiprocess_globals, _multiprocess_version)
     ctx.process_set_global("spider_shares", spider_shares)
 
+    # Database latencies of this process go to the shared block of the container
+    set_execute_observer(spider_shares.metrics.observe_execute)
+
     __init_envs(envs)
+    __add_site_dir(context_infos.get('container_site_dir'))
 
     spider_name = context_infos['container_name']
     entry_file = context_infos['container_entry']
@@ -334,14 +781,34 @@ def context_main(context_infos: Dict[str, str],
 
     context = SpiderContext(spider_cls, spider_name, spider_shares)
 
+    # A request of the manager wakes up the context loop at once
+    context.control.listen(context.row_buffers.wakeup_fd())
+
+    # Terminated by the platform, the cleanup below still runs and stops the offload workers
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+
     sys.stdout = context.spider_to_master_io
     __create_logger(
         lambda datetime, level, msg:
             context.db_spider.insert('logs', {'DATETIME': datetime, 'LEVEL': level, 'MESSAGE': msg}),
-        context.spider_to_master_io
+        context.spider_to_master_io,
+        context.metrics
     )
 
     context._init_db_spider()
-    context.start()
+
+    try:
+        context._replay_spills()
+        context.start()
+
+    finally:
+        # Last rows, whichever way the context ends
+        context._close_process_pool()
+        context._final_flush()
+
+        # Write back the states left in the cache
+        context._close_http_client()
+        context._close_dedups()
+        context._flush_stores()
 
     return True
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   control.py
+@Time    :   2026/10/19 22:31:06
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Control flags of a container, in shared memory with a local mirror
+'''
+
+
+import os
+import signal
+
+from enum import IntEnum
+from multiprocessing.sharedctypes import RawArray
+from typing import Optional
+
+
+# Tells a container to refresh its mirror, None where the platform has no such signal
+CONTROL_SIGNAL = getattr(signal, "SIGUSR1", None)
+
+
+class ControlSlots(IntEnum):
+    STOP = 0
+    DAEMON = 1
+
+    # Requests of the console, cleared by the container once answered
+    LOGS = 2
+    PROFILE = 3
+    MEMSNAP = 4
+
+    # Set by the container once it handles `CONTROL_SIGNAL`, the signal would kill it before
+    LISTENING = 5
+
+    # Set by the container at exit, once its buffered rows are written or spilled to disk
+    FLUSHED = 6
+
+
+class ControlBlock():
+    """Control flags of a container in a raw shared memory block, written by the manager
+    and the container without a manager proxy round trip.
+    """
+    def __init__(self) -> None:
+        self.block = RawArray('b', len(ControlSlots))
+
+    def get(self, slot: ControlSlots) -> bool:
+        return self.block[slot] != 0
+
+    def set(self, slot: ControlSlots, value: bool = True) -> None:
+        self.block[slot] = 1 if value else 0
+
+    def notify(self, pid: int) -> None:
+        """Wake up the container to refresh its mirror at once, instead of at its next loop."""
+        if (CONTROL_SIGNAL is None or not pid or not self.block[ControlSlots.LISTENING]):
+            return
+
+        try:
+            os.kill(pid, CONTROL_SIGNAL)
+
+        except OSError:
+            # The process is already gone
+            pass
+
+
+class LocalControl():
+    """Mirror of a control block in plain attributes, for the checkpoints of the spider.
+
+    It is refreshed by the context loop and by `CONTROL_SIGNAL`.
+    """
+    __slots__ = ("control", "stop", "daemon", "logs", "profile", "memsnap")
+
+    def __init__(self, control: ControlBlock) -> None:
+        self.control = control
+        self.refresh()
+
+    def refresh(self) -> None:
+        block = self.control.block
+
+        self.stop = block[ControlSlots.STOP] != 0
+        self.daemon = block[ControlSlots.DAEMON] != 0
+        self.logs = block[ControlSlots.LOGS] != 0
+        self.profile = block[ControlSlots.PROFILE] != 0
+        self.memsnap = block[ControlSlots.MEMSNAP] != 0
+
+    def set(self, slot: ControlSlots, value: bool = True) -> None:
+        self.control.set(slot, value)
+        self.refresh()
+
+    def listen(self, wakeup_fd: Optional[int] = None) -> None:
+        """Refresh on `CONTROL_SIGNAL`, from the main thread of the container process.
+
+        The handler only copies the flags, it must not take a lock the interrupted thread may hold.
+        A signal also writes a byte to `wakeup_fd`, to wake up a loop waiting on it.
+        """
+        if (CONTROL_SIGNAL is None):
+            return
+
+        if (wakeup_fd is not None):
+            signal.set_wakeup_fd(wakeup_fd)
+
+        signal.signal(CONTROL_SIGNAL, lambda signum, frame: self.refresh())
+        self.control.set(ControlSlots.LISTENING)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   dedup.py
+@Time    :   2026/10/19 19:31:08
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Persistent Bloom filter deduplication of the rows before insert
+'''
+
+
+import hashlib
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import zlib
+
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence, Set, Tuple
+
+from database import IDBCommon
+
+from .metrics import ContainerMetrics, MetricSlots
+
+
+# Magic, hash count, error rate, bit count, capacity, added keys
+BLOOM_HEADER = struct.Struct("<8sIdQQQ")
+BLOOM_MAGIC = b"TSDAPBF1"
+
+# Each slice holds twice the keys of the previous one, with half its error rate,
+# so the error rate of the whole filter stays under the configured one
+SLICE_GROWTH = 2
+SLICE_TIGHTENING = 0.5
+
+# Rows of the table read at once when a new filter is filled
+FILL_CHUNK_ROWS = 10000
+
+# Longest index name of MySQL
+MAX_INDEX_NAME = 64
+
+
+class BloomSlice():
+    """A fixed size Bloom filter in a memory-mapped file."""
+    def __init__(self, path: str, capacity: int = 0, error_rate: float = 0.0) -> None:
+        self.path = path
+
+        if (not os.path.isfile(path)):
+            bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+            hashes = max(1, round(-math.log2(error_rate)))
+
+            with open(path, 'wb') as fp:
+                fp.write(BLOOM_HEADER.pack(BLOOM_MAGIC, hashes, error_rate, bits, capacity, 0))
+                fp.truncate(BLOOM_HEADER.size + (bits + 7) // 8)
+
+        self.__file = open(path, 'r+b')
+        self.__map = mmap.mmap(self.__file.fileno(), 0)
+
+        magic, self.hashes, self.error_rate, self.bits, self.capacity, self.count = \
+            BLOOM_HEADER.unpack_from(self.__map, 0)
+        if (magic != BLOOM_MAGIC or len(self.__map) != BLOOM_HEADER.size + (self.bits + 7) // 8):
+            self.close()
+            raise ValueError(f"'{path}' is not a Bloom filter slice")
+
+    @property
+    def size(self) -> int:
+        return len(self.__map)
+
+    def __positions(self, digest: Tuple[int, int]) -> List[int]:
+        # Double hashing, k positions from two 64 bits hashes
+        first, second = digest
+        return [(first + index * second) % self.bits for index in range(self.hashes)]
+
+    def contains(self, digest: Tuple[int, int]) -> bool:
+        offset = BLOOM_HEADER.size
+        for position in self.__positions(digest):
+            if (not self.__map[offset + (position >> 3)] & (1 << (position & 7))):
+                return False
+
+        return True
+
+    def add(self, digest: Tuple[int, int]) -> None:
+        offset = BLOOM_HEADER.size
+        for position in self.__positions(digest):
+            self.__map[offset + (position >> 3)] |= 1 << (position & 7)
+
+        self.count += 1
+        BLOOM_HEADER.pack_into(self.__map, 0, BLOOM_MAGIC, self.hashes, self.error_rate, self.bits, self.capacity, self.count)
+
+    def close(self) -> None:
+        if (not self.__map.closed):
+            self.__map.flush()
+            self.__map.close()
+
+        self.__file.close()
+
+
+class ScalableBloomFilter():
+    """Bloom filter growing by slices, stored as `<name>.<index>.bloom` files in `directory`.
+
+    Once `max_bytes` would be exceeded no slice is added anymore, the last slice keeps
+    taking keys and its false positive rate rises instead of the memory.
+    """
+    def __init__(self, directory: str, name: str, initial_capacity: int, error_rate: float, max_bytes: int) -> None:
+        self.directory = directory
+        self.name = name
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.max_bytes = max_bytes
+
+        self.slices: List[BloomSlice] = []
+        self.is_new = True
+
+        os.makedirs(directory, exist_ok=True)
+        self.__load()
+
+    def __slice_path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.{index}.bloom")
+
+    def __load(self) -> None:
+        index = 0
+
+        try:
+            while os.path.isfile(self.__slice_path(index)):
+                self.slices.append(BloomSlice(self.__slice_path(index)))
+                index += 1
+
+        except (ValueError, OSError) as e:
+            # A damaged filter is dropped, the caller refills it from the table
+            logging.warning(f"Dropping the Bloom filter '{self.name}': {e}")
+            self.close()
+            self.slices = []
+
+            for filename in os.listdir(self.directory):
+                if (filename.startswith(f"{self.name}.") and filename.endswith(".bloom")):
+                    os.remove(os.path.join(self.directory, filename))
+
+        self.is_new = len(self.slices) == 0
+
+    @property
+    def size(self) -> int:
+        return sum(bloom_slice.size for bloom_slice in self.slices)
+
+    @property
+    def count(self) -> int:
+        return sum(bloom_slice.count for bloom_slice in self.slices)
+
+    def __add_slice(self) -> Optional[BloomSlice]:
+        index = len(self.slices)
+        capacity = self.initial_capacity * SLICE_GROWTH ** index
+        error_rate = self.error_rate * (1 - SLICE_TIGHTENING) * SLICE_TIGHTENING ** index
+
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        if (self.slices and self.size + BLOOM_HEADER.size + (bits + 7) // 8 > self.max_bytes):
+            return None
+
+        bloom_slice = BloomSlice(self.__slice_path(index), capacity, error_rate)
+        self.slices.append(bloom_slice)
+
+        return bloom_slice
+
+    @staticmethod
+    def digest(key: bytes) -> Tuple[int, int]:
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        return (int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1)
+
+    def add(self, key: bytes) -> bool:
+        """Add a key, returns True if it may have been added before."""
+        digest = self.digest(key)
+
+        for bloom_slice in self.slices:
+            if (bloom_slice.contains(digest)):
+                return True
+
+        last_slice = self.slices[-1] if self.slices else None
+        if (last_slice is None or last_slice.count >= last_slice.capacity):
+            last_slice = self.__add_slice() or last_slice
+
+        last_slice.add(digest)
+
+        return False
+
+    def close(self) -> None:
+        for bloom_slice in self.slices:
+            bloom_slice.close()
+
+
+def encode_key(values: Sequence[Any]) -> bytes:
+    # Values read back from the table may differ in type from the written ones,
+    # e.g. booleans come back as integers and MySQL returns dates as objects
+    return repr(tuple(
+        int(value) if isinstance(value, bool) else str(value) if isinstance(value, (date, datetime)) else value
+        for value in values
+    )).encode('utf-8')
+
+
+class TableDedup():
+    """Drops the rows whose key columns are already in the table.
+    The filter answers most keys, the table is only queried when the filter has a possible hit.
+    """
+    def __init__(self,
+                 table_name: str,
+                 key_columns: Sequence[str],
+                 bloom_filter: ScalableBloomFilter,
+                 metrics: Optional[ContainerMetrics] = None) -> None:
+
+        self.table_name = table_name
+        self.key_columns = tuple(key_columns)
+        self.bloom_filter = bloom_filter
+        self.metrics = metrics
+
+    @property
+    def index_name(self) -> str:
+        name = re.sub(r"[^A-Za-z0-9_]", "_", f"dedup_{self.table_name}_{'_'.join(self.key_columns)}")
+        if (len(name) > MAX_INDEX_NAME):
+            name = f"{name[:MAX_INDEX_NAME - 9]}_{zlib.crc32(name.encode()):08x}"
+
+        return name
+
+    def create_index(self, db: IDBCommon) -> bool:
+        """Index the key columns, the table check of a possible hit is a lookup instead of a scan."""
+        return db.create_index(self.table_name, self.index_name, self.key_columns)
+
+    def fill(self, db: IDBCommon, chunk_rows: int = FILL_CHUNK_ROWS) -> None:
+        """Add the keys of the rows already in the table, for a filter created after them.
+        Only the key columns are read, `chunk_rows` rows at a time, each chunk going on
+        from the last key of the previous one along the index of the keys.
+        """
+        after = None
+
+        while True:
+            results = db.select_columns(self.table_name, self.key_columns, chunk_rows, after)
+            for row in results:
+                self.bloom_filter.add(encode_key(row))
+
+            if (len(results) < chunk_rows):
+                return
+
+            after = results[-1]
+
+    def filter(self, transaction: IDBCommon, column_names: Sequence[str], rows: List[Tuple]) -> List[Tuple]:
+        if (any(column not in column_names for column in self.key_columns)):
+            # Rows without the key columns are not deduplicated
+            return rows
+
+        indices = [column_names.index(column) for column in self.key_columns]
+
+        batch_keys: Set[bytes] = set()
+        kept = []
+        hits = 0
+        duplicates = 0
+
+        for row in rows:
+            values = [row[index] for index in indices]
+            key = encode_key(values)
+
+            if (key in batch_keys):
+                duplicates += 1
+                continue
+
+            if (self.bloom_filter.add(key)):
+                # Possible hit, the table has the final word
+                hits += 1
+                if (transaction.exists(self.table_name, dict(zip(self.key_columns, values)))):
+                    duplicates += 1
+                    continue
+
+            batch_keys.add(key)
+            kept.append(row)
+
+        if (self.metrics is not None):
+            self.metrics.add(MetricSlots.DEDUP_CHECKS, len(rows))
+            self.metrics.add(MetricSlots.DEDUP_HITS, hits)
+            self.metrics.add(MetricSlots.DEDUP_DUPLICATES, duplicates)
+
+        return kept
+
+
+def filter_file_name(spider_name: str, table_name: str, key_columns: Sequence[str]) -> str:
+    # Other key columns give another filter
+    return re.sub(r"[^A-Za-z0-9_-]", "_", f"{spider_name}-{table_name}-{'-'.join(key_columns)}")
@@ -0,0 +1,535 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   http.py
+@Time    :   2026/10/19 20:12:45
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Pooled HTTP client of the spiders, with per-host limits and retries
+'''
+
+
+import asyncio
+import gzip
+import http.client
+import json
+import logging
+import random
+import ssl
+import threading
+import zlib
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from time import monotonic, sleep, time
+from typing import Any, Deque, Dict, Mapping, Optional, Tuple, Union
+from urllib.parse import urlencode, urljoin, urlsplit
+
+from .http_cache import HttpCache, parse_cache_control
+from .metrics import ContainerMetrics, MetricSlots
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+RETRY_STATUSES = (429, 502, 503, 504)
+# Methods retried after a network error, the server may have handled the others
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+# Longest wait honoured from a `Retry-After` header
+MAX_RETRY_AFTER = 60
+
+DEFAULT_HEADERS = {
+    'User-Agent': "TSDAP-Spider/1.0",
+    'Accept-Encoding': "gzip, deflate" + (", br" if brotli is not None else "")
+}
+
+
+class HttpExceptions:
+    class HttpError(Exception):
+        def __init__(self, *args: object) -> None:
+            super().__init__(*args)
+
+    class TooManyRedirectsError(HttpError):
+        def __init__(self, *args: object) -> None:
+            super().__init__(*args)
+
+
+class HttpResponse():
+    def __init__(self,
+                 url: str,
+                 status: int,
+                 reason: str,
+                 headers: http.client.HTTPMessage,
+                 body: bytes,
+                 from_cache: bool = False) -> None:
+
+        self.url = url
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.from_cache = from_cache
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 400
+
+    @property
+    def encoding(self) -> str:
+        return self.headers.get_content_charset() or "utf-8"
+
+    def text(self, encoding: Optional[str] = None) -> str:
+        return self.body.decode(encoding or self.encoding, errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.text())
+
+    def raise_for_status(self) -> None:
+        if (not self.ok):
+            raise HttpExceptions.HttpError(f"{self.status} {self.reason} for {self.url}")
+
+
+def decode_body(body: bytes, content_encoding: Optional[str]) -> bytes:
+    # Codings are listed in the order they were applied
+    for coding in reversed([item.strip().lower() for item in (content_encoding or "").split(",") if item.strip()]):
+        if (coding in ("gzip", "x-gzip")):
+            body = gzip.decompress(body)
+
+        elif (coding == "deflate"):
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                # Raw deflate stream, without the zlib header
+                body = zlib.decompress(body, -zlib.MAX_WBITS)
+
+        elif (coding == "br" and brotli is not None):
+            body = brotli.decompress(body)
+
+        elif (coding != "identity"):
+            raise HttpExceptions.HttpError(f"Unsupported content encoding: {coding}")
+
+    return body
+
+
+class TokenBucket():
+    """`rate` requests per second with bursts of `burst`, `rate` 0 means unlimited."""
+    def __init__(self, rate: float, burst: Optional[int] = None) -> None:
+        self.rate = rate
+        self.burst = max(1, burst if burst is not None else int(rate) or 1)
+
+        self.__tokens = float(self.burst)
+        self.__updated = monotonic()
+        self.__lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, waiting for it if needed, returns the seconds waited."""
+        if (self.rate <= 0):
+            return 0
+
+        with self.__lock:
+            now = monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+
+            # Tokens may go negative, the callers queue up behind each other
+            self.__tokens -= 1
+            wait = -self.__tokens / self.rate if self.__tokens < 0 else 0
+
+        if (wait > 0):
+            sleep(wait)
+
+        return wait
+
+
+class HostPool():
+    """Keep-alive connections and limits of one `scheme://host:port`."""
+    def __init__(self,
+                 scheme: str,
+                 host: str,
+                 port: int,
+                 max_connections: int,
+                 rate: float,
+                 burst: Optional[int],
+                 ssl_context: Optional[ssl.SSLContext]) -> None:
+
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.ssl_context = ssl_context
+
+        self.max_connections = max_connections
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self.bucket = TokenBucket(rate, burst)
+
+        self.__idle: Deque[http.client.HTTPConnection] = deque()
+        self.__lock = threading.Lock()
+
+    @property
+    def idle_count(self) -> int:
+        return len(self.__idle)
+
+    def get(self, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """An idle connection if there is one, else a new one, and whether it is reused."""
+        with self.__lock:
+            if (self.__idle):
+                connection = self.__idle.pop()
+                connection.timeout = timeout
+                if (connection.sock is not None):
+                    connection.sock.settimeout(timeout)
+
+                return (connection, True)
+
+        return (self.connect(timeout), False)
+
+    def connect(self, timeout: float) -> http.client.HTTPConnection:
+        if (self.scheme == "https"):
+            return http.client.HTTPSConnection(self.host, self.port, timeout=timeout, context=self.ssl_context)
+
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def put(self, connection: http.client.HTTPConnection) -> None:
+        with self.__lock:
+            if (len(self.__idle) < self.max_connections):
+                self.__idle.append(connection)
+                return
+
+        connection.close()
+
+    def close(self) -> None:
+        with self.__lock:
+            while self.__idle:
+                self.__idle.pop().close()
+
+
+class HttpClient():
+    """Blocking and asyncio HTTP/1.1 client shared by the threads of a spider.
+
+    Connections are kept alive per host. Each host has its own concurrency cap and
+    token bucket, failed requests and 429/5xx answers are retried with an exponential backoff.
+
+    GET responses go through `cache` when it is enabled for the request, its host
+    or by `cache_enabled`.
+
+    The asyncio methods run the blocking ones on `async_workers` threads, at most that many
+    of them are in flight at once, 0 sizes it from `max_per_host`.
+    """
+    def __init__(self,
+                 max_per_host: int = 8,
+                 rate_per_host: float = 0,
+                 burst_per_host: Optional[int] = None,
+                 retries: int = 3,
+                 backoff: float = 0.5,
+                 timeout: float = 30,
+                 headers: Optional[Mapping[str, str]] = None,
+                 cache: Optional[HttpCache] = None,
+                 cache_enabled: bool = False,
+                 metrics: Optional[ContainerMetrics] = None,
+                 async_workers: int = 0) -> None:
+
+        self.max_per_host = max_per_host
+        self.rate_per_host = rate_per_host
+        self.burst_per_host = burst_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self.cache = cache
+        self.cache_enabled = cache_enabled
+        self.metrics = metrics
+        self.async_workers = async_workers or max_per_host * 4
+
+        self.ssl_context = ssl.create_default_context()
+
+        self.__pools: Dict[Tuple[str, str, int], HostPool] = {}
+        self.__host_limits: Dict[str, Tuple[Optional[int], Optional[float], Optional[int]]] = {}
+        self.__host_caches: Dict[str, bool] = {}
+        self.__pools_lock = threading.Lock()
+
+        self.__executor: Optional[ThreadPoolExecutor] = None
+        self.__executor_lock = threading.Lock()
+
+    def set_host_limits(self,
+                        host: str,
+                        max_connections: Optional[int] = None,
+                        rate: Optional[float] = None,
+                        burst: Optional[int] = None) -> None:
+        """Limits of one host instead of the client defaults, before its first request."""
+        with self.__pools_lock:
+            self.__host_limits[host] = (max_connections, rate, burst)
+
+    def set_host_cache(self, host: str, enabled: bool = True) -> None:
+        """Turn the response cache on or off for one host, instead of the client default."""
+        with self.__pools_lock:
+            self.__host_caches[host] = enabled
+
+    def __is_cached(self, method: str, url: str, cache: Optional[bool]) -> bool:
+        if (self.cache is None or method != "GET"):
+            return False
+
+        if (cache is not None):
+            return cache
+
+        return self.__host_caches.get(urlsplit(url).hostname or "", self.cache_enabled)
+
+    def __get_pool(self, scheme: str, host: str, port: int) -> HostPool:
+        key = (scheme, host, port)
+
+        with self.__pools_lock:
+            pool = self.__pools.get(key)
+            if (pool is None):
+                max_connections, rate, burst = self.__host_limits.get(host, (None, None, None))
+                pool = HostPool(
+                    scheme, host, port,
+                    max_connections or self.max_per_host,
+                    rate if rate is not None else self.rate_per_host,
+                    burst if burst is not None else self.burst_per_host,
+                    self.ssl_context
+                )
+                self.__pools[key] = pool
+
+        return pool
+
+    def __count(self, slot: MetricSlots, value: float = 1) -> None:
+        if (self.metrics is not None):
+            self.metrics.add(slot, value)
+
+    def __send(self,
+               pool: HostPool,
+               method: str,
+               target: str,
+               body: Optional[bytes],
+               headers: Dict[str, str],
+               timeout: float) -> Tuple[int, str, http.client.HTTPMessage, bytes]:
+
+        connection, is_reused = pool.get(timeout)
+        self.__count(MetricSlots.HTTP_CONNECTIONS_REUSED if is_reused else MetricSlots.HTTP_CONNECTIONS_OPENED)
+
+        try:
+            connection.request(method, target, body=body, headers=headers)
+            response = connection.getresponse()
+            data = response.read()
+
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            connection.close()
+            if (not is_reused):
+                raise
+
+            # The server closed the idle connection, try once more on a new one
+            self.__count(MetricSlots.HTTP_CONNECTIONS_OPENED)
+            connection = pool.connect(timeout)
+            try:
+                connection.request(method, target, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+
+            except Exception:
+                connection.close()
+                raise
+
+        except Exception:
+            connection.close()
+            raise
+
+        if (response.will_close):
+            connection.close()
+        else:
+            pool.put(connection)
+
+        return (response.status, response.reason, response.headers, data)
+
+    def __retry_delay(self, attempt: int, headers: Optional[http.client.HTTPMessage]) -> float:
+        retry_after = headers.get("Retry-After") if headers is not None else None
+        if (retry_after):
+            try:
+                return min(MAX_RETRY_AFTER, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    return min(MAX_RETRY_AFTER, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time()))
+                except (TypeError, ValueError):
+                    pass
+
+        # Exponential backoff with full jitter
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    def request(self,
+                method: str,
+                url: str,
+                params: Optional[Mapping[str, Any]] = None,
+                headers: Optional[Mapping[str, str]] = None,
+                data: Optional[Union[bytes, str, Mapping[str, Any]]] = None,
+                json_data: Any = None,
+                timeout: Optional[float] = None,
+                allow_redirects: bool = True,
+                cache: Optional[bool] = None) -> HttpResponse:
+
+        method = method.upper()
+        timeout = timeout if timeout is not None else self.timeout
+        request_headers = dict(self.headers, **(headers or {}))
+
+        body: Optional[bytes] = None
+        if (json_data is not None):
+            body = json.dumps(json_data).encode("utf-8")
+            request_headers.setdefault('Content-Type', "application/json")
+        elif (isinstance(data, Mapping)):
+            body = urlencode(data).encode("utf-8")
+            request_headers.setdefault('Content-Type', "application/x-www-form-urlencoded")
+        elif (isinstance(data, str)):
+            body = data.encode("utf-8")
+        else:
+            body = data
+
+        if (params):
+            url = f"{url}{'&' if urlsplit(url).query else '?'}{urlencode(params)}"
+
+        for _ in range(MAX_REDIRECTS + 1):
+            if (self.__is_cached(method, url, cache)):
+                response = self.__cached_request(url, request_headers, timeout)
+            else:
+                status, reason, response_headers, data_bytes = self.__request_with_retries(
+                    method, url, body, request_headers, timeout
+                )
+                response = HttpResponse(url, status, reason, response_headers,
+                                        decode_body(data_bytes, response_headers.get("Content-Encoding")))
+
+            if (allow_redirects and response.status in REDIRECT_STATUSES and response.headers.get("Location")):
+                url = urljoin(url, response.headers["Location"])
+                if (response.status == 303 or (response.status in (301, 302) and method == "POST")):
+                    method, body = "GET", None
+                    request_headers.pop('Content-Type', None)
+                continue
+
+            return response
+
+        raise HttpExceptions.TooManyRedirectsError(f"More than {MAX_REDIRECTS} redirects for {url}")
+
+    def __cached_request(self, url: str, headers: Dict[str, str], timeout: float) -> HttpResponse:
+        cached = self.cache.lookup("GET", url, headers)
+        directives = parse_cache_control(headers.get('Cache-Control'))
+
+        if (cached is not None and cached.is_fresh and "no-cache" not in directives):
+            self.__count(MetricSlots.HTTP_CACHE_HITS)
+            return HttpResponse(url, cached.status, cached.reason, cached.headers, cached.body, from_cache=True)
+
+        conditional_headers = dict(headers, **cached.validators()) if cached is not None else headers
+        status, reason, response_headers, data_bytes = self.__request_with_retries(
+            "GET", url, None, conditional_headers, timeout
+        )
+
+        if (cached is not None and status == 304):
+            self.__count(MetricSlots.HTTP_CACHE_REVALIDATIONS)
+            cached = self.cache.revalidated(cached, response_headers)
+            return HttpResponse(url, cached.status, cached.reason, cached.headers, cached.body, from_cache=True)
+
+        self.__count(MetricSlots.HTTP_CACHE_MISSES)
+        body = decode_body(data_bytes, response_headers.get("Content-Encoding"))
+        try:
+            self.cache.store("GET", url, headers, status, reason, response_headers, body)
+
+        except Exception as e:
+            # A broken cache costs bandwidth, not the response
+            logging.warning(f"Failed to cache the response of {url}: {e}")
+
+        return HttpResponse(url, status, reason, response_headers, body)
+
+    def __request_with_retries(self,
+                               method: str,
+                               url: str,
+                               body: Optional[bytes],
+                               headers: Dict[str, str],
+                               timeout: float) -> Tuple[int, str, http.client.HTTPMessage, bytes]:
+
+        parts = urlsplit(url)
+        if (parts.scheme not in ("http", "https")):
+            raise HttpExceptions.HttpError(f"Unsupported URL scheme: {url}")
+
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        pool = self.__get_pool(parts.scheme, parts.hostname or "", port)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+        attempt = 0
+        while True:
+            with pool.slots:
+                self.__count(MetricSlots.HTTP_THROTTLED_SECONDS, pool.bucket.acquire())
+                self.__count(MetricSlots.HTTP_IN_FLIGHT)
+                start_time = monotonic()
+
+                try:
+                    status, reason, response_headers, data = self.__send(pool, method, target, body, headers, timeout)
+                    error: Optional[Exception] = None
+
+                except (OSError, http.client.HTTPException) as e:
+                    status, reason, response_headers, data = (0, "", None, b"")
+                    error = e
+
+                finally:
+                    self.__count(MetricSlots.HTTP_IN_FLIGHT, -1)
+                    self.__count(MetricSlots.HTTP_REQUESTS)
+                    if (self.metrics is not None):
+                        self.metrics.observe("http_duration", monotonic() - start_time)
+
+            if (error is None and status not in RETRY_STATUSES):
+                return (status, reason, response_headers, data)
+
+            if (attempt >= self.retries or (error is not None and method not in IDEMPOTENT_METHODS)):
+                self.__count(MetricSlots.HTTP_ERRORS)
+                if (error is not None):
+                    raise error
+
+                return (status, reason, response_headers, data)
+
+            self.__count(MetricSlots.HTTP_RETRIES)
+            sleep(self.__retry_delay(attempt, response_headers))
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> HttpResponse:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> HttpResponse:
+        return self.request("POST", url, **kwargs)
+
+    def __get_executor(self) -> ThreadPoolExecutor:
+        with self.__executor_lock:
+            if (self.__executor is None):
+                self.__executor = ThreadPoolExecutor(max_workers=self.async_workers, thread_name_prefix="spider_http")
+
+            return self.__executor
+
+    async def arequest(self, method: str, url: str, **kwargs) -> HttpResponse:
+        """`request` for asyncio code, run on the worker threads of the client.
+        At most `async_workers` requests are in flight, the others wait for a thread.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__get_executor(), lambda: self.request(method, url, **kwargs))
+
+    async def aget(self, url: str, **kwargs) -> HttpResponse:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> HttpResponse:
+        return await self.arequest("POST", url, **kwargs)
+
+    def pool_stats(self) -> Dict[str, Tuple[int, int]]:
+        """`{host: (max connections, idle connections)}`."""
+        with self.__pools_lock:
+            return {
+                f"{pool.scheme}://{pool.host}:{pool.port}": (pool.max_connections, pool.idle_count)
+                for pool in self.__pools.values()
+            }
+
+    def close(self) -> None:
+        with self.__pools_lock:
+            for pool in self.__pools.values():
+                pool.close()
+
+        with self.__executor_lock:
+            if (self.__executor is not None):
+                self.__executor.shutdown(wait=False)
+                self.__executor = None
+
+        if (self.cache is not None):
+            self.cache.close()
@@ -0,0 +1,450 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   http_cache.py
+@Time    :   2026/10/19 20:58:14
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   On-disk HTTP response cache of a spider, with conditional revalidation
+'''
+
+
+import http.client
+import io
+import json
+import os
+import struct
+import threading
+import zlib
+
+from email.utils import parsedate_to_datetime
+from time import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from database import SQLite
+from database.common import RetIndices
+
+
+INDEX_DATABASE = "index"
+ENTRIES_TABLE = "entries"
+DATA_FILE = "responses.dat"
+
+# Magic, compressed, key length, header length, body length
+RECORD_HEADER = struct.Struct("<4s?HII")
+RECORD_MAGIC = b"TSHC"
+
+# Bodies bigger than this are compressed in the data file
+COMPRESS_THRESHOLD = 1024
+
+# Statuses cacheable without explicit freshness, RFC 9110 section 15.1
+CACHEABLE_STATUSES = (200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501)
+
+# Share of the age of a `Last-Modified` response it stays fresh, when it has no explicit lifetime
+HEURISTIC_FRESHNESS = 0.1
+
+# Eviction goes below this share of the budget, so that every store does not evict
+EVICT_TARGET = 0.9
+
+# The data file is rewritten once its dead records take more than this share and size
+COMPACT_RATIO = 0.5
+COMPACT_MIN_SIZE = 1024 * 1024
+
+# Headers describing the stored encoding of the body, it is stored decoded
+DROPPED_HEADERS = ("Content-Encoding", "Content-Length", "Transfer-Encoding", "Connection", "Keep-Alive")
+
+SELECT_ENTRY_SQL = (
+    f"SELECT status, reason, position, size, vary, etag, last_modified, expires "
+    f"FROM `{ENTRIES_TABLE}` WHERE key=?"
+)
+SELECT_LRU_SQL = f"SELECT key, size FROM `{ENTRIES_TABLE}` ORDER BY accessed"
+SELECT_POSITIONS_SQL = f"SELECT key, position, size FROM `{ENTRIES_TABLE}` ORDER BY position"
+SELECT_TOTAL_SQL = f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM `{ENTRIES_TABLE}`"
+DELETE_ENTRY_SQL = f"DELETE FROM `{ENTRIES_TABLE}` WHERE key=?"
+TOUCH_ENTRY_SQL = f"UPDATE `{ENTRIES_TABLE}` SET accessed=? WHERE key=?"
+MOVE_ENTRY_SQL = f"UPDATE `{ENTRIES_TABLE}` SET position=? WHERE key=?"
+REFRESH_ENTRY_SQL = f"UPDATE `{ENTRIES_TABLE}` SET etag=?, last_modified=?, expires=?, accessed=? WHERE key=?"
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """`{directive: argument}` of a `Cache-Control` header, names in lower case."""
+    directives: Dict[str, Optional[str]] = {}
+
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if (name):
+            directives[name.lower()] = argument.strip('"') or None
+
+    return directives
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    if (not value):
+        return None
+
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def freshness_lifetime(headers: http.client.HTTPMessage) -> float:
+    """Seconds a response stays fresh after it was generated, RFC 9111 section 4.2.1."""
+    directives = parse_cache_control(headers.get("Cache-Control"))
+    if ("no-cache" in directives):
+        return 0
+
+    if ("max-age" in directives):
+        try:
+            return max(0, int(directives["max-age"] or 0))
+        except ValueError:
+            return 0
+
+    date = _parse_http_date(headers.get("Date")) or time()
+
+    if (headers.get("Expires") is not None):
+        # An invalid date, e.g. "0", means already expired
+        expires = _parse_http_date(headers.get("Expires"))
+        return max(0, expires - date) if expires is not None else 0
+
+    last_modified = _parse_http_date(headers.get("Last-Modified"))
+    if (last_modified is not None):
+        return max(0, (date - last_modified) * HEURISTIC_FRESHNESS)
+
+    return 0
+
+
+def _expires_at(headers: http.client.HTTPMessage, now: float) -> float:
+    try:
+        age = max(0, int(headers.get("Age") or 0))
+    except ValueError:
+        age = 0
+
+    return now - age + freshness_lifetime(headers)
+
+
+def _vary_key(headers: http.client.HTTPMessage, request_headers: Mapping[str, str]) -> str:
+    # Request headers the response depends on, matched on lookup
+    lowered = {name.lower(): value for name, value in request_headers.items()}
+    names = sorted({name.strip().lower() for name in (headers.get("Vary") or "").split(",") if name.strip()})
+
+    return json.dumps({name: lowered.get(name) for name in names}, sort_keys=True)
+
+
+def parse_headers(data: bytes) -> http.client.HTTPMessage:
+    return http.client.parse_headers(io.BytesIO(data))
+
+
+class CachedResponse():
+    """A response read back from the cache."""
+    def __init__(self,
+                 key: str,
+                 status: int,
+                 reason: str,
+                 headers: http.client.HTTPMessage,
+                 body: bytes,
+                 etag: str,
+                 last_modified: str,
+                 expires: float) -> None:
+
+        self.key = key
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+    @property
+    def is_fresh(self) -> bool:
+        return time() < self.expires
+
+    def validators(self) -> Dict[str, str]:
+        """Headers of a conditional request revalidating the response."""
+        validators = {}
+        if (self.etag):
+            validators['If-None-Match'] = self.etag
+        if (self.last_modified):
+            validators['If-Modified-Since'] = self.last_modified
+
+        return validators
+
+
+class HttpCache():
+    """Private HTTP cache of the GET responses of a spider, in `directory`.
+
+    Records (headers and decoded body) are appended to a data file, an index table maps
+    each URL to its record, freshness and last access. Once `max_bytes` is exceeded the least
+    recently used entries are dropped, and the data file is compacted when mostly dead.
+    """
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.db: Optional[SQLite] = None
+        self.__data_file: Optional[io.BufferedRandom] = None
+        self.__lock = threading.RLock()
+
+        self.__live_bytes = 0
+        # Last accesses not written to the index yet, no write per hit
+        self.__accessed: Dict[str, float] = {}
+
+    def __open(self) -> None:
+        # Opened on first use, most spiders never enable the cache
+        if (self.db is not None):
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        db = SQLite(self.directory)
+        if (not db.is_database_exists(INDEX_DATABASE)):
+            db.create_database(INDEX_DATABASE)
+        db.switch_database(INDEX_DATABASE)
+
+        if (not db.is_table_exists(ENTRIES_TABLE)):
+            self.__create_table(db)
+
+        data_path = os.path.join(self.directory, DATA_FILE)
+        self.__data_file = open(data_path, 'r+b' if os.path.isfile(data_path) else 'w+b')
+        self.db = db
+
+        self.__live_bytes = db.execute(SELECT_TOTAL_SQL)[RetIndices.RESULT][0][1]
+
+    @staticmethod
+    def __create_table(db: SQLite) -> None:
+        db.create_table(ENTRIES_TABLE, list({
+            'key': 'key',
+            'status': 200,
+            'reason': 'reason',
+            'position': 0,
+            'size': 0,
+            'vary': 'vary',
+            'etag': 'etag',
+            'last_modified': 'last_modified',
+            'expires': 0.0,
+            'accessed': 0.0
+        }.items()), primary_keys=['key'])
+
+    @staticmethod
+    def cache_key(method: str, url: str) -> str:
+        return f"{method} {url}"
+
+    def __read_record(self, key: str, position: int, size: int) -> Optional[Tuple[bytes, bytes]]:
+        self.__data_file.seek(position)
+        data = self.__data_file.read(size)
+        if (len(data) != size or len(data) < RECORD_HEADER.size):
+            return None
+
+        magic, compressed, key_length, header_length, body_length = RECORD_HEADER.unpack_from(data, 0)
+        if (magic != RECORD_MAGIC or RECORD_HEADER.size + key_length + header_length + body_length != size):
+            return None
+
+        # The record of another key, e.g. the index was not updated by an interrupted compaction
+        offset = RECORD_HEADER.size + key_length
+        if (data[RECORD_HEADER.size:offset] != key.encode("utf-8")):
+            return None
+
+        header_data = data[offset:offset + header_length]
+        body = data[offset + header_length:]
+
+        return (header_data, zlib.decompress(body) if compressed else body)
+
+    def lookup(self, method: str, url: str, request_headers: Mapping[str, str]) -> Optional[CachedResponse]:
+        """The stored response of a request, fresh or not, None on a miss."""
+        key = self.cache_key(method, url)
+
+        with self.__lock:
+            self.__open()
+
+            results = self.db.execute(SELECT_ENTRY_SQL, (key,))[RetIndices.RESULT]
+            if (len(results) == 0):
+                return None
+
+            status, reason, position, size, vary, etag, last_modified, expires = results[0]
+
+            record = self.__read_record(key, position, size)
+            if (record is None):
+                # Torn or overwritten record, e.g. after a crash in the middle of a store
+                self.__delete(key, size)
+                return None
+
+            headers = parse_headers(record[0])
+            if (_vary_key(headers, request_headers) != vary):
+                return None
+
+            self.__accessed[key] = time()
+
+        return CachedResponse(key, status, reason, headers, record[1], etag, last_modified, expires)
+
+    def store(self,
+              method: str,
+              url: str,
+              request_headers: Mapping[str, str],
+              status: int,
+              reason: str,
+              headers: http.client.HTTPMessage,
+              body: bytes) -> bool:
+        """Store a response with a decoded body, returns False if it is not cacheable."""
+        if (not self.is_storable(status, headers, request_headers)):
+            return False
+
+        stored_headers = parse_headers(headers.as_bytes())
+        for name in DROPPED_HEADERS:
+            del stored_headers[name]
+
+        key = self.cache_key(method, url)
+        key_data = key.encode("utf-8")
+        header_data = stored_headers.as_bytes()
+        compressed = len(body) > COMPRESS_THRESHOLD
+        body_data = zlib.compress(body) if compressed else body
+        size = RECORD_HEADER.size + len(key_data) + len(header_data) + len(body_data)
+
+        if (len(key_data) > 0xFFFF or size > self.max_bytes * EVICT_TARGET):
+            return False
+
+        now = time()
+
+        with self.__lock:
+            self.__open()
+
+            self.__data_file.seek(0, os.SEEK_END)
+            position = self.__data_file.tell()
+            self.__data_file.write(
+                RECORD_HEADER.pack(RECORD_MAGIC, compressed, len(key_data), len(header_data), len(body_data))
+            )
+            self.__data_file.write(key_data)
+            self.__data_file.write(header_data)
+            self.__data_file.write(body_data)
+            # The record is on disk before the index points to it
+            self.__data_file.flush()
+
+            previous = self.db.execute(SELECT_ENTRY_SQL, (key,))[RetIndices.RESULT]
+            self.db.upsert(ENTRIES_TABLE, {
+                'key': key,
+                'status': status,
+                'reason': reason,
+                'position': position,
+                'size': size,
+                'vary': _vary_key(headers, request_headers),
+                'etag': headers.get("ETag") or "",
+                'last_modified': headers.get("Last-Modified") or "",
+                'expires': _expires_at(headers, now),
+                'accessed': now
+            }, ['key'])
+            self.__accessed.pop(key, None)
+
+            self.__live_bytes += size - (previous[0][3] if previous else 0)
+            if (self.__live_bytes > self.max_bytes):
+                self.__evict()
+
+            self.__compact_if_needed()
+
+        return True
+
+    def is_storable(self, status: int, headers: http.client.HTTPMessage, request_headers: Mapping[str, str]) -> bool:
+        request_directives = parse_cache_control(request_headers.get('Cache-Control'))
+        directives = parse_cache_control(headers.get("Cache-Control"))
+
+        if ("no-store" in request_directives or "no-store" in directives):
+            return False
+
+        if (status not in CACHEABLE_STATUSES and "max-age" not in directives and headers.get("Expires") is None):
+            return False
+
+        if ((headers.get("Vary") or "").strip() == "*"):
+            return False
+
+        # Nothing to revalidate with and never fresh, it could never be used
+        has_validators = headers.get("ETag") is not None or headers.get("Last-Modified") is not None
+        return has_validators or freshness_lifetime(headers) > 0
+
+    def revalidated(self, cached: CachedResponse, headers: http.client.HTTPMessage) -> CachedResponse:
+        """Refresh a stored response after a `304 Not Modified`, with the new headers.
+        Only the validators and the freshness are written back, the record is not rewritten.
+        """
+        dropped = {name.lower() for name in DROPPED_HEADERS}
+        for name in {name.lower() for name in headers.keys()} - dropped:
+            del cached.headers[name]
+            for value in headers.get_all(name) or []:
+                cached.headers[name] = value
+
+        now = time()
+        cached.etag = cached.headers.get("ETag") or ""
+        cached.last_modified = cached.headers.get("Last-Modified") or ""
+        cached.expires = _expires_at(cached.headers, now)
+
+        with self.__lock:
+            self.__open()
+            self.db.execute(REFRESH_ENTRY_SQL, (cached.etag, cached.last_modified, cached.expires, now, cached.key))
+            self.__accessed.pop(cached.key, None)
+
+        return cached
+
+    def __delete(self, key: str, size: int) -> None:
+        self.db.execute(DELETE_ENTRY_SQL, (key,))
+        self.__accessed.pop(key, None)
+        self.__live_bytes -= size
+
+    def __write_accesses(self) -> None:
+        if (self.__accessed):
+            self.db.execute_many(TOUCH_ENTRY_SQL, [(accessed, key) for key, accessed in self.__accessed.items()])
+            self.__accessed = {}
+
+    def __evict(self) -> None:
+        # Least recently used first, until below the target
+        self.__write_accesses()
+
+        target = self.max_bytes * EVICT_TARGET
+        evicted = []
+
+        for key, size in self.db.execute(SELECT_LRU_SQL)[RetIndices.RESULT]:
+            if (self.__live_bytes <= target):
+                break
+
+            evicted.append((key,))
+            self.__live_bytes -= size
+
+        self.db.execute_many(DELETE_ENTRY_SQL, evicted)
+
+    def __compact_if_needed(self) -> None:
+        file_size = self.__data_file.seek(0, os.SEEK_END)
+        dead_bytes = file_size - self.__live_bytes
+
+        if (file_size < COMPACT_MIN_SIZE or dead_bytes < file_size * COMPACT_RATIO):
+            return
+
+        data_path = os.path.join(self.directory, DATA_FILE)
+        moved = []
+
+        with open(f"{data_path}.tmp", 'wb') as fp:
+            for key, position, size in self.db.execute(SELECT_POSITIONS_SQL)[RetIndices.RESULT]:
+                self.__data_file.seek(position)
+                moved.append((fp.tell(), key))
+                fp.write(self.__data_file.read(size))
+
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        # Positions and file are swapped together, a crash in between only loses cached records
+        with self.db.transaction() as transaction:
+            transaction.execute_many(MOVE_ENTRY_SQL, moved)
+            self.__data_file.close()
+            os.replace(f"{data_path}.tmp", data_path)
+
+        self.__data_file = open(data_path, 'r+b')
+
+    def stats(self) -> Tuple[int, int, int]:
+        """Entries, live bytes and data file size."""
+        with self.__lock:
+            self.__open()
+            count, live_bytes = self.db.execute(SELECT_TOTAL_SQL)[RetIndices.RESULT][0]
+            return (count, live_bytes, self.__data_file.seek(0, os.SEEK_END))
+
+    def close(self) -> None:
+        with self.__lock:
+            if (self.db is None):
+                return
+
+            self.__write_accesses()
+            self.__data_file.close()
+            self.db = None
@@ -9,8 +9,7 @@
 '''
 
 
-import importlib
-import importlib.util
+import atexit
 import json
 import logging
 import os
@@ -24,17 +23,34 @@ from hashlib import md5
 from multiprocessing import Manager, Process
 from tabulate import tabulate
 from time import sleep
-from threading import Lock, Thread
-from typing import Any, Dict, List, Optional
+from threading import Event, Lock, Thread
+from typing import Any, Dict, List, Optional, Tuple
 
 from database import SQLite
-from utils.crontab import cron_to_timer
+from database.common import RetIndices, set_execute_observer
 from utils.dockerstyle import generate_unique_docker_style_name, human_readable_time_difference
 from utils.files import get_file_folder_size, covert_size_to_str, is_file_exists
+from utils.prometheus import MetricFamily
+from utils.wheelhouse import build_site_dir, build_site_dirs, get_site_dir, is_site_dir_ready, resolve_wheels
 from runtime import RuntimeContext as ctx
 
-from .context import context_main
-from .common import ContainerStatus, SpiderCodes, SpiderShares
+from .context import context_main, open_data_database
+from .common import ContainerStatus, OverlapPolicy, SpiderCodes, SpiderShares
+from .control import ControlSlots
+from .metrics import PlatformMetrics, ProcSampler
+from .registry import ContainerRegistry
+from .scheduler import SpiderScheduler
+from .shutdown import ShutdownCoordinator
+from .stores import read_watermarks
+
+
+# `PRAGMA user_version` of the spider manager databases
+SCHEMA_VERSIONS = {
+    'packages': 1,
+    'containers': 2
+}
+
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
 class SpiderManager():
@@ -42,19 +58,70 @@ class SpiderManager():
         self.pkg_root_dir: str = ctx.multiprocess_get_global("Spiders.PACKAGE_ROOT_DIR")
         self.container_root_dir: str = ctx.multiprocess_get_global("Spiders.CONTAINER_ROOT_DIR")
 
-        self.spider_manager_db = SQLite(
-            os.path.join(
-                ctx.process_get_global("Runtimes.DB_ROOT_DIR"),
-                "spider"
-            )
+        # Shared wheel cache and per-package site directories
+        self.wheelhouse_dir = os.path.join(self.pkg_root_dir, ".wheelhouse")
+        self.env_root_dir = os.path.join(self.pkg_root_dir, ".envs")
+
+        spider_db_dir = os.path.join(
+            ctx.process_get_global("Runtimes.DB_ROOT_DIR"),
+            "spider"
         )
+        self.spider_manager_db = SQLite(spider_db_dir)
 
         self.spider_contexts: Dict[str, Dict[str, Any]] = {}
         self.spider_contexts_lock = Lock()
 
+        # The console and the scheduler may start the same container at once
+        self.start_lock = Lock()
+
+        # Runs before multiprocessing joins the containers at exit, which would wait forever
+        atexit.register(self.__terminate_contexts)
+
+        # Only sampled while `stats` is displayed
+        self.proc_sampler = ProcSampler()
+
+        # Metrics of the manager process, the containers keep theirs in shared memory
+        self.platform_metrics = PlatformMetrics()
+        set_execute_observer(self.platform_metrics.observe_execute)
+
         # Initialize database
         self.__init_database()
 
+        # One handle per database, each selected once, the connections are shared by the registry
+        self.packages_db = SQLite(spider_db_dir)
+        self.packages_db.switch_database("packages")
+        self.containers_db = SQLite(spider_db_dir)
+        self.containers_db.switch_database("containers")
+
+        self.__migrate_database()
+
+        # Load all containers into memory
+        self.container_registry = ContainerRegistry(self.containers_db)
+        self.container_registry.load()
+
+        # Rebuild missing package environments from the wheelhouse, in the background as pip takes a while.
+        # Containers wait for it before they start.
+        self.package_envs_ready = Event()
+        self.package_envs_thread = Thread(target=self.__prepare_package_envs,
+                                          name="spider_package_envs",
+                                          daemon=True)
+        self.package_envs_thread.start()
+
+        self.shutdown_coordinator = ShutdownCoordinator(
+            ctx.multiprocess_get_global("Spiders.SHUTDOWN_TIMEOUT") or 10,
+            ctx.multiprocess_get_global("Spiders.SHUTDOWN_TERMINATE_TIMEOUT") or 3
+        )
+
+        # Initialize scheduler thread, and restore persisted schedules
+        self.scheduler = SpiderScheduler(
+            self.__cron_task,
+            self.__is_container_running,
+            self.__persist_next_run,
+            ctx.multiprocess_get_global("Spiders.SCHEDULER_MAX_RUNNING") or 0,
+            lambda container_id, lag: self.platform_metrics.observe("cron_lag", lag)
+        )
+        self.__restore_schedules()
+
         # Initialize monitor thread
         self.monitor_thread = Thread(target=self.__monitor_contexts,
                                      name="spider_monitor",
@@ -75,35 +142,51 @@ class SpiderManager():
 
             # Deal dead processes
             for (container_id, context) in dead_contexts:
-                shares: SpiderShares = context['shares']
-                ret_code = shares.ret_code.get()
-                status = ContainerStatus.TERMINATED
-
-                # Start cron timer
-                if (ret_code == SpiderCodes.STATUS_SUCCESS and not shares.is_daemon):
-                    # Set cron timer
-                    cron = context['cron']
-                    timer = cron_to_timer(cron, self.__cron_task, args=(container_id,))
-                    status = ContainerStatus.TIMER_WAITING
-                    timer.start()
-                else:
-                    with self.spider_contexts_lock:
-                        self.spider_contexts.pop(container_id)
-
-                # Write to continaers database
-                self.spider_manager_db.switch_database("containers")
-                self.spider_manager_db.update(
-                    "runtimes",
-                    {
-                        'Status': status.value,
-                        'RetCode': ret_code
-                    }, f"WHERE ID='{container_id}'")
-
-                # Clean resources
-                context['manager'].shutdown()
+                try:
+                    self.__release_context(container_id, context)
+
+                except Exception:
+                    # The monitor goes on with the other containers
+                    logging.error(f"Unable to record the exit of container '{container_id}'.", exc_info=True)
 
             sleep(0.5)  # Surrender CPU
 
+    def __release_context(self, container_id: str, context: Dict[str, Any]) -> None:
+        """Record the exit of a dead container process, once, by the monitor or the platform exit."""
+        with self.spider_contexts_lock:
+            if (self.spider_contexts.get(container_id) is not context):
+                # Released by the other one
+                return
+
+            self.spider_contexts.pop(container_id)
+
+        try:
+            shares: SpiderShares = context['shares']
+            ret_code = shares.ret_code.get()
+            status = ContainerStatus.TERMINATED
+
+            if (ret_code == SpiderCodes.STATUS_SUCCESS and context['process'].exitcode != 0):
+                # Died before reporting
+                ret_code = SpiderCodes.STATUS_EXIT_UNEXPECTED.value
+
+            self.scheduler.notify_exit(container_id)
+
+            if (ret_code == SpiderCodes.STATUS_DOG_TRIGGER):
+                self.platform_metrics.count("watchdog_triggers", context['name'])
+
+            # Wait for the next cron run
+            if (ret_code == SpiderCodes.STATUS_SUCCESS and self.scheduler.is_scheduled(container_id)):
+                status = ContainerStatus.TIMER_WAITING
+            else:
+                self.scheduler.remove(container_id)
+
+            # Write to continaers database
+            self.container_registry.update(container_id, Status=status.value, RetCode=ret_code)
+
+        finally:
+            # Clean resources
+            context['manager'].shutdown()
+
     def __init_database(self):
         if (not self.spider_manager_db.is_database_exists("packages")
                 and not self.spider_manager_db.is_database_exists("containers")):
@@ -154,48 +237,245 @@ class SpiderManager():
                 'Cron': "0 0 * * * *"
             }.items())
 
-    def __install_modules(self, module_names: List[str]) -> None:
-        for module_name in module_names:
-            if (importlib.util.find_spec(module_name) is not None):
+    def __rebuild_table_with_key(self, db: SQLite, table_name: str, primary_key: str) -> None:
+        column_infos = db.execute(f"PRAGMA table_info(`{table_name}`)")[RetIndices.RESULT]
+
+        columns = []
+        column_names = []
+        for _, column_name, type_str, _, default_value, _ in column_infos:
+            column = f"`{column_name}` {type_str}"
+            if (column_name == primary_key):
+                # NOCASE lets `LIKE 'prefix%'` use the key index
+                column += " COLLATE NOCASE PRIMARY KEY"
+            elif (default_value is not None):
+                column += f" DEFAULT {default_value}"
+
+            columns.append(column)
+            column_names.append(f"`{column_name}`")
+
+        columns_str = ",".join(column_names)
+
+        with db.transaction() as transaction:
+            transaction.execute(f"CREATE TABLE `{table_name}_rebuild` ({','.join(columns)})")
+            transaction.execute(
+                f"INSERT OR REPLACE INTO `{table_name}_rebuild` ({columns_str}) SELECT {columns_str} FROM `{table_name}`"
+            )
+            transaction.execute(f"DROP TABLE `{table_name}`")
+            transaction.execute(f"ALTER TABLE `{table_name}_rebuild` RENAME TO `{table_name}`")
+
+    def __migrate_database(self):
+        # Packages
+        version = self.packages_db.execute("PRAGMA user_version")[RetIndices.RESULT][0][0]
+
+        if (version < 1):
+            # Keys and indexes
+            for table_name in ("infos", "runtimes", "schedules"):
+                self.__rebuild_table_with_key(self.packages_db, table_name, "ID")
+            self.packages_db.execute("CREATE INDEX IF NOT EXISTS `idx_infos_name_tag` ON `infos` (`Name`, `Tag`)")
+
+        self.packages_db.execute(f"PRAGMA user_version={SCHEMA_VERSIONS['packages']}")
+
+        # Containers
+        version = self.containers_db.execute("PRAGMA user_version")[RetIndices.RESULT][0][0]
+
+        if (version < 1):
+            # Persisted schedules
+            self.containers_db.execute("ALTER TABLE schedules ADD COLUMN NextRun VARCHAR(255) DEFAULT ''")
+            self.containers_db.execute("ALTER TABLE schedules ADD COLUMN Overlap VARCHAR(255) DEFAULT 'skip'")
+            self.containers_db.execute("ALTER TABLE schedules ADD COLUMN Jitter INTEGER DEFAULT 0")
+
+        if (version < 2):
+            # Keys and indexes
+            for table_name in ("infos", "runtimes", "schedules"):
+                self.__rebuild_table_with_key(self.containers_db, table_name, "ID")
+            self.containers_db.execute("CREATE INDEX IF NOT EXISTS `idx_infos_name` ON `infos` (`Name`)")
+
+        self.containers_db.execute(f"PRAGMA user_version={SCHEMA_VERSIONS['containers']}")
+
+    def __restore_schedules(self):
+        is_catch_up = ctx.multiprocess_get_global("Spiders.CRON_CATCH_UP")
+
+        for record in self.container_registry.all():
+            status = ContainerStatus(record['Status'])
+            if (status == ContainerStatus.RUNNING):
+                # Process has gone with the previous platform
+                status = ContainerStatus.TIMER_WAITING if record['NextRun'] else ContainerStatus.TERMINATED
+                self.__set_container_status(record['ID'], status)
+
+            if (not record['NextRun'] or record['Daemon']):
                 continue
 
-            subprocess.check_call(["python", "-m", "pip", "install", module_name])
+            next_run = datetime.strptime(record['NextRun'], DATETIME_FORMAT)
+            if (next_run < datetime.now() and not is_catch_up):
+                next_run = None
 
-    def __set_container_status(self, container_id: str, status: ContainerStatus):
-        self.spider_manager_db.switch_database("containers")
-        self.spider_manager_db.update("runtimes", {
-            'Status': status.value
-        }, f"WHERE ID='{container_id}'")
+            self.scheduler.add(record['ID'], record['Cron'], OverlapPolicy(record['Overlap']), record['Jitter'], next_run)
 
-    def __cron_task(self, container_id: str):
-        self.start(container_id)
+    def __persist_next_run(self, container_id: str, next_run: Optional[datetime]) -> None:
+        self.container_registry.update(
+            container_id,
+            NextRun=next_run.strftime(DATETIME_FORMAT) if next_run is not None else ''
+        )
 
-    def safety_exit(self):
-        self.spider_manager_db.switch_database("containers")
-        column_names, results = self.spider_manager_db.select(
-            "runtimes",
-            f"WHERE Status!={ContainerStatus.TERMINATED}"
+    def __resolve_container(self, spider_name_or_id: str) -> Optional[Dict[str, Any]]:
+        matched = self.container_registry.match(spider_name_or_id)
+
+        if (len(matched) == 0):
+            print(f"Unable to find spider '{spider_name_or_id}' locally.")
+            return None
+
+        if (len(matched) > 1):
+            print(f"Spider '{spider_name_or_id}' is ambiguous, it matches {len(matched)} containers.")
+            return None
+
+        return self.container_registry.get(matched[0])
+
+    def __is_container_running(self, container_id: str) -> bool:
+        with self.spider_contexts_lock:
+            return container_id in self.spider_contexts
+
+    def __wait_container_exit(self, container_id: str) -> None:
+        with self.spider_contexts_lock:
+            context_combine = self.spider_contexts.get(container_id)
+
+        if (context_combine is None):
+            return
+
+        context_combine['process'].join()
+
+        # Waiting for the monitor to release it
+        while self.__is_container_running(container_id):
+            sleep(0.1)
+
+    def __get_env_dir(self, pkg_id: str) -> str:
+        return os.path.join(self.env_root_dir, pkg_id)
+
+    def __prepare_package_envs(self) -> None:
+        try:
+            self.__rebuild_package_envs()
+
+        except Exception:
+            logging.error("Unable to prepare the package environments.", exc_info=True)
+
+        finally:
+            self.package_envs_ready.set()
+
+    def __rebuild_package_envs(self) -> None:
+        column_names, results = self.packages_db.select("runtimes")
+
+        id_index = column_names.index("ID")
+        dependencies_index = column_names.index("Dependencies")
+
+        jobs = []
+        for result in results:
+            env_dir = self.__get_env_dir(result[id_index])
+            if (is_site_dir_ready(env_dir)):
+                continue
+
+            os.makedirs(env_dir, exist_ok=True)
+            jobs.append((json.loads(result[dependencies_index]), env_dir))
+
+        if (len(jobs) == 0):
+            return
+
+        try:
+            build_site_dirs(jobs, self.wheelhouse_dir)
+
+        except subprocess.CalledProcessError:
+            logging.warning("Unable to rebuild some package environments from the wheelhouse.")
+
+    def __get_package_runtime(self, pkg_name_tag: str) -> Optional[Tuple[str, List[str]]]:
+        """ID and dependencies of a package."""
+        pkg_name, pkg_tag = pkg_name_tag.split(':')
+
+        column_names, results = self.packages_db.select(
+            "infos",
+            f"JOIN runtimes ON infos.ID = runtimes.ID WHERE infos.Name='{pkg_name}' AND infos.Tag='{pkg_tag}'"
         )
 
         if (len(results) == 0):
-            return
+            return None
 
-        container_id_index = column_names.index("ID")
+        package = dict(zip(column_names, results[0]))
 
-        # Send a stop signal to all running spiders
-        for container in results:
-            container_id = container[container_id_index]
+        return (package["ID"], json.loads(package["Dependencies"]))
 
-            context_combine = self.spider_contexts[container_id]
+    def __ensure_package_env(self, pkg_id: str, dependencies: List[str]) -> bool:
+        # Not while the same directory may be rebuilt
+        self.package_envs_ready.wait()
 
-            spider_shares: SpiderShares
-            spider_shares = context_combine['shares']
+        env_dir = self.__get_env_dir(pkg_id)
+        if (is_site_dir_ready(env_dir)):
+            return True
 
-            spider_shares.is_stop_event.set()
+        os.makedirs(env_dir, exist_ok=True)
 
-        # Waiting for the spiders to stop
-        while not self.spider_contexts:
-            sleep(0.5)  # Surrender CPU
+        try:
+            build_site_dir(dependencies, self.wheelhouse_dir, env_dir)
+
+        except subprocess.CalledProcessError:
+            try:
+                # Wheels are not cached on this machine yet
+                resolve_wheels(dependencies, self.wheelhouse_dir)
+                build_site_dir(dependencies, self.wheelhouse_dir, env_dir)
+
+            except subprocess.CalledProcessError:
+                return False
+
+        return True
+
+    def __set_container_status(self, container_id: str, status: ContainerStatus):
+        self.container_registry.update(container_id, Status=status.value)
+
+    def __terminate_contexts(self) -> None:
+        with self.spider_contexts_lock:
+            context_combines = list(self.spider_contexts.values())
+
+        for context_combine in context_combines:
+            process: Process = context_combine['process']
+            if (process.is_alive()):
+                process.terminate()
+
+    def __cron_task(self, container_id: str) -> bool:
+        return self.start(container_id)
+
+    def safety_exit(self):
+        # Stop dispatching, the persisted schedules are caught up at the next start
+        self.scheduler.stop()
+
+        with self.spider_contexts_lock:
+            context_combines = list(self.spider_contexts.items())
+
+        if (len(context_combines) == 0):
+            return
+
+        # Stop all running spiders at once
+        results = self.shutdown_coordinator.shutdown(context_combines)
+
+        print(tabulate(
+            [
+                (
+                    result.container_id[:12],
+                    result.name,
+                    result.outcome.value,
+                    "yes" if result.is_flushed else "NO",
+                    result.exitcode,
+                    f"{result.seconds:.2f}s"
+                )
+                for result in results
+            ],
+            ("CONTAINER ID", "NAMES", "OUTCOME", "FLUSHED", "EXIT CODE", "TIME"),
+            tablefmt='plain',
+            disable_numparse=True
+        ))
+
+        # Every process has ended, the exits are recorded here instead of waiting for the monitor
+        for container_id, context_combine in context_combines:
+            try:
+                self.__release_context(container_id, context_combine)
+
+            except Exception:
+                logging.error(f"Unable to record the exit of container '{container_id}'.", exc_info=True)
 
     def load(self, pkg_file_path: str) -> None:
         if (not is_file_exists(pkg_file_path)):
@@ -225,8 +505,21 @@ class SpiderManager():
         compose_runtimes = compose['runtimes']
         compose_schedule = compose['schedules']
 
-        self.spider_manager_db.switch_database("packages")
-        self.spider_manager_db.insert("infos", {
+        # Resolve dependencies into the wheelhouse once, and build the package environment.
+        env_dir = self.__get_env_dir(pkg_id)
+        os.makedirs(env_dir, exist_ok=True)
+
+        try:
+            resolve_wheels(compose_runtimes['dependencies'], self.wheelhouse_dir)
+            build_site_dir(compose_runtimes['dependencies'], self.wheelhouse_dir, env_dir)
+
+        except subprocess.CalledProcessError:
+            print(f"Unable to resolve dependencies of package '{pkg_file_path}'.")
+            shutil.rmtree(pkg_dir, ignore_errors=True)
+            shutil.rmtree(env_dir, ignore_errors=True)
+            return
+
+        self.packages_db.insert("infos", {
             'Name': compose_infos['name'],
             'Tag': compose_infos['tag'],
             'ID': pkg_id,
@@ -238,21 +531,20 @@ class SpiderManager():
             'Author': compose_infos['author'],
             'Desc': compose_infos['desc'],
         })
-        self.spider_manager_db.insert("runtimes", {
+        self.packages_db.insert("runtimes", {
             'ID': pkg_id,
             'Entry': compose_runtimes['entry'],
             'Daemon': compose_runtimes['daemon'],
             'Envs': json.dumps(compose_runtimes['envs']),
             'Dependencies': json.dumps(compose_runtimes['dependencies'])
         })
-        self.spider_manager_db.insert("schedules", {
+        self.packages_db.insert("schedules", {
             'ID': pkg_id,
             'Cron': compose_schedule['cron']
         })
 
     def packages(self) -> List:
-        self.spider_manager_db.switch_database("packages")
-        column_names, results = self.spider_manager_db.select("infos")
+        column_names, results = self.packages_db.select("infos")
 
         id_index = column_names.index("ID")
         size_index = column_names.index("Size")
@@ -277,7 +569,9 @@ class SpiderManager():
             entry: Optional[str] = None,
             daemon: Optional[bool] = None,
             envs: Optional[Dict[str, str]] = None,
-            cron: Optional[str] = None) -> bool:
+            cron: Optional[str] = None,
+            overlap: Optional[str] = None,
+            jitter: Optional[int] = None) -> bool:
 
         combine = pkg_name_tag.split(':')
         if (len(combine) != 2):
@@ -286,48 +580,42 @@ class SpiderManager():
 
         pkg_name, pkg_tag = combine
 
-        # Read infos table
-        self.spider_manager_db.switch_database("packages")
-        column_names, results = self.spider_manager_db.select("infos", f"WHERE Name='{pkg_name}' AND Tag='{pkg_tag}'")
+        # Read infos, runtimes and schedules tables at once
+        column_names, results = self.packages_db.select(
+            "infos",
+            "JOIN runtimes ON infos.ID = runtimes.ID JOIN schedules ON infos.ID = schedules.ID "
+            f"WHERE infos.Name='{pkg_name}' AND infos.Tag='{pkg_tag}'"
+        )
         if (len(results) == 0):
             print(f"Unable to find package '{pkg_name_tag}' locally.")
             return False
 
-        id_index = column_names.index("ID")
-        pkg_id = results[0][id_index]
+        package = dict(zip(column_names, results[0]))
 
-        # Read runtimes table
-        column_names, results = self.spider_manager_db.select("runtimes", f"WHERE ID='{pkg_id}'")
-        entry_index = column_names.index("Entry")
-        daemon_index = column_names.index("Daemon")
-        envs_index = column_names.index("Envs")
-        dependencies_index = column_names.index("Dependencies")
-        default_entry = results[0][entry_index]
-        default_daemon = results[0][daemon_index]
+        pkg_id = package["ID"]
+        default_entry = package["Entry"]
+        default_daemon = package["Daemon"]
+        default_cron = package["Cron"]
 
         default_envs: Dict[str, str]
         dependencies: List[str]
-        default_envs = json.loads(results[0][envs_index])
-        dependencies = json.loads(results[0][dependencies_index])
+        default_envs = json.loads(package["Envs"])
+        dependencies = json.loads(package["Dependencies"])
 
-        # Read schedules table
-        column_names, results = self.spider_manager_db.select("schedules", f"WHERE ID='{pkg_id}'")
-        cron_index = column_names.index("Cron")
-        default_cron = results[0][cron_index]
-
-        # Install modules
-        self.__install_modules(dependencies)
+        # Make sure the package environment exists
+        if (not self.__ensure_package_env(pkg_id, dependencies)):
+            print(f"Unable to prepare dependencies of package '{pkg_name_tag}'.")
+            return False
 
         # Generate container id
-        self.spider_manager_db.switch_database("containers")
         container_id = md5(bytes(str(time.time()), encoding='utf-8')).hexdigest()
 
         # Generate container created
-        container_created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        container_created = datetime.now().strftime(DATETIME_FORMAT)
 
         # Generate container name
         container_name = name
-        if (len(self.spider_manager_db.select("infos", f"WHERE Name='{name}'")[1]) != 0 or name is None):
+        if (name is None or self.container_registry.is_name_exists(name)):
             container_name = generate_unique_docker_style_name()
 
         # Determine container configuration
@@ -351,22 +639,30 @@ class SpiderManager():
         if (cron is None):
             container_cron = default_cron
 
+        # Overlap policy and jitter of cron runs
+        container_overlap = OverlapPolicy(overlap or ctx.multiprocess_get_global("Spiders.CRON_OVERLAP") or "skip")
+
+        container_jitter = jitter
+        if (jitter is None):
+            container_jitter = ctx.multiprocess_get_global("Spiders.CRON_JITTER") or 0
+
         # Write configuration in database
-        self.spider_manager_db.insert("infos", {
+        self.container_registry.add({
             'ID': container_id,
             'Package': pkg_name_tag,
             'Created': container_created,
-            'Name': container_name
-        })
-        self.spider_manager_db.insert("runtimes", {
-            'ID': container_id,
+            'Name': container_name,
+
+            'Status': ContainerStatus.CREATED.value,
+            'RetCode': SpiderCodes.STATUS_SUCCESS.value,
             'Entry': container_entry,
             'Daemon': container_daemon,
             'Envs': json.dumps(container_envs),
-        })
-        self.spider_manager_db.insert("schedules", {
-            'ID': container_id,
-            'Cron': container_cron
+
+            'Cron': container_cron,
+            'NextRun': '',
+            'Overlap': container_overlap.value,
+            'Jitter': container_jitter
         })
 
         # Create container root directory
@@ -386,196 +682,160 @@ class SpiderManager():
             os.path.join(container_directory, container_name)
         )
 
-        self.__set_container_status(container_id, ContainerStatus.CREATED)
-
         # Start container
         self.start(container_id)
 
         # Print container id like Docker
         print(container_id)
 
-    def start(self, spider_name_or_id: str):
-        self.spider_manager_db.switch_database("containers")
-
-        # Read infos table
-        column_names, results = self.spider_manager_db.select(
-            "infos",
-            f"WHERE ID LIKE '%{spider_name_or_id}%' OR Name='{spider_name_or_id}'"
-        )
+    def start(self, spider_name_or_id: str) -> bool:
+        record = self.__resolve_container(spider_name_or_id)
+        if (record is None):
+            return False
 
-        if (len(results) == 0):
-            print(f"Unable to find spider '{spider_name_or_id}' locally.")
-            return
+        container_id = record['ID']
+        container_name = record['Name']
+        container_package = record['Package']
 
-        container_id_index = column_names.index("ID")
-        container_name_index = column_names.index("Name")
+        container_entry = record['Entry']
+        container_daemon = record['Daemon']
+        container_envs = json.loads(record['Envs'])
 
-        container_id = results[0][container_id_index]
-        container_name = results[0][container_name_index]
+        container_cron = record['Cron']
+        container_overlap = OverlapPolicy(record['Overlap'])
+        container_jitter = record['Jitter']
 
-        # Read runtimes table
-        column_names, results = self.spider_manager_db.select(
-            "runtimes",
-            f"WHERE ID='{container_id}'"
-        )
+        runtime = self.__get_package_runtime(container_package)
+        if (runtime is None):
+            print(f"Unable to find package '{container_package}' locally.")
+            return False
 
-        container_entry_index = column_names.index("Entry")
-        container_daemon_index = column_names.index("Daemon")
-        container_envs_index = column_names.index("Envs")
+        pkg_id, dependencies = runtime
 
-        container_entry = results[0][container_entry_index]
-        container_daemon = results[0][container_daemon_index]
-        container_envs = json.loads(results[0][container_envs_index])
+        if (not self.package_envs_ready.is_set()):
+            logging.info("Waiting for the package environments to be rebuilt.")
 
-        # Read schedules table
-        column_names, results = self.spider_manager_db.select(
-            "schedules",
-            f"WHERE ID='{container_id}'"
-        )
+        # The background rebuild only logs its failures, the environment may still be missing
+        if (not self.__ensure_package_env(pkg_id, dependencies)):
+            print(f"Unable to prepare dependencies of package '{container_package}'.")
+            return False
 
-        container_cron_index = column_names.index("Cron")
-        container_cron = results[0][container_cron_index]
+        with self.start_lock:
+            # The running check and the registration are atomic against another start
+            if (self.__is_container_running(container_id)):
+                print(f"Spider '{spider_name_or_id}' is already running.")
+                return False
+
+            # Package all context infos
+            context_infos = {
+                'container_root_dir': self.container_root_dir,
+                'container_id': container_id,
+                'container_name': container_name,
+                'container_entry': container_entry,
+                'container_site_dir': get_site_dir(self.__get_env_dir(pkg_id))
+            }
 
-        # Package all context infos
-        context_infos = {
-            'container_root_dir': self.container_root_dir,
-            'container_id': container_id,
-            'container_name': container_name,
-            'container_entry': container_entry
-        }
+            db_path = os.path.join(
+                self.container_root_dir,
+                container_id,
+                "db"
+            )
 
-        db_path = os.path.join(
-            self.container_root_dir,
-            container_id,
-            "db"
-        )
+            process_manager = Manager()
+            spider_shares = SpiderShares(process_manager)
+            spider_shares.control.set(ControlSlots.DAEMON, container_daemon)
+            spider_shares.spider_db_dir.set(db_path)
+
+            process = Process(target=context_main,
+                              name=f"spider_<{container_id}>_context",
+                              args=(
+                                  context_infos,
+                                  container_envs,
+                                  ctx._multiprocess_globals,
+                                  ctx._multiprocess_version,
+                                  spider_shares),
+                              # A daemon process can not start the workers of `offload`
+                              daemon=False
+                              )
+
+            # Registered once started, the monitor takes a process that is not alive for a dead one
+            process.start()
 
-        process_manager = Manager()
-        spider_shares = SpiderShares(process_manager)
-        spider_shares.is_daemon.set(container_daemon)
-        spider_shares.spider_db_dir.set(db_path)
-
-        process = Process(target=context_main,
-                          name=f"spider_<{container_id}>_context",
-                          args=(
-                              context_infos,
-                              container_envs,
-                              ctx._multiprocess_globals,
-                              spider_shares),
-                          daemon=True
-                          )
+            with self.spider_contexts_lock:
+                self.spider_contexts[container_id] = {
+                    'name': container_name,
+                    'cron': container_cron,
+                    'manager': process_manager,
+                    'shares': spider_shares,
+                    'process': process,
+                }
+
+        if (ContainerStatus(record['Status']) == ContainerStatus.TERMINATED
+                and record['RetCode'] != SpiderCodes.STATUS_SUCCESS):
+            # Started again after a crash or the watchdog, cron runs are not restarts
+            self.platform_metrics.count("restarts", container_name)
 
-        with self.spider_contexts_lock:
-            self.spider_contexts[container_id] = {
-                'cron': container_cron,
-                'manager': process_manager,
-                'shares': spider_shares,
-                'process': process,
-            }
+        self.__set_container_status(container_id, ContainerStatus.RUNNING)
 
-        process.start()
+        # Arm the cron schedule of a non daemon container
+        if (not container_daemon and not self.scheduler.is_scheduled(container_id)):
+            self.scheduler.add(container_id, container_cron, container_overlap, container_jitter)
 
-        self.__set_container_status(container_id, ContainerStatus.RUNNING)
+        return True
 
     def stop(self, spider_name_or_id: str):
-        self.spider_manager_db.switch_database("containers")
+        record = self.__resolve_container(spider_name_or_id)
+        if (record is None):
+            return
 
-        # Read infos table
-        column_names, results = self.spider_manager_db.select(
-            "infos",
-            f"WHERE ID LIKE '%{spider_name_or_id}%' OR Name='{spider_name_or_id}'"
-        )
+        container_id = record['ID']
 
-        if (len(results) == 0):
-            print(f"Unable to find spider '{spider_name_or_id}' locally.")
-            return
+        # A stopped container is not scheduled anymore
+        self.scheduler.remove(container_id)
 
-        container_id_index = column_names.index("ID")
-        container_id = results[0][container_id_index]
+        with self.spider_contexts_lock:
+            context_combine = self.spider_contexts.get(container_id)
 
-        context_combine = self.spider_contexts[container_id]
+        if (context_combine is None):
+            self.__set_container_status(container_id, ContainerStatus.TERMINATED)
+            return
 
         spider_shares: SpiderShares
         spider_shares = context_combine['shares']
 
-        spider_shares.is_stop_event.set()
+        spider_shares.control.set(ControlSlots.STOP)
+        spider_shares.control.notify(context_combine['process'].pid)
 
     def restart(self, spider_name_or_id: str):
-        self.spider_manager_db.switch_database("containers")
-
-        # Read infos table
-        column_names, results = self.spider_manager_db.select(
-            "infos",
-            f"WHERE ID LIKE '%{spider_name_or_id}%' OR Name='{spider_name_or_id}'"
-        )
-
-        if (len(results) == 0):
-            print(f"Unable to find spider '{spider_name_or_id}' locally.")
+        record = self.__resolve_container(spider_name_or_id)
+        if (record is None):
             return
 
-        container_id_index = column_names.index("ID")
-        container_id = results[0][container_id_index]
-
-        # Read runtimes table
-        column_names, results = self.spider_manager_db.select(
-            "runtimes",
-            f"WHERE ID='{container_id}'"
-        )
-
-        status_index = column_names.index("Status")
-        status = ContainerStatus(results[0][status_index])
+        container_id = record['ID']
+        status = ContainerStatus(record['Status'])
 
         if (status != ContainerStatus.TERMINATED):
-            self.stop(spider_name_or_id)
+            self.stop(container_id)
+            self.__wait_container_exit(container_id)
 
-        self.start(spider_name_or_id)
+        self.start(container_id)
 
     def rm(self, spider_name_or_id: str, is_force: bool = False):
-        self.spider_manager_db.switch_database("containers")
-
-        # Read infos table
-        column_names, results = self.spider_manager_db.select(
-            "infos",
-            f"WHERE ID LIKE '%{spider_name_or_id}%' OR Name='{spider_name_or_id}'"
-        )
-
-        if (len(results) == 0):
-            print(f"Unable to find spider '{spider_name_or_id}' locally.")
+        record = self.__resolve_container(spider_name_or_id)
+        if (record is None):
             return
 
-        container_id_index = column_names.index("ID")
-        container_id = results[0][container_id_index]
-
-        # Read runtimes table
-        column_names, results = self.spider_manager_db.select(
-            "runtimes",
-            f"WHERE ID='{container_id}'"
-        )
-
-        status_index = column_names.index("Status")
-        status = ContainerStatus(results[0][status_index])
+        container_id = record['ID']
+        status = ContainerStatus(record['Status'])
 
         if (status != ContainerStatus.TERMINATED and not is_force):
             print("This spider is currently running, if you confirm to delete it, please use the '-f --force' parameter.")
             return
 
-        # Remove infos table
-        self.spider_manager_db.delete(
-            "infos",
-            f"WHERE ID='{container_id}'"
-        )
-
-        # Remove runtimes table
-        self.spider_manager_db.delete(
-            "runtimes",
-            f"WHERE ID='{container_id}'"
-        )
+        self.scheduler.remove(container_id)
 
-        # Remove schedules table
-        self.spider_manager_db.delete(
-            "schedules",
-            f"WHERE ID='{container_id}'"
-        )
+        # Remove infos, runtimes and schedules tables
+        self.container_registry.remove(container_id)
 
         # Remove container folder and files
         container_directory = os.path.join(
@@ -585,8 +845,6 @@ class SpiderManager():
         shutil.rmtree(container_directory, ignore_errors=True)
 
     def rmi(self, pkg_name_tag: str):
-        self.spider_manager_db.switch_database("packages")
-
         combine = pkg_name_tag.split(':')
         if (len(combine) != 2):
             print(f"Unresolvable spider package name '{pkg_name_tag}'.")
@@ -595,8 +853,7 @@ class SpiderManager():
         pkg_name, pkg_tag = combine
 
         # Read infos table
-        self.spider_manager_db.switch_database("packages")
-        column_names, results = self.spider_manager_db.select("infos", f"WHERE Name='{pkg_name}' AND Tag='{pkg_tag}'")
+        column_names, results = self.packages_db.select("infos", f"WHERE Name='{pkg_name}' AND Tag='{pkg_tag}'")
         if (len(results) == 0):
             print(f"Unable to find package '{pkg_name_tag}' locally.")
             return False
@@ -611,30 +868,29 @@ class SpiderManager():
         )
         shutil.rmtree(pkg_directory, ignore_errors=True)
 
+        # Remove package environment, wheels are kept in the wheelhouse for reuse
+        shutil.rmtree(self.__get_env_dir(pkg_id), ignore_errors=True)
+
         # Remove infos table
-        self.spider_manager_db.delete(
+        self.packages_db.delete(
             "infos",
             f"WHERE Name='{pkg_name}' AND Tag='{pkg_tag}'"
         )
 
         # Remove runtimes table
-        self.spider_manager_db.delete(
+        self.packages_db.delete(
             "runtimes",
             f"WHERE ID='{pkg_id}'"
         )
 
         # Remove schedules table
-        self.spider_manager_db.delete(
+        self.packages_db.delete(
             "schedules",
             f"WHERE ID='{pkg_id}'"
         )
 
     def ps(self, is_all: bool = False) -> List:
-        self.spider_manager_db.switch_database("containers")
-
-        # Read join table
-        column_names, results = self.spider_manager_db.select("infos", "JOIN runtimes ON infos.ID = runtimes.ID")
-        join_list = [dict(zip(column_names, row)) for row in results]
+        join_list = self.container_registry.all()
 
         ps_list = []
         columns = ["Container ID", "Package", "Entry", "Created", "Status", "Names"]
@@ -647,7 +903,7 @@ class SpiderManager():
                 item["ID"][:12],
                 item["Package"],
                 item["Entry"],
-                human_readable_time_difference(datetime.strptime(item["Created"], "%Y-%m-%d %H:%M:%S")),
+                human_readable_time_difference(datetime.strptime(item["Created"], DATETIME_FORMAT)),
 
                 ContainerStatus(item["Status"]).name
                 if item["Status"] != ContainerStatus.TERMINATED
@@ -663,32 +919,48 @@ class SpiderManager():
             disable_numparse=True
         ))
 
-    def logs(self, spider_name_or_id: str) -> None:
-        self.spider_manager_db.switch_database("containers")
+    def inspect(self, spider_name_or_id: str) -> None:
+        record = self.__resolve_container(spider_name_or_id)
+        if (record is None):
+            return
 
-        # Read infos table
-        column_names, results = self.spider_manager_db.select(
-            "infos",
-            f"WHERE ID LIKE '%{spider_name_or_id}%' OR Name='{spider_name_or_id}'"
-        )
+        infos = dict(record)
+        infos['Status'] = ContainerStatus(record['Status']).name
+        infos['RetCode'] = SpiderCodes(record['RetCode']).name
 
-        if (len(results) == 0):
-            print(f"Unable to find spider '{spider_name_or_id}' locally.")
+        print(tabulate(list(infos.items()), tablefmt='plain', disable_numparse=True))
+        print()
+
+        # Watermarks are next to the data, in the data database of the container
+        data_db = None
+        try:
+            data_db = open_data_database(os.path.join(self.container_root_dir, record['ID'], "db"))
+            watermarks = read_watermarks(data_db) if data_db.switch_database(record['Name']) else {}
+
+        except Exception as e:
+            print(f"Unable to read the watermarks: {e}")
             return
 
-        id_index = column_names.index("ID")
-        name_index = column_names.index("Name")
-        container_id = results[0][id_index]
-        container_name = results[0][name_index]
+        finally:
+            # The container may be started again, it must not inherit the connection
+            if (data_db is not None):
+                data_db.close()
 
-        # Read runtimes table
-        column_names, results = self.spider_manager_db.select(
-            "runtimes",
-            f"WHERE ID='{container_id}'"
-        )
+        print(tabulate(
+            [(source, display, updated) for source, (_, display, updated) in sorted(watermarks.items())],
+            ("SOURCE", "WATERMARK", "UPDATED"),
+            tablefmt='plain',
+            disable_numparse=True
+        ))
+
+    def logs(self, spider_name_or_id: str) -> None:
+        record = self.__resolve_container(spider_name_or_id)
+        if (record is None):
+            return
 
-        status_index = column_names.index("Status")
-        status = ContainerStatus(results[0][status_index])
+        container_id = record['ID']
+        container_name = record['Name']
+        status = ContainerStatus(record['Status'])
 
         if (status == ContainerStatus.RUNNING):
             # By invoke to process
@@ -698,8 +970,9 @@ class SpiderManager():
             spider_shares: SpiderShares
             spider_shares = context_combine['shares']
 
-            spider_shares.is_logs.set(True)
-            while spider_shares.is_logs.get():
+            spider_shares.control.set(ControlSlots.LOGS)
+            spider_shares.control.notify(context_combine['process'].pid)
+            while spider_shares.control.get(ControlSlots.LOGS):
                 time.sleep(0.5)
                 continue
 
@@ -714,8 +987,264 @@ class SpiderManager():
         spider_db = SQLite(db_path)
         spider_db.switch_database(container_name)
 
-        column_names, results = spider_db.select("logs")
+        try:
+            column_names, results = spider_db.select("logs")
+
+        finally:
+            # The container may be started again, it must not inherit the connection
+            spider_db.close()
 
         message_index = column_names.index("MESSAGE")
         for result in results:
             print(result[message_index])
+
+    def profile(self, spider_name_or_id: str, seconds: float = 10) -> None:
+        record = self.__resolve_container(spider_name_or_id)
+        if (record is None):
+            return
+
+        container_id = record['ID']
+
+        with self.spider_contexts_lock:
+            context_combine = self.spider_contexts.get(container_id)
+
+        if (context_combine is None):
+            print(f"Spider '{spider_name_or_id}' is not running.")
+            return
+
+        spider_shares: SpiderShares
+        spider_shares = context_combine['shares']
+
+        spider_shares.profile_report.set("")
+        spider_shares.profile_seconds.set(seconds)
+        spider_shares.control.set(ControlSlots.PROFILE)
+        spider_shares.control.notify(context_combine['process'].pid)
+
+        print(f"Profiling '{record['Name']}' for {seconds}s...")
+
+        # The container picks the request up within one loop, then needs time to write the report
+        deadline = time.monotonic() + seconds + 30
+        while spider_shares.control.get(ControlSlots.PROFILE):
+            if (time.monotonic() > deadline or not context_combine['process'].is_alive()):
+                print(f"Spider '{spider_name_or_id}' did not answer the profile request.")
+                return
+
+            time.sleep(0.5)
+
+        print(spider_shares.profile_report.get())
+
+    def memsnap(self, spider_name_or_id: str, command: str = "snap") -> None:
+        record = self.__resolve_container(spider_name_or_id)
+        if (record is None):
+            return
+
+        with self.spider_contexts_lock:
+            context_combine = self.spider_contexts.get(record['ID'])
+
+        if (context_combine is None):
+            print(f"Spider '{spider_name_or_id}' is not running.")
+            return
+
+        spider_shares: SpiderShares
+        spider_shares = context_combine['shares']
+
+        spider_shares.memsnap_report.set("")
+        spider_shares.memsnap_command.set(command)
+        spider_shares.control.set(ControlSlots.MEMSNAP)
+        spider_shares.control.notify(context_combine['process'].pid)
+
+        deadline = time.monotonic() + 60
+        while spider_shares.control.get(ControlSlots.MEMSNAP):
+            if (time.monotonic() > deadline or not context_combine['process'].is_alive()):
+                print(f"Spider '{spider_name_or_id}' did not answer the memory snapshot request.")
+                return
+
+            time.sleep(0.5)
+
+        print(spider_shares.memsnap_report.get())
+
+    def __sample_stats(self,
+                       container_ids: Optional[List[str]],
+                       last_counters: Dict[str, tuple]) -> List[tuple]:
+
+        with self.spider_contexts_lock:
+            contexts = [
+                (container_id, context['process'].pid, context['shares'].metrics)
+                for container_id, context in self.spider_contexts.items()
+                if container_ids is None or container_id in container_ids
+            ]
+
+        self.proc_sampler.forget(set(pid for _, pid, _ in contexts))
+
+        def format_value(value, fmt: str = "{:.2f}") -> str:
+            return "--" if value is None else fmt.format(value)
+
+        now = time.monotonic()
+        stats_list = []
+        for container_id, pid, metrics in contexts:
+            record = self.container_registry.get(container_id)
+            if (record is None or pid is None):
+                continue
+
+            usage = self.proc_sampler.sample(pid)
+            ingest = metrics.snapshot()
+
+            # Rates since the previous sample
+            rows_rate, logs_rate = None, None
+            last_counter = last_counters.get(container_id)
+            if (last_counter is not None and now > last_counter[0]):
+                rows_rate = (ingest['rows_written'] - last_counter[1]) / (now - last_counter[0])
+                logs_rate = (ingest['log_lines'] - last_counter[2]) / (now - last_counter[0])
+
+            last_counters[container_id] = (now, ingest['rows_written'], ingest['log_lines'])
+
+            stats_list.append((
+                container_id[:12],
+                record['Name'],
+                format_value(usage and usage['cpu_percent'], "{:.2f}%"),
+                "--" if usage is None else covert_size_to_str(usage['rss']),
+                "--" if usage is None else usage['threads'],
+                "--" if usage is None else usage['fds'],
+                format_value(rows_rate),
+                ingest['queue_depth'],
+                format_value(ingest['flush_p50'], "{:.1f}ms"),
+                format_value(ingest['flush_p99'], "{:.1f}ms"),
+                format_value(logs_rate),
+                ingest['db_errors']
+            ))
+
+        return stats_list
+
+    def stats(self,
+              spider_names_or_ids: Optional[List[str]] = None,
+              is_stream: bool = True,
+              interval: float = 1.0) -> None:
+
+        container_ids = None
+        if (spider_names_or_ids):
+            container_ids = []
+            for spider_name_or_id in spider_names_or_ids:
+                record = self.__resolve_container(spider_name_or_id)
+                if (record is None):
+                    return
+
+                container_ids.append(record['ID'])
+
+        columns = ["Container ID", "Name", "CPU %", "Mem Usage", "Threads", "FDs",
+                   "Rows/s", "Queue", "Flush P50", "Flush P99", "Logs/s", "DB Errors"]
+
+        # CPU usage and rates need a first sample to compare with
+        last_counters: Dict[str, tuple] = {}
+        self.__sample_stats(container_ids, last_counters)
+
+        try:
+            while True:
+                sleep(interval)
+                stats_list = self.__sample_stats(container_ids, last_counters)
+
+                if (is_stream):
+                    # Redraw in place
+                    print("\033[H\033[J", end="")
+
+                print(tabulate(
+                    stats_list,
+                    tuple(map(str.upper, columns)),
+                    tablefmt='plain',
+                    disable_numparse=True
+                ))
+
+                if (not is_stream):
+                    return
+
+        except KeyboardInterrupt:
+            print()
+
+    def collect_metrics(self) -> List[MetricFamily]:
+        """Metric families of the platform, read from the shared blocks without any IPC."""
+        with self.spider_contexts_lock:
+            contexts = [
+                (context['name'], context['shares'].metrics.snapshot())
+                for context in self.spider_contexts.values()
+            ]
+
+        platform = self.platform_metrics.snapshot()
+
+        rows = MetricFamily("tsdap_container_rows_ingested_total", "counter", "Rows flushed to the data database.")
+        queue_depth = MetricFamily("tsdap_container_queue_depth", "gauge", "Rows waiting to be flushed.")
+        log_lines = MetricFamily("tsdap_container_log_lines_total", "counter", "Log lines written by the container.")
+        db_errors = MetricFamily("tsdap_container_db_errors_total", "counter", "Failed flushes and table creations.")
+        dedup_checks = MetricFamily("tsdap_container_dedup_checks_total", "counter", "Rows checked by the deduplication.")
+        dedup_hits = MetricFamily("tsdap_container_dedup_filter_hits_total", "counter",
+                                  "Rows the Bloom filters reported as possibly seen.")
+        dedup_duplicates = MetricFamily("tsdap_container_dedup_duplicates_total", "counter", "Duplicate rows dropped.")
+        http_counters = [
+            (MetricFamily("tsdap_container_http_requests_total", "counter", "HTTP attempts, retries included."),
+             'http_requests'),
+            (MetricFamily("tsdap_container_http_errors_total", "counter", "HTTP requests failed after every retry."),
+             'http_errors'),
+            (MetricFamily("tsdap_container_http_retries_total", "counter", "HTTP attempts retried."), 'http_retries'),
+            (MetricFamily("tsdap_container_http_connections_opened_total", "counter", "HTTP connections opened."),
+             'http_connections_opened'),
+            (MetricFamily("tsdap_container_http_connections_reused_total", "counter", "Requests on a kept-alive connection."),
+             'http_connections_reused'),
+            (MetricFamily("tsdap_container_http_throttled_seconds_total", "counter", "Time waited for the rate limits."),
+             'http_throttled_seconds'),
+            (MetricFamily("tsdap_container_http_in_flight", "gauge", "HTTP requests in progress."), 'http_in_flight'),
+            (MetricFamily("tsdap_container_http_cache_hits_total", "counter", "Responses served fresh from the HTTP cache."),
+             'http_cache_hits'),
+            (MetricFamily("tsdap_container_http_cache_revalidations_total", "counter",
+                          "Cached responses revalidated with a 304."), 'http_cache_revalidations'),
+            (MetricFamily("tsdap_container_http_cache_misses_total", "counter", "Cacheable requests fetched in full."),
+             'http_cache_misses')
+        ]
+        http_duration = MetricFamily("tsdap_container_http_duration_seconds", "histogram", "Duration of an HTTP attempt.")
+        flush_size = MetricFamily("tsdap_container_flush_batch_rows", "histogram", "Rows per flush.")
+        flush_duration = MetricFamily("tsdap_container_flush_duration_seconds", "histogram", "Duration of a flush.")
+        execute = MetricFamily("tsdap_db_execute_duration_seconds", "histogram",
+                               "Duration of `IDBCommon.execute` by backend and statement kind.")
+
+        for container_name, snapshot in contexts:
+            labels = {'container': container_name}
+
+            rows.add_sample(labels, snapshot['rows_written'])
+            queue_depth.add_sample(labels, snapshot['queue_depth'])
+            log_lines.add_sample(labels, snapshot['log_lines'])
+            db_errors.add_sample(labels, snapshot['db_errors'])
+            dedup_checks.add_sample(labels, snapshot['dedup_checks'])
+            dedup_hits.add_sample(labels, snapshot['dedup_hits'])
+            dedup_duplicates.add_sample(labels, snapshot['dedup_duplicates'])
+
+            for family, key in http_counters:
+                family.add_sample(labels, snapshot[key])
+
+            histograms = snapshot['histograms']
+            http_duration.add_histogram(labels, *histograms['http_duration'])
+            flush_size.add_histogram(labels, *histograms['flush_size'])
+            flush_duration.add_histogram(labels, *histograms['flush_duration'])
+
+            for key, histogram in histograms.items():
+                if (key[0] == "execute" and histogram[2] != 0):
+                    execute.add_histogram(dict(labels, backend=key[1], kind=key[2]), *histogram)
+
+        for key, histogram in platform['histograms'].items():
+            if (key[0] == "execute" and histogram[2] != 0):
+                execute.add_histogram({'container': "", 'backend': key[1], 'kind': key[2]}, *histogram)
+
+        cron_lag = MetricFamily("tsdap_cron_lag_seconds", "histogram", "Delay between the scheduled and the actual start.")
+        cron_lag.add_histogram({}, *platform['histograms']['cron_lag'])
+
+        watchdog_triggers = MetricFamily("tsdap_watchdog_triggers_total", "counter", "Containers stopped by the watchdog.")
+        restarts = MetricFamily("tsdap_container_restarts_total", "counter",
+                                "Containers started again after a crash or a watchdog trigger.")
+        running = MetricFamily("tsdap_containers_running", "gauge", "Running container processes.")
+        running.add_sample({}, len(contexts))
+
+        for (name, container_name), value in platform['counters'].items():
+            if (name == "watchdog_triggers"):
+                watchdog_triggers.add_sample({'container': container_name}, value)
+            elif (name == "restarts"):
+                restarts.add_sample({'container': container_name}, value)
+
+        return [rows, queue_depth, log_lines, db_errors, dedup_checks, dedup_hits, dedup_duplicates,
+                *[family for family, _ in http_counters], http_duration, flush_size, flush_duration, execute,
+                cron_lag, watchdog_triggers, restarts, running]
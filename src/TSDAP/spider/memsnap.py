@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   memsnap.py
+@Time    :   2026/10/19 15:58:21
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Memory growth diagnostics of a container process
+'''
+
+
+import sys
+import tracemalloc
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from tabulate import tabulate
+
+from utils.files import covert_size_to_str
+
+
+# Frames kept per allocation, more frames cost more memory while tracing
+TRACE_FRAMES = 10
+
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>")
+)
+
+
+def approx_size(obj: Any, depth: int = 3) -> int:
+    """Size of an object and of the containers it holds, down to `depth` levels."""
+    size = sys.getsizeof(obj)
+    if (depth == 0):
+        return size
+
+    if (isinstance(obj, dict)):
+        for key, value in obj.items():
+            size += approx_size(key, depth - 1) + approx_size(value, depth - 1)
+
+    elif (isinstance(obj, (list, tuple, set, frozenset))):
+        for item in obj:
+            size += approx_size(item, depth - 1)
+
+    return size
+
+
+class MemorySnapshots():
+    """`tracemalloc` snapshots of the process, each one diffed against the previous one.
+    Tracing is off until `enable` is called, so it costs nothing by default.
+    """
+    def __init__(self) -> None:
+        self.last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def is_tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def enable(self) -> None:
+        if (not tracemalloc.is_tracing()):
+            tracemalloc.start(TRACE_FRAMES)
+
+        self.last_snapshot = None
+
+    def disable(self) -> None:
+        tracemalloc.stop()
+        self.last_snapshot = None
+
+    def take(self, limit: int = 15) -> List[Tuple[str, int, int, int]]:
+        """Top allocation sites by growth since the previous snapshot,
+        `(site, size, size growth, count growth)`.
+        """
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+        if (self.last_snapshot is None):
+            # First snapshot, report the biggest sites
+            stats = [
+                (str(stat.traceback), stat.size, stat.size, stat.count)
+                for stat in snapshot.statistics('lineno')[:limit]
+            ]
+        else:
+            stats = [
+                (str(stat.traceback), stat.size, stat.size_diff, stat.count_diff)
+                for stat in snapshot.compare_to(self.last_snapshot, 'lineno')[:limit]
+            ]
+
+        self.last_snapshot = snapshot
+
+        return stats
+
+    def report(self, buffers: Dict[str, Tuple[int, int]], limit: int = 15) -> str:
+        lines = []
+
+        if (self.is_tracing):
+            is_first = self.last_snapshot is None
+            current, peak = tracemalloc.get_traced_memory()
+
+            rows = [
+                (site,
+                 covert_size_to_str(size),
+                 f"{'+' if growth >= 0 else '-'}{covert_size_to_str(abs(growth))}",
+                 f"{count:+d}")
+                for site, size, growth, count in self.take(limit)
+            ]
+
+            lines.append(f"Traced {covert_size_to_str(current)}, peak {covert_size_to_str(peak)}"
+                         + (", first snapshot, sizes are not diffed." if is_first else "."))
+            lines.append(tabulate(rows, ("SITE", "SIZE", "GROWTH", "COUNT"), tablefmt='plain', disable_numparse=True))
+
+        else:
+            lines.append("Allocation tracing is off, use `--on` to start it.")
+
+        lines.append("")
+        lines.append(tabulate(
+            [(name, items, covert_size_to_str(size)) for name, (items, size) in buffers.items()],
+            ("BUFFER", "ITEMS", "SIZE"),
+            tablefmt='plain',
+            disable_numparse=True
+        ))
+
+        return "\n".join(lines)
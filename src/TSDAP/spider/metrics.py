@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   metrics.py
+@Time    :   2026/10/19 14:21:36
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Container resource and ingest metrics
+'''
+
+
+import bisect
+import os
+
+from collections import defaultdict
+from enum import IntEnum
+from multiprocessing.sharedctypes import RawArray
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, Hashable, List, MutableSequence, Optional, Sequence, Tuple
+
+from database.common import STATEMENT_KINDS
+
+
+# Number of the latest flush latencies kept for the percentiles
+FLUSH_SAMPLES = 128
+
+FLUSH_SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+FLUSH_DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+EXECUTE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+CRON_LAG_BUCKETS = (0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+HTTP_DURATION_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+EXECUTE_BACKENDS = ("sqlite", "mysql")
+
+
+class MetricSlots(IntEnum):
+    ROWS_WRITTEN = 0
+    QUEUE_DEPTH = 1
+    FLUSH_COUNT = 2
+    LOG_LINES = 3
+    DB_ERRORS = 4
+
+    # Rows checked by the deduplication, possible hits of the filters and dropped duplicates
+    DEDUP_CHECKS = 5
+    DEDUP_HITS = 6
+    DEDUP_DUPLICATES = 7
+
+    # HTTP client of the spider
+    HTTP_REQUESTS = 8
+    HTTP_ERRORS = 9
+    HTTP_RETRIES = 10
+    HTTP_CONNECTIONS_OPENED = 11
+    HTTP_CONNECTIONS_REUSED = 12
+    HTTP_THROTTLED_SECONDS = 13
+    HTTP_IN_FLIGHT = 14
+
+    # Responses served by the HTTP cache, revalidated with a 304 and fetched in full
+    HTTP_CACHE_HITS = 15
+    HTTP_CACHE_REVALIDATIONS = 16
+    HTTP_CACHE_MISSES = 17
+
+    # Start of the flush latencies ring, in milliseconds
+    FLUSH_LATENCIES = 18
+
+
+class HistogramLayout():
+    """Slots of a histogram in a flat block: one per bucket, then `+Inf`, sum and count.
+    Buckets are stored apart, they are accumulated when read.
+    """
+    def __init__(self, offset: int, buckets: Sequence[float]) -> None:
+        self.offset = offset
+        self.buckets = tuple(buckets)
+
+        self.size = len(self.buckets) + 3
+
+    def observe(self, block: MutableSequence[float], value: float) -> None:
+        block[self.offset + bisect.bisect_left(self.buckets, value)] += 1
+        block[self.offset + len(self.buckets) + 1] += value
+        block[self.offset + len(self.buckets) + 2] += 1
+
+    def read(self, values: Sequence[float]) -> Tuple[List[Tuple[float, int]], float, int]:
+        """Cumulative `(upper bound, count)` pairs, sum and count."""
+        cumulative = []
+        count = 0
+        for index, bound in enumerate(self.buckets + (float("inf"),)):
+            count += int(values[self.offset + index])
+            cumulative.append((bound, count))
+
+        return (cumulative, values[self.offset + len(self.buckets) + 1], int(values[self.offset + len(self.buckets) + 2]))
+
+
+def _layout_histograms(offset: int, specs: Sequence[Tuple[Hashable, Sequence[float]]]) -> Tuple[Dict, int]:
+    layouts = {}
+    for key, buckets in specs:
+        layouts[key] = HistogramLayout(offset, buckets)
+        offset += layouts[key].size
+
+    return (layouts, offset)
+
+
+def _execute_specs() -> List[Tuple[Hashable, Sequence[float]]]:
+    return [
+        (("execute", backend, kind), EXECUTE_BUCKETS)
+        for backend in EXECUTE_BACKENDS
+        for kind in STATEMENT_KINDS
+    ]
+
+
+CONTAINER_HISTOGRAMS, CONTAINER_BLOCK_SIZE = _layout_histograms(
+    MetricSlots.FLUSH_LATENCIES + FLUSH_SAMPLES,
+    [("flush_size", FLUSH_SIZE_BUCKETS), ("flush_duration", FLUSH_DURATION_BUCKETS), ("http_duration", HTTP_DURATION_BUCKETS)]
+    + _execute_specs()
+)
+
+PLATFORM_HISTOGRAMS, PLATFORM_BLOCK_SIZE = _layout_histograms(
+    0,
+    [("cron_lag", CRON_LAG_BUCKETS)] + _execute_specs()
+)
+
+
+class MetricsBlock():
+    """Counters and histograms in a flat block of floats, updated under a process local lock."""
+    def __init__(self, block: MutableSequence[float], histograms: Dict[Hashable, HistogramLayout]) -> None:
+        self.block = block
+        self.histograms = histograms
+
+        self._lock = Lock()
+
+    def add(self, slot: int, value: float = 1) -> None:
+        with self._lock:
+            self.block[slot] += value
+
+    def set(self, slot: int, value: float) -> None:
+        self.block[slot] = value
+
+    def observe(self, key: Hashable, value: float) -> None:
+        layout = self.histograms.get(key)
+        if (layout is None):
+            return
+
+        with self._lock:
+            layout.observe(self.block, value)
+
+    def observe_execute(self, backend: str, kind: str, seconds: float) -> None:
+        """Observer of `IDBCommon.execute`, see `database.common.set_execute_observer`."""
+        self.observe(("execute", backend, kind), seconds)
+
+    def read_histograms(self, values: Sequence[float]) -> Dict[Hashable, Tuple[List[Tuple[float, int]], float, int]]:
+        return {key: layout.read(values) for key, layout in self.histograms.items()}
+
+
+class ContainerMetrics(MetricsBlock):
+    """Ingest counters of a container, in a raw shared memory block.
+
+    The container process is the only writer, the manager reads a copy of the block,
+    so no manager proxy round trip and no cross process lock is involved.
+    """
+    def __init__(self) -> None:
+        super().__init__(RawArray('d', CONTAINER_BLOCK_SIZE), CONTAINER_HISTOGRAMS)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'block': self.block}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        MetricsBlock.__init__(self, state['block'], CONTAINER_HISTOGRAMS)
+
+    def observe_flush(self, rows: int, latency: float) -> None:
+        with self._lock:
+            index = int(self.block[MetricSlots.FLUSH_COUNT]) % FLUSH_SAMPLES
+
+            self.block[MetricSlots.FLUSH_LATENCIES + index] = latency * 1000
+            self.block[MetricSlots.FLUSH_COUNT] += 1
+            self.block[MetricSlots.ROWS_WRITTEN] += rows
+
+            self.histograms["flush_size"].observe(self.block, rows)
+            self.histograms["flush_duration"].observe(self.block, latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        values = self.block[:]
+
+        flush_count = int(values[MetricSlots.FLUSH_COUNT])
+        latencies = sorted(
+            values[MetricSlots.FLUSH_LATENCIES:MetricSlots.FLUSH_LATENCIES + min(flush_count, FLUSH_SAMPLES)]
+        )
+
+        return {
+            'rows_written': int(values[MetricSlots.ROWS_WRITTEN]),
+            'queue_depth': int(values[MetricSlots.QUEUE_DEPTH]),
+            'flush_count': flush_count,
+            'log_lines': int(values[MetricSlots.LOG_LINES]),
+            'db_errors': int(values[MetricSlots.DB_ERRORS]),
+            'dedup_checks': int(values[MetricSlots.DEDUP_CHECKS]),
+            'dedup_hits': int(values[MetricSlots.DEDUP_HITS]),
+            'dedup_duplicates': int(values[MetricSlots.DEDUP_DUPLICATES]),
+            'http_requests': int(values[MetricSlots.HTTP_REQUESTS]),
+            'http_errors': int(values[MetricSlots.HTTP_ERRORS]),
+            'http_retries': int(values[MetricSlots.HTTP_RETRIES]),
+            'http_connections_opened': int(values[MetricSlots.HTTP_CONNECTIONS_OPENED]),
+            'http_connections_reused': int(values[MetricSlots.HTTP_CONNECTIONS_REUSED]),
+            'http_throttled_seconds': values[MetricSlots.HTTP_THROTTLED_SECONDS],
+            'http_in_flight': int(values[MetricSlots.HTTP_IN_FLIGHT]),
+            'http_cache_hits': int(values[MetricSlots.HTTP_CACHE_HITS]),
+            'http_cache_revalidations': int(values[MetricSlots.HTTP_CACHE_REVALIDATIONS]),
+            'http_cache_misses': int(values[MetricSlots.HTTP_CACHE_MISSES]),
+            'flush_p50': percentile(latencies, 50),
+            'flush_p99': percentile(latencies, 99),
+            'histograms': self.read_histograms(values)
+        }
+
+
+class PlatformMetrics(MetricsBlock):
+    """Metrics of the manager process itself, kept in plain memory."""
+    def __init__(self) -> None:
+        super().__init__([0.0] * PLATFORM_BLOCK_SIZE, PLATFORM_HISTOGRAMS)
+
+        # (counter name, container name) -> value
+        self.counters: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def count(self, name: str, container_name: str) -> None:
+        with self._lock:
+            self.counters[(name, container_name)] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = list(self.block)
+            counters = dict(self.counters)
+
+        return {
+            'counters': counters,
+            'histograms': self.read_histograms(values)
+        }
+
+
+def percentile(sorted_values, percent: float) -> Optional[float]:
+    if (len(sorted_values) == 0):
+        return None
+
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))
+
+    return sorted_values[index]
+
+
+class ProcSampler():
+    """CPU, memory, threads and file descriptors of processes, read from `/proc`.
+
+    One `stat` read and one `fd` listing per process and sample, the CPU usage is
+    the difference with the previous sample of the same process.
+    """
+    def __init__(self) -> None:
+        self.is_supported = os.path.isdir("/proc/self")
+
+        self.clock_ticks = os.sysconf("SC_CLK_TCK") if self.is_supported else 100
+        self.page_size = os.sysconf("SC_PAGE_SIZE") if self.is_supported else 4096
+
+        # pid -> (cpu ticks, monotonic time)
+        self.__last_samples: Dict[int, Tuple[int, float]] = {}
+
+    def sample(self, pid: int) -> Optional[Dict[str, Any]]:
+        if (not self.is_supported):
+            return None
+
+        try:
+            with open(f"/proc/{pid}/stat", 'r') as fp:
+                stat = fp.read()
+
+            fds = len(os.listdir(f"/proc/{pid}/fd"))
+
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            self.__last_samples.pop(pid, None)
+            return None
+
+        # The command name may contain spaces, fields are counted after it
+        fields = stat[stat.rindex(')') + 2:].split()
+        cpu_ticks = int(fields[11]) + int(fields[12])
+        now = monotonic()
+
+        cpu_percent = None
+        last_sample = self.__last_samples.get(pid)
+        if (last_sample is not None and now > last_sample[1]):
+            cpu_percent = (cpu_ticks - last_sample[0]) / self.clock_ticks / (now - last_sample[1]) * 100
+
+        self.__last_samples[pid] = (cpu_ticks, now)
+
+        return {
+            'cpu_percent': cpu_percent,
+            'rss': int(fields[21]) * self.page_size,
+            'threads': int(fields[17]),
+            'fds': fds
+        }
+
+    def forget(self, alive_pids) -> None:
+        """Drop the samples of the processes which are gone."""
+        for pid in list(self.__last_samples.keys()):
+            if (pid not in alive_pids):
+                self.__last_samples.pop(pid)
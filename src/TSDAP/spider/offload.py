@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   offload.py
+@Time    :   2026/10/19 23:12:48
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Worker processes of a spider, for the CPU bound work its threads serialize on
+'''
+
+
+import os
+import signal
+
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .control import CONTROL_SIGNAL
+
+
+# Windows frees a block with its last handle, a result would be gone before it is read
+IS_SHARED_MEMORY_USABLE = os.name == "posix"
+
+
+class _SharedPayload():
+    """Bytes or a string left in a shared memory block, in place of the value."""
+    __slots__ = ("name", "size", "is_text")
+
+    def __init__(self, name: str, size: int, is_text: bool) -> None:
+        self.name = name
+        self.size = size
+        self.is_text = is_text
+
+
+def _share(value: Any, threshold: int, blocks: List[SharedMemory]) -> Any:
+    if (threshold <= 0):
+        return value
+
+    is_text = isinstance(value, str)
+    if (is_text):
+        # Checked on the characters first, encoding every short string would cost more than it saves
+        if (len(value) * 4 < threshold):
+            return value
+        data = value.encode("utf-8")
+
+    elif (isinstance(value, (bytes, bytearray))):
+        data = value
+
+    else:
+        return value
+
+    if (len(data) < threshold):
+        return value
+
+    block = SharedMemory(create=True, size=len(data))
+    block.buf[:len(data)] = data
+    blocks.append(block)
+
+    return _SharedPayload(block.name, len(data), is_text)
+
+
+def _unshare(value: Any) -> Any:
+    if (not isinstance(value, _SharedPayload)):
+        return value
+
+    block = SharedMemory(name=value.name)
+    try:
+        data = bytes(block.buf[:value.size])
+
+    finally:
+        block.close()
+
+    return data.decode("utf-8") if value.is_text else data
+
+
+def _release(blocks: List[SharedMemory]) -> None:
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+def _take(value: Any) -> Any:
+    """Read a result of a worker, and free its block."""
+    if (not isinstance(value, _SharedPayload)):
+        return value
+
+    try:
+        return _unshare(value)
+
+    finally:
+        block = SharedMemory(name=value.name)
+        block.close()
+        block.unlink()
+
+
+def _init_worker() -> None:
+    # Workers inherit the handlers of the container, the pool terminates them with SIGTERM
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+    if (CONTROL_SIGNAL is not None):
+        signal.signal(CONTROL_SIGNAL, signal.SIG_IGN)
+
+
+def _run_offloaded(func: Callable, args: Tuple, kwargs: Dict[str, Any], threshold: int) -> Any:
+    result = func(*[_unshare(arg) for arg in args], **{key: _unshare(value) for key, value in kwargs.items()})
+
+    blocks: List[SharedMemory] = []
+    result = _share(result, threshold, blocks)
+
+    # The container unlinks the block once it has read it
+    for block in blocks:
+        block.close()
+
+    return result
+
+
+class SpiderProcessPool():
+    """At most `max_workers` processes running the CPU bound tasks of a spider,
+    the threads of a spider share one GIL.
+
+    Bytes and strings of at least `shm_threshold` bytes, as arguments or as the result,
+    go through shared memory instead of the pipes of the pool.
+    `on_done` is called from the result thread of the pool whenever a task ends.
+    """
+    def __init__(self,
+                 max_workers: int,
+                 shm_threshold: int,
+                 on_done: Optional[Callable[[], None]] = None) -> None:
+
+        self.max_workers = max_workers
+        self.shm_threshold = shm_threshold if IS_SHARED_MEMORY_USABLE else 0
+        self.on_done = on_done
+
+        if (IS_SHARED_MEMORY_USABLE):
+            # Workers share the tracker of the container, blocks they create are unlinked here
+            from multiprocessing import resource_tracker
+            resource_tracker.ensure_running()
+
+        self.__pool = Pool(max_workers, initializer=_init_worker)
+        self.__pending: Dict[Future, List[SharedMemory]] = {}
+        self.__is_shutdown = False
+        self.__lock = Lock()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        future: Future = Future()
+
+        blocks: List[SharedMemory] = []
+        args = tuple(_share(arg, self.shm_threshold, blocks) for arg in args)
+        kwargs = {key: _share(value, self.shm_threshold, blocks) for key, value in kwargs.items()}
+
+        with self.__lock:
+            if (self.__is_shutdown):
+                # The spider is stopping, the task will never run
+                _release(blocks)
+                future.cancel()
+                return future
+
+            self.__pending[future] = blocks
+            self.__pool.apply_async(
+                _run_offloaded,
+                (func, args, kwargs, self.shm_threshold),
+                callback=lambda result: self.__done(future, result, None),
+                error_callback=lambda e: self.__done(future, None, e)
+            )
+
+        return future
+
+    def map(self, func: Callable, *iterables: Iterable[Any]) -> Iterator[Any]:
+        """Results of `func` over the iterables, in order.
+        Tasks are submitted as the results are consumed, at most two per worker ahead.
+        """
+        window = self.max_workers * 2
+        pending: Deque[Future] = deque()
+
+        def results() -> Iterator[Any]:
+            try:
+                for args in zip(*iterables):
+                    pending.append(self.submit(func, *args))
+                    if (len(pending) >= window):
+                        yield pending.popleft().result()
+
+                while pending:
+                    yield pending.popleft().result()
+
+            finally:
+                for future in pending:
+                    future.cancel()
+
+        return results()
+
+    def __done(self, future: Future, result: Any, exception: Optional[BaseException]) -> None:
+        with self.__lock:
+            blocks = self.__pending.pop(future, None)
+
+        if (blocks is None):
+            # Released by the shutdown, the block of a result is unlinked all the same
+            if (exception is None):
+                _take(result)
+            return
+
+        _release(blocks)
+
+        if (exception is None):
+            try:
+                result = _take(result)
+
+            except Exception as e:
+                exception = e
+
+        try:
+            if (exception is None):
+                future.set_result(result)
+            else:
+                future.set_exception(exception)
+
+        except InvalidStateError:
+            # Cancelled by the spider meanwhile
+            pass
+
+        if (self.on_done is not None):
+            self.on_done()
+
+    def busy(self) -> bool:
+        with self.__lock:
+            return len(self.__pending) != 0
+
+    def stats(self) -> Tuple[int, int]:
+        """Workers and unfinished tasks."""
+        with self.__lock:
+            return (self.max_workers, len(self.__pending))
+
+    def shutdown(self) -> None:
+        """Refuse new tasks, terminate the workers and cancel the unfinished tasks."""
+        with self.__lock:
+            if (self.__is_shutdown):
+                return
+
+            self.__is_shutdown = True
+            pending = self.__pending
+            self.__pending = {}
+
+        self.__pool.terminate()
+
+        for future, blocks in pending.items():
+            _release(blocks)
+            future.cancel()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   pool.py
+@Time    :   2026/10/19 21:36:27
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Worker thread pool of a spider, with a bounded task queue
+'''
+
+
+import warnings
+
+from collections import deque
+from concurrent.futures import CancelledError, Future, wait
+from threading import Condition, Lock, Thread, current_thread
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from .spider import SpiderWarnings
+
+
+class SpiderThreadPool():
+    """At most `max_workers` reused threads running the tasks of a spider.
+
+    Submitting blocks while `max_queue` tasks are waiting, instead of failing.
+    A task failing with an exception reports it to `on_exception`, its future holds it too.
+    """
+    def __init__(self,
+                 max_workers: int,
+                 max_queue: int,
+                 name_prefix: str,
+                 on_exception: Optional[Callable[[BaseException], None]] = None) -> None:
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.name_prefix = name_prefix
+        self.on_exception = on_exception
+
+        self.__tasks: Deque[Tuple[Future, Callable, Tuple, Dict[str, Any], Optional[str]]] = deque()
+        self.__workers: List[Thread] = []
+        self.__idle = 0
+        self.__running = 0
+        self.__is_shutdown = False
+
+        self.__lock = Lock()
+        self.__not_empty = Condition(self.__lock)
+        self.__not_full = Condition(self.__lock)
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        return self._submit(None, func, args, kwargs)
+
+    def _submit(self, name: Optional[str], func: Callable, args: Iterable[Any], kwargs: Optional[Mapping[str, Any]]) -> Future:
+        future: Future = Future()
+
+        with self.__lock:
+            while (not self.__is_shutdown and len(self.__tasks) >= self.max_queue):
+                self.__not_full.wait()
+
+            if (self.__is_shutdown):
+                # The spider is stopping, the task will never run
+                future.cancel()
+                return future
+
+            self.__tasks.append((future, func, tuple(args), dict(kwargs or {}), name))
+
+            if (self.__idle < len(self.__tasks) and len(self.__workers) < self.max_workers):
+                worker = Thread(target=self.__work, name=f"{self.name_prefix}_{len(self.__workers)}", daemon=True)
+                self.__workers.append(worker)
+                worker.start()
+
+            self.__not_empty.notify()
+
+        return future
+
+    def map(self, func: Callable, *iterables: Iterable[Any]) -> Iterator[Any]:
+        """Results of `func` over the iterables, in order.
+        Tasks are submitted as the results are consumed, at most a full pool and queue ahead.
+        """
+        window = self.max_workers + self.max_queue
+        pending: Deque[Future] = deque()
+
+        def results() -> Iterator[Any]:
+            try:
+                for args in zip(*iterables):
+                    pending.append(self.submit(func, *args))
+                    if (len(pending) >= window):
+                        yield pending.popleft().result()
+
+                while pending:
+                    yield pending.popleft().result()
+
+            finally:
+                for future in pending:
+                    future.cancel()
+
+        return results()
+
+    def __work(self) -> None:
+        worker = current_thread()
+        worker_name = worker.name
+
+        while True:
+            with self.__lock:
+                self.__idle += 1
+                while (not self.__tasks and not self.__is_shutdown):
+                    self.__not_empty.wait()
+                self.__idle -= 1
+
+                if (not self.__tasks):
+                    self.__workers.remove(worker)
+                    return
+
+                future, func, args, kwargs, name = self.__tasks.popleft()
+                self.__running += 1
+                self.__not_full.notify()
+
+                # Under the lock, `_is_name_used` finds the task either queued or running
+                if (name is not None):
+                    worker.name = name
+
+            if (future.set_running_or_notify_cancel()):
+                try:
+                    future.set_result(func(*args, **kwargs))
+
+                except SystemExit:
+                    # A stop checkpoint in the task, the spider is stopping
+                    future.set_exception(CancelledError())
+
+                except BaseException as e:
+                    future.set_exception(e)
+                    if (self.on_exception is not None):
+                        self.on_exception(e)
+
+            with self.__lock:
+                worker.name = worker_name
+                self.__running -= 1
+
+    def _is_saturated(self) -> bool:
+        """Whether a new task would wait for a worker."""
+        with self.__lock:
+            return len(self.__workers) >= self.max_workers and self.__idle <= len(self.__tasks)
+
+    def _is_name_used(self, name: str) -> bool:
+        """Whether a queued or running task has this name."""
+        with self.__lock:
+            return (any(task[4] == name for task in self.__tasks)
+                    or any(worker.name == name for worker in self.__workers))
+
+    def busy(self) -> bool:
+        with self.__lock:
+            return self.__running != 0 or len(self.__tasks) != 0
+
+    def stats(self) -> Tuple[int, int, int]:
+        """Workers, running tasks and queued tasks."""
+        with self.__lock:
+            return (len(self.__workers), self.__running, len(self.__tasks))
+
+    def shutdown(self, cancel_futures: bool = True) -> None:
+        """Refuse new tasks, cancel the queued ones, the running ones finish."""
+        with self.__lock:
+            self.__is_shutdown = True
+
+            if (cancel_futures):
+                while self.__tasks:
+                    self.__tasks.popleft()[0].cancel()
+
+            self.__not_empty.notify_all()
+            self.__not_full.notify_all()
+
+
+class PooledThread():
+    """Handle of `alloc_thread`, with the interface of a `Thread` used by the spiders.
+    `start` runs the target on a worker of the pool instead of a new thread.
+    """
+    def __init__(self,
+                 pool: SpiderThreadPool,
+                 target: Callable,
+                 name: Optional[str] = None,
+                 args: Iterable[Any] = (),
+                 kwargs: Optional[Mapping[str, Any]] = None) -> None:
+
+        self.pool = pool
+        self.target = target
+        self.name = name
+        self.args = tuple(args)
+        self.kwargs = kwargs
+        self.daemon = True
+
+        self.future: Optional[Future] = None
+
+    def start(self) -> None:
+        if (self.future is not None):
+            raise RuntimeError("threads can only be started once")
+
+        if (self.name is not None and self.pool._is_name_used(self.name)):
+            warnings.warn(SpiderWarnings.ThreadRepeatWarning(f"A thread named '{self.name}' is already running."),
+                          stacklevel=2)
+
+        if (self.pool._is_saturated()):
+            warnings.warn(SpiderWarnings.ThreadLimitWarning(
+                f"All {self.pool.max_workers} threads of the spider are busy, the thread waits for a free one."
+            ), stacklevel=2)
+
+        self.future = self.pool._submit(self.name, self.target, self.args, self.kwargs)
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if (self.future is None):
+            raise RuntimeError("cannot join thread before it is started")
+
+        wait([self.future], timeout)
+
+    def is_alive(self) -> bool:
+        return self.future is not None and not self.future.done()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   profiler.py
+@Time    :   2026/10/19 15:32:44
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Sampling profiler of a container process
+'''
+
+
+import os
+import sys
+import threading
+
+from collections import Counter
+from datetime import datetime
+from time import monotonic, sleep
+from types import FrameType
+from typing import List, Optional, Tuple
+
+from tabulate import tabulate
+
+
+# Deepest stack kept per sample
+MAX_STACK_DEPTH = 128
+
+
+def __describe_frame(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _collect_stack(frame: Optional[FrameType]) -> Tuple[str, ...]:
+    """Frames of a stack from the outermost to the innermost."""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(__describe_frame(frame))
+        frame = frame.f_back
+
+    return tuple(reversed(stack))
+
+
+class SamplingProfiler():
+    """Samples the stacks of every other thread with `sys._current_frames`.
+
+    Nothing is hooked into the interpreter, so the profiled threads only pay for the GIL
+    switches of the sampling thread, and nothing at all when no profile is running.
+    """
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+
+        # "thread;outer;...;inner" -> samples
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+
+    def run(self, seconds: float) -> None:
+        own_ident = threading.get_ident()
+        start_time = monotonic()
+        deadline = start_time + seconds
+
+        while monotonic() < deadline:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            for thread_ident, frame in sys._current_frames().items():
+                if (thread_ident == own_ident):
+                    continue
+
+                stack = _collect_stack(frame)
+                thread_name = thread_names.get(thread_ident, str(thread_ident))
+                self.stacks[";".join((thread_name,) + stack)] += 1
+
+            self.samples += 1
+            sleep(self.interval)
+
+        self.duration = monotonic() - start_time
+
+    def write_collapsed(self, output_dir: str) -> str:
+        """Write the stacks in the collapsed format of `flamegraph.pl`, returns the file path."""
+        os.makedirs(output_dir, exist_ok=True)
+
+        file_path = os.path.join(output_dir, f"profile-{datetime.now().strftime('%Y%m%d-%H%M%S')}.collapsed")
+        with open(file_path, 'w', encoding='utf-8') as fp:
+            for stack, count in self.stacks.most_common():
+                fp.write(f"{stack} {count}\n")
+
+        return file_path
+
+    def top_frames(self, limit: int = 20) -> List[Tuple[str, int, int]]:
+        """`(frame, self samples, total samples)` of the busiest frames."""
+        self_counts: Counter = Counter()
+        total_counts: Counter = Counter()
+
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if (len(frames) == 0):
+                continue
+
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+
+        return [
+            (frame, count, total_counts[frame])
+            for frame, count in self_counts.most_common(limit)
+        ]
+
+    def report(self, limit: int = 20) -> str:
+        total = sum(self.stacks.values()) or 1
+
+        rows = [
+            (f"{self_count / total * 100:.1f}%", f"{total_count / total * 100:.1f}%", frame)
+            for frame, self_count, total_count in self.top_frames(limit)
+        ]
+
+        header = f"{self.samples} samples in {self.duration:.1f}s"
+        return f"{header}\n" + tabulate(rows, ("SELF", "TOTAL", "FRAME"), tablefmt='plain', disable_numparse=True)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   registry.py
+@Time    :   2026/10/19 13:05:52
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   In-memory write-through registry of containers
+'''
+
+
+import bisect
+
+from threading import RLock
+from typing import Any, Dict, List, Optional
+
+from database import IDBCommon
+
+
+# Columns of each containers table, `ID` is the key of all of them
+CONTAINER_TABLES = {
+    'infos': ('ID', 'Package', 'Created', 'Name'),
+    'runtimes': ('ID', 'Status', 'RetCode', 'Entry', 'Daemon', 'Envs'),
+    'schedules': ('ID', 'Cron', 'NextRun', 'Overlap', 'Jitter')
+}
+
+CONTAINER_JOIN_CONDITION = "JOIN runtimes ON infos.ID = runtimes.ID JOIN schedules ON infos.ID = schedules.ID"
+
+
+class ContainerRegistry():
+    """Every container record is loaded once with a single joined query and served from memory.
+    Writes go to the database first, then to memory, so both views always agree.
+    """
+    def __init__(self, db: IDBCommon) -> None:
+        # A handle with the containers database selected
+        self.db = db
+
+        self.__records: Dict[str, Dict[str, Any]] = {}
+        self.__sorted_ids: List[str] = []
+        self.__name_to_id: Dict[str, str] = {}
+
+        self.__lock = RLock()
+
+    def load(self) -> None:
+        with self.__lock:
+            column_names, results = self.db.select("infos", CONTAINER_JOIN_CONDITION)
+
+            self.__records.clear()
+            self.__sorted_ids.clear()
+            self.__name_to_id.clear()
+
+            for row in results:
+                self.__cache(dict(zip(column_names, row)))
+
+    def __cache(self, record: Dict[str, Any]) -> None:
+        container_id = record['ID']
+        if (container_id not in self.__records):
+            bisect.insort(self.__sorted_ids, container_id)
+
+        self.__records[container_id] = record
+        self.__name_to_id[record['Name']] = container_id
+
+    def __query(self, name_or_id: str) -> List[str]:
+        """One indexed joined query, for the records written behind the registry."""
+        name_or_id = name_or_id.replace("'", "''")
+
+        column_names, results = self.db.select(
+            "infos",
+            f"{CONTAINER_JOIN_CONDITION} WHERE infos.ID LIKE '{name_or_id}%' OR infos.Name='{name_or_id}'"
+        )
+
+        matched = []
+        for row in results:
+            record = dict(zip(column_names, row))
+            self.__cache(record)
+            matched.append(record['ID'])
+
+        return matched
+
+    def match(self, name_or_id: str) -> List[str]:
+        """IDs of the containers matching an exact name or an ID prefix."""
+        with self.__lock:
+            container_id = self.__name_to_id.get(name_or_id)
+            if (container_id is not None):
+                return [container_id]
+
+            matched = []
+            index = bisect.bisect_left(self.__sorted_ids, name_or_id)
+            while index < len(self.__sorted_ids) and self.__sorted_ids[index].startswith(name_or_id):
+                matched.append(self.__sorted_ids[index])
+                index += 1
+
+            if (len(matched) == 0):
+                matched = self.__query(name_or_id)
+
+            return matched
+
+    def get(self, container_id: str) -> Optional[Dict[str, Any]]:
+        with self.__lock:
+            record = self.__records.get(container_id)
+            return dict(record) if record is not None else None
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self.__lock:
+            return [dict(record) for record in self.__records.values()]
+
+    def is_name_exists(self, name: str) -> bool:
+        with self.__lock:
+            return name in self.__name_to_id
+
+    def add(self, record: Dict[str, Any]) -> None:
+        with self.__lock:
+            with self.db.transaction() as transaction:
+                for table_name, columns in CONTAINER_TABLES.items():
+                    transaction.insert(table_name, {column: record[column] for column in columns})
+
+            self.__cache(dict(record))
+
+    def update(self, container_id: str, **fields: Any) -> None:
+        with self.__lock:
+            if (container_id not in self.__records):
+                return
+
+            for table_name, columns in CONTAINER_TABLES.items():
+                data = {column: fields[column] for column in columns if column in fields}
+                if (len(data) != 0):
+                    self.db.update(table_name, data, f"WHERE ID='{container_id}'")
+
+            self.__records[container_id].update(fields)
+
+    def remove(self, container_id: str) -> None:
+        with self.__lock:
+            record = self.__records.pop(container_id, None)
+            if (record is None):
+                return
+
+            with self.db.transaction() as transaction:
+                for table_name in CONTAINER_TABLES.keys():
+                    transaction.delete(table_name, f"WHERE ID='{container_id}'")
+
+            self.__name_to_id.pop(record['Name'], None)
+
+            index = bisect.bisect_left(self.__sorted_ids, container_id)
+            if (index < len(self.__sorted_ids) and self.__sorted_ids[index] == container_id):
+                self.__sorted_ids.pop(index)
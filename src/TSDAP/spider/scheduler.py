@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   scheduler.py
+@Time    :   2026/10/19 11:40:18
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Central cron scheduler of spider containers
+'''
+
+
+import heapq
+import itertools
+import logging
+import random
+
+from collections import deque
+from datetime import datetime, timedelta
+from threading import Condition, Lock, Thread
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from utils.crontab import compile_cron
+
+from .common import OverlapPolicy
+
+
+class ScheduleEntry():
+    def __init__(self,
+                 container_id: str,
+                 cron: str,
+                 overlap: OverlapPolicy,
+                 jitter: int) -> None:
+
+        self.container_id = container_id
+        self.cron = cron
+        self.overlap = overlap
+        self.jitter = jitter
+
+        self.next_run: Optional[datetime] = None
+
+
+class SpiderScheduler():
+    """One thread for all cron containers.
+
+    Next fire times are kept in a min-heap, a fired container goes to the run queue,
+    which is drained as long as the number of running scheduled containers is under the cap.
+    """
+    def __init__(self,
+                 launch_func: Callable[[str], bool],
+                 is_running_func: Callable[[str], bool],
+                 persist_func: Callable[[str, Optional[datetime]], None],
+                 max_running: int = 0,
+                 lag_func: Optional[Callable[[str, float], None]] = None) -> None:
+
+        self.launch_func = launch_func
+        self.is_running_func = is_running_func
+        self.persist_func = persist_func
+
+        # Receives the seconds between the scheduled and the actual start of each run
+        self.lag_func = lag_func
+
+        # 0 means unlimited
+        self.max_running = max_running
+
+        self.__heap: List[Tuple[datetime, int, str]] = []
+        self.__sequence = itertools.count()
+        self.__entries: Dict[str, ScheduleEntry] = {}
+
+        self.__run_queue: Deque[Tuple[str, datetime]] = deque()
+        self.__queued: Set[str] = set()
+        self.__overlapped: Dict[str, datetime] = {}
+        self.__running: Set[str] = set()
+
+        self.__condition = Condition()
+        self.__is_stopped = False
+
+        # Fire times to write, the writes are done outside of the condition. The persist lock
+        # keeps them in order when several threads flush at once.
+        self.__unpersisted: Dict[str, Optional[datetime]] = {}
+        self.__persist_lock = Lock()
+
+        self.scheduler_thread = Thread(target=self.__loop,
+                                       name="spider_scheduler",
+                                       daemon=True)
+        self.scheduler_thread.start()
+
+    def __next_fire(self, entry: ScheduleEntry, after: datetime) -> Optional[datetime]:
+        next_run = compile_cron(entry.cron).next_fire(after)
+        if (next_run is not None and entry.jitter > 0):
+            # Spread containers sharing the same expression
+            next_run += timedelta(seconds=random.randint(0, entry.jitter))
+
+        return next_run
+
+    def __push(self, entry: ScheduleEntry, next_run: Optional[datetime]) -> None:
+        entry.next_run = next_run
+        self.__defer_persist(entry.container_id, next_run)
+
+        if (next_run is not None):
+            heapq.heappush(self.__heap, (next_run, next(self.__sequence), entry.container_id))
+
+        self.__condition.notify()
+
+    def __defer_persist(self, container_id: str, next_run: Optional[datetime]) -> None:
+        # Only the latest fire time of a container is written
+        self.__unpersisted.pop(container_id, None)
+        self.__unpersisted[container_id] = next_run
+
+    def __flush_persists(self) -> None:
+        with self.__persist_lock:
+            with self.__condition:
+                unpersisted = self.__unpersisted
+                self.__unpersisted = {}
+
+            for container_id, next_run in unpersisted.items():
+                try:
+                    self.persist_func(container_id, next_run)
+
+                except Exception:
+                    logging.error(f"Unable to persist the next run of '{container_id}'.", exc_info=True)
+
+    def add(self,
+            container_id: str,
+            cron: str,
+            overlap: OverlapPolicy = OverlapPolicy.SKIP,
+            jitter: int = 0,
+            next_run: Optional[datetime] = None) -> None:
+        """Schedule a container. `next_run` restores a persisted fire time,
+        a fire time in the past is caught up immediately.
+        """
+        entry = ScheduleEntry(container_id, cron, OverlapPolicy(overlap), jitter)
+
+        with self.__condition:
+            self.__entries[container_id] = entry
+
+            if (next_run is None):
+                next_run = self.__next_fire(entry, datetime.now())
+
+            elif (next_run < datetime.now()):
+                logging.info(f"Catch up the missed run of '{container_id}' scheduled at {next_run}.")
+
+            self.__push(entry, next_run)
+
+        self.__flush_persists()
+
+    def remove(self, container_id: str) -> None:
+        with self.__condition:
+            if (self.__entries.pop(container_id, None) is None):
+                return
+
+            self.__overlapped.pop(container_id, None)
+            if (container_id in self.__queued):
+                self.__queued.discard(container_id)
+                self.__run_queue = deque(item for item in self.__run_queue if item[0] != container_id)
+
+            # Heap items are dropped lazily when they are popped
+            self.__defer_persist(container_id, None)
+
+        self.__flush_persists()
+
+    def is_scheduled(self, container_id: str) -> bool:
+        with self.__condition:
+            return container_id in self.__entries
+
+    def notify_exit(self, container_id: str) -> None:
+        """Called when a container process exits, frees its running slot."""
+        with self.__condition:
+            self.__running.discard(container_id)
+
+            scheduled_at = self.__overlapped.pop(container_id, None)
+            if (scheduled_at is not None and container_id in self.__entries):
+                self.__enqueue(container_id, scheduled_at)
+
+            self.__condition.notify()
+
+    def stop(self) -> None:
+        """Stop dispatching, persisted fire times are kept for the next start."""
+        with self.__condition:
+            self.__is_stopped = True
+            self.__condition.notify()
+
+    def __enqueue(self, container_id: str, scheduled_at: datetime) -> None:
+        if (container_id in self.__queued):
+            return
+
+        self.__queued.add(container_id)
+        self.__run_queue.append((container_id, scheduled_at))
+
+    def __fire(self, entry: ScheduleEntry, scheduled_at: datetime, now: datetime) -> None:
+        # Arm the next run before dispatching this one, missed runs are coalesced
+        self.__push(entry, self.__next_fire(entry, max(now, scheduled_at)))
+
+        if (self.is_running_func(entry.container_id) or entry.container_id in self.__running):
+            if (entry.overlap == OverlapPolicy.QUEUE):
+                self.__overlapped.setdefault(entry.container_id, scheduled_at)
+            else:
+                logging.info(f"Skip the run of '{entry.container_id}' scheduled at {scheduled_at}, it is still running.")
+            return
+
+        self.__enqueue(entry.container_id, scheduled_at)
+
+    def __pop_launchable(self) -> List[Tuple[str, datetime]]:
+        launchable = []
+
+        while self.__run_queue:
+            if (self.max_running > 0 and len(self.__running) >= self.max_running):
+                break
+
+            container_id, scheduled_at = self.__run_queue.popleft()
+            self.__queued.discard(container_id)
+
+            if (container_id not in self.__entries):
+                continue
+
+            self.__running.add(container_id)
+            launchable.append((container_id, scheduled_at))
+
+        return launchable
+
+    def __launch_failed(self, container_id: str) -> None:
+        with self.__condition:
+            self.__running.discard(container_id)
+
+            # Keep the container armed, from now on
+            entry = self.__entries.get(container_id)
+            if (entry is not None):
+                self.__push(entry, self.__next_fire(entry, datetime.now()))
+
+        self.__flush_persists()
+
+    def __loop(self) -> None:
+        while True:
+            with self.__condition:
+                if (self.__is_stopped):
+                    return
+
+                now = datetime.now()
+                while self.__heap and self.__heap[0][0] <= now:
+                    scheduled_at, _, container_id = heapq.heappop(self.__heap)
+
+                    entry = self.__entries.get(container_id)
+                    if (entry is None or entry.next_run != scheduled_at):
+                        # Removed or rescheduled
+                        continue
+
+                    self.__fire(entry, scheduled_at, now)
+
+                launchable = self.__pop_launchable()
+
+                if (len(launchable) == 0 and len(self.__unpersisted) == 0):
+                    timeout = (self.__heap[0][0] - now).total_seconds() if self.__heap else None
+                    self.__condition.wait(timeout)
+                    continue
+
+            self.__flush_persists()
+
+            # Launch outside of the lock, starting a process takes a while
+            for container_id, scheduled_at in launchable:
+                try:
+                    is_launched = self.launch_func(container_id)
+
+                except Exception:
+                    logging.error(f"Unable to launch scheduled container '{container_id}'.", exc_info=True)
+                    is_launched = False
+
+                if (not is_launched):
+                    self.__launch_failed(container_id)
+
+                elif (self.lag_func is not None):
+                    self.lag_func(container_id, (datetime.now() - scheduled_at).total_seconds())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   shutdown.py
+@Time    :   2026/10/19 23:48:20
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Parallel stop of the containers, escalated past a deadline
+'''
+
+
+from enum import Enum
+from multiprocessing import Process
+from multiprocessing.connection import wait
+from time import monotonic
+from typing import Any, Dict, List, Optional, Tuple
+
+from .common import SpiderShares
+from .control import ControlSlots
+
+
+class ShutdownOutcome(Enum):
+    STOPPED = "stopped"
+    TERMINATED = "terminated"
+    KILLED = "killed"
+
+
+class ShutdownResult():
+    def __init__(self, container_id: str, name: str) -> None:
+        self.container_id = container_id
+        self.name = name
+
+        self.outcome = ShutdownOutcome.STOPPED
+        self.is_flushed = False
+        self.exitcode = None
+        self.seconds = 0.0
+
+
+class ShutdownCoordinator():
+    """Stops every container at once and waits for them against one deadline.
+
+    Containers still running after `timeout` seconds are terminated, they flush their rows
+    on the way out. Those still running `terminate_timeout` seconds later are killed.
+    """
+    def __init__(self, timeout: float, terminate_timeout: float) -> None:
+        self.timeout = timeout
+        self.terminate_timeout = terminate_timeout
+
+    def shutdown(self, context_combines: List[Tuple[str, Dict[str, Any]]]) -> List[ShutdownResult]:
+        start_time = monotonic()
+
+        results: Dict[str, ShutdownResult] = {}
+        running: Dict[int, Tuple[str, Dict[str, Any]]] = {}
+
+        for container_id, context_combine in context_combines:
+            spider_shares: SpiderShares
+            spider_shares = context_combine['shares']
+            process: Process = context_combine['process']
+
+            spider_shares.control.set(ControlSlots.STOP)
+            spider_shares.control.notify(process.pid)
+
+            results[container_id] = ShutdownResult(container_id, context_combine['name'])
+            running[process.sentinel] = (container_id, context_combine)
+
+        self.__wait(running, results, start_time, start_time + self.timeout)
+
+        if (running):
+            for _, context_combine in running.values():
+                context_combine['process'].terminate()
+
+            self.__wait(running, results, start_time, monotonic() + self.terminate_timeout, ShutdownOutcome.TERMINATED)
+
+        if (running):
+            for _, context_combine in running.values():
+                context_combine['process'].kill()
+
+            # A killed process always ends
+            self.__wait(running, results, start_time, None, ShutdownOutcome.KILLED)
+
+        return list(results.values())
+
+    def __wait(self,
+               running: Dict[int, Tuple[str, Dict[str, Any]]],
+               results: Dict[str, ShutdownResult],
+               start_time: float,
+               deadline: Optional[float],
+               outcome: ShutdownOutcome = ShutdownOutcome.STOPPED) -> None:
+
+        while running:
+            timeout = None if deadline is None else deadline - monotonic()
+            if (timeout is not None and timeout <= 0):
+                return
+
+            for sentinel in wait(list(running), timeout):
+                container_id, context_combine = running.pop(sentinel)
+                process: Process = context_combine['process']
+                process.join()
+
+                result = results[container_id]
+                result.outcome = outcome
+                result.is_flushed = context_combine['shares'].control.get(ControlSlots.FLUSHED)
+                result.exitcode = process.exitcode
+                result.seconds = monotonic() - start_time
@@ -8,17 +8,21 @@
 @Desc    :   Spider Common Interface
 '''
 
+import asyncio
 import logging
 import sys
 
 from abc import ABC, abstractmethod
-from functools import wraps
-from threading import Thread
-from typing import Any, Callable, Dict, Iterable, Mapping, Optional, TYPE_CHECKING
+from concurrent.futures import CancelledError, Future
+from functools import partial, wraps
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, \
+    TYPE_CHECKING
 
 
 if TYPE_CHECKING:
     from . import SpiderContext
+    from .http import HttpClient
+    from .pool import PooledThread
 
 
 def spider_stop_checkpoint(func):
@@ -27,7 +31,7 @@ def spider_stop_checkpoint(func):
         ret = func(self, *args, **kwargs)
 
         # Check if spider needs to exit
-        if (self.context.spider_shares.is_stop_event.is_set()):
+        if (self.context.control.stop):
             self.unload()
             sys.exit()
 
@@ -39,6 +43,36 @@ def spider_stop_checkpoint(func):
     return wrapper
 
 
+def _unpack_columns(columns: Dict[str, Sequence[Any]]) -> Tuple[Tuple[str, ...], List[List[Any]]]:
+    column_names = tuple(columns.keys())
+    values = []
+
+    for column_name in column_names:
+        column = columns[column_name]
+
+        # numpy arrays and scalars are converted to python types, the type checks expect them
+        if (hasattr(column, "tolist")):
+            column = column.tolist()
+
+        values.append(list(column))
+
+    lengths = {len(column) for column in values}
+    if (len(lengths) > 1):
+        raise ValueError(f"Every column of a batch needs the same length, got {dict(zip(column_names, map(len, values)))}")
+
+    return (column_names, values)
+
+
+def _rows_to_columns(rows: Sequence[Dict[str, Any]]) -> Tuple[Tuple[str, ...], List[List[Any]]]:
+    column_names = tuple(rows[0].keys())
+    for row in rows:
+        if (len(row) != len(column_names) or any(column not in row for column in column_names)):
+            raise ValueError(f"Every row of a batch needs the same columns, "
+                             f"expected {column_names}, got {tuple(row.keys())}")
+
+    return (column_names, [[row[column] for row in rows] for column in column_names])
+
+
 class ISpider(ABC):
     def __init__(self) -> None:
         super(ISpider, self).__init__()
@@ -46,29 +80,44 @@ class ISpider(ABC):
         self.context: Optional['SpiderContext'] = None
         self.logger: Optional[logging.Logger] = None
 
+    @property
+    def http(self) -> 'HttpClient':
+        return self.context._get_http_client()
+
     @spider_stop_checkpoint
     def alloc_thread(self,
                      target_func: Callable,
                      thread_name: Optional[str] = None,
                      args: Iterable[Any] = (),
                      kwargs: Optional[Mapping[str, Any]] = None
-                     ) -> Optional[Thread]:
+                     ) -> 'PooledThread':
 
-        return self.context._add_thread(
-            self._thread_task,
-            thread_name,
-            args=(target_func,) + tuple(args),
-            kwargs=kwargs,
-            daemon=True
-        )
+        return self.context._add_thread(target_func, thread_name, args=args, kwargs=kwargs)
+
+    @spider_stop_checkpoint
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        return self.context.thread_pool.submit(func, *args, **kwargs)
+
+    @spider_stop_checkpoint
+    def map(self, func: Callable, *iterables: Iterable[Any]) -> Iterator[Any]:
+        return self.context.thread_pool.map(func, *iterables)
+
+    @spider_stop_checkpoint
+    def offload(self, func: Callable, *args, **kwargs) -> Future:
+        return self.context._get_process_pool().submit(func, *args, **kwargs)
+
+    @spider_stop_checkpoint
+    def offload_map(self, func: Callable, *iterables: Iterable[Any]) -> Iterator[Any]:
+        return self.context._get_process_pool().map(func, *iterables)
 
     @spider_stop_checkpoint
     def new_table(self,
                   table_name: str,
-                  ref_data: Dict[str, Any]
+                  ref_data: Dict[str, Any],
+                  dedup_keys: Optional[Sequence[str]] = None
                   ) -> bool:
 
-        return self.context._new_table(table_name, ref_data)
+        return self.context._new_table(table_name, ref_data, dedup_keys)
 
     @spider_stop_checkpoint
     def write_data(self,
@@ -76,7 +125,38 @@ class ISpider(ABC):
                    data: Dict[str, Any]
                    ) -> None:
 
-        self.context._push_data_to_queue((table_name, data))
+        self.context._write_row(table_name, data)
+
+    @spider_stop_checkpoint
+    def write_many(self,
+                   table_name: str,
+                   rows: Iterable[Dict[str, Any]]
+                   ) -> None:
+
+        rows = list(rows)
+        if (len(rows) == 0):
+            return
+
+        self.context._write_columns(table_name, *_rows_to_columns(rows))
+
+    @spider_stop_checkpoint
+    def write_columns(self,
+                      table_name: str,
+                      columns: Dict[str, Sequence[Any]]
+                      ) -> None:
+
+        column_names, values = _unpack_columns(columns)
+        if (len(values) == 0 or len(values[0]) == 0):
+            return
+
+        self.context._write_columns(table_name, column_names, values)
+
+    def get_watermark(self, source: str, default: Any = None) -> Any:
+        return self.context._get_watermark(source, default)
+
+    @spider_stop_checkpoint
+    def advance_watermark(self, source: str, value: Any) -> bool:
+        return self.context._advance_watermark(source, value)
 
     def read_stores(self, name: str) -> Optional[Dict[str, Any]]:
         return self.context._read_stores(name)
@@ -99,13 +179,165 @@ class ISpider(ABC):
         try:
             self.run()
 
+        except CancelledError:
+            # Waiting on a task of a pool, which a stop request cancelled
+            if (self.context.control.stop):
+                self.unload()
+                return
+
+            self.context.logger.error("!!!Spider Exception!!!", exc_info=True)
+            self.context.exception_occurred.set()
+
         except Exception:
             self.context.logger.error("!!!Spider Exception!!!", exc_info=True)
             self.context.exception_occurred.set()
 
-    def _thread_task(self, func, *args, **kwargs):
+
+class IAsyncSpider(ABC):
+    """Spider running as a coroutine on the event loop of its context.
+
+    Database calls are coroutines and never block the loop. A stop request or the watch dog
+    cancels `run`, `unload` is awaited then.
+
+    `http` runs its asyncio requests on `HTTP_ASYNC_WORKERS` threads, more are not in flight at once.
+    """
+    def __init__(self) -> None:
+        super(IAsyncSpider, self).__init__()
+
+        self.context: Optional['SpiderContext'] = None
+        self.logger: Optional[logging.Logger] = None
+
+    @property
+    def http(self) -> 'HttpClient':
+        return self.context._get_http_client()
+
+    async def __in_thread(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args))
+
+    async def new_table(self,
+                        table_name: str,
+                        ref_data: Dict[str, Any],
+                        dedup_keys: Optional[Sequence[str]] = None
+                        ) -> bool:
+
+        status = await self.__in_thread(self.context._new_table, table_name, ref_data, dedup_keys)
+        self.context._feed_dog()
+
+        return status
+
+    async def write_data(self,
+                         table_name: str,
+                         data: Dict[str, Any]
+                         ) -> None:
+
+        # A thread only waits for the flush when the buffers are full
+        if (not self.context._write_row(table_name, data, block=False)):
+            await self.__in_thread(self.context._write_row, table_name, data)
+
+        self.context._feed_dog()
+
+    async def write_many(self,
+                         table_name: str,
+                         rows: Iterable[Dict[str, Any]]
+                         ) -> None:
+
+        rows = list(rows)
+        if (len(rows) == 0):
+            return
+
+        await self.__write_columns(table_name, *_rows_to_columns(rows))
+
+    async def write_columns(self,
+                            table_name: str,
+                            columns: Dict[str, Sequence[Any]]
+                            ) -> None:
+
+        column_names, values = _unpack_columns(columns)
+        if (len(values) == 0 or len(values[0]) == 0):
+            return
+
+        await self.__write_columns(table_name, column_names, values)
+
+    async def __write_columns(self, table_name: str, column_names: Tuple[str, ...], values: List[List[Any]]) -> None:
+        if (not self.context._write_columns(table_name, column_names, values, block=False)):
+            await self.__in_thread(self.context._write_columns, table_name, column_names, values)
+
+        self.context._feed_dog()
+
+    def get_watermark(self, source: str, default: Any = None) -> Any:
+        return self.context._get_watermark(source, default)
+
+    async def advance_watermark(self, source: str, value: Any) -> bool:
+        advanced = self.context._advance_watermark(source, value)
+        self.context._feed_dog()
+
+        return advanced
+
+    async def read_stores(self, name: str) -> Optional[Dict[str, Any]]:
+        # Served by the cache once read, the first read of a name goes to the database
+        return await self.__in_thread(self.context._read_stores, name)
+
+    async def write_stores(self, name: str, store_data: Dict[str, Any]) -> bool:
+        return self.context._write_stores(name, store_data)
+
+    async def offload(self, func: Callable, *args, **kwargs) -> Any:
+        """Await `func` run by a worker process of the container."""
+        future = self.context._get_process_pool().submit(func, *args, **kwargs)
+        self.context._feed_dog()
+
+        return await asyncio.wrap_future(future)
+
+    async def fan_out(self,
+                      func: Callable[[Any], Awaitable[Any]],
+                      items: Iterable[Any],
+                      limit: Optional[int] = None
+                      ) -> List[Any]:
+        """Await `func` over the items, at most `limit` at once, results in order.
+        The first exception cancels the others and is raised.
+        """
+        limit = limit or self.context.ASYNC_CONCURRENCY
+        iterator = enumerate(items)
+        results: Dict[int, Any] = {}
+
+        async def worker() -> None:
+            # Workers share the iterator, items are only read as they are started
+            for index, item in iterator:
+                results[index] = await func(item)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(limit)]
+        try:
+            await asyncio.gather(*workers)
+
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        return [results[index] for index in range(len(results))]
+
+    @abstractmethod
+    async def run(self) -> None:
+        pass
+
+    @abstractmethod
+    async def unload(self) -> None:
+        pass
+
+    def _bind_context(self, context: 'SpiderContext'):
+        self.context = context
+
+    async def _run(self) -> None:
         try:
-            func(*args, **kwargs)
+            await self.run()
+
+        except asyncio.CancelledError:
+            # Stop request or watch dog
+            try:
+                await self.unload()
+
+            except Exception:
+                self.context.logger.error("!!!Spider Exception!!!", exc_info=True)
 
         except Exception:
             self.context.logger.error("!!!Spider Exception!!!", exc_info=True)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   stores.py
+@Time    :   2026/10/19 18:40:52
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Key-value state store of a spider, with a write-back cache
+'''
+
+
+import base64
+import pickle
+import threading
+import zlib
+
+from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+
+from database import IDBCommon, SQLite
+from database.common import DBExceptions, RetIndices
+
+
+STATES_TABLE = "states"
+LEGACY_STORES_TABLE = "stores"
+WATERMARKS_TABLE = "_watermarks"
+
+SELECT_STATE_SQL = f"SELECT data, compressed FROM `{STATES_TABLE}` WHERE name=?"
+
+# Values bigger than this are compressed before they are written
+COMPRESS_THRESHOLD = 4096
+
+
+class StateStore():
+    """Spider states, one pickled value per name.
+
+    Values are pickled when they are written, so later changes of the object do not leak in,
+    and kept in memory until `flush` upserts the dirty ones.
+    """
+    def __init__(self, db: SQLite) -> None:
+        self.db = db
+
+        self.__lock = threading.Lock()
+        self.__cache: Dict[str, Optional[bytes]] = {}
+        self.__dirty: Set[str] = set()
+
+    def init_table(self) -> None:
+        self.db.create_table(
+            STATES_TABLE,
+            list({'name': 'name', 'data': b'\x00', 'compressed': False}.items()),
+            primary_keys=['name']
+        )
+
+        if (self.db.is_table_exists(LEGACY_STORES_TABLE)):
+            self.__migrate_legacy_stores()
+
+    def __migrate_legacy_stores(self) -> None:
+        # Old stores were base64 encoded pickles in a text column
+        _, results = self.db.select(LEGACY_STORES_TABLE, "")
+
+        with self.db.transaction() as transaction:
+            for name, store_data in results:
+                transaction.upsert(STATES_TABLE, self.__encode(name, base64.b64decode(store_data)), ['name'])
+
+            transaction.drop_table(LEGACY_STORES_TABLE)
+
+    def __encode(self, name: str, data: bytes) -> Dict[str, Any]:
+        compressed = len(data) > COMPRESS_THRESHOLD
+        if (compressed):
+            data = zlib.compress(data)
+
+        return {'name': name, 'data': data, 'compressed': compressed}
+
+    def __load(self, name: str) -> Optional[bytes]:
+        results = self.db.execute(SELECT_STATE_SQL, (name,))[RetIndices.RESULT]
+        if (len(results) == 0):
+            return None
+
+        data, compressed = results[0]
+
+        return zlib.decompress(data) if compressed else data
+
+    def get(self, name: str) -> Any:
+        with self.__lock:
+            if (name not in self.__cache):
+                self.__cache[name] = self.__load(name)
+
+            data = self.__cache[name]
+
+        return None if data is None else pickle.loads(data)
+
+    def set(self, name: str, value: Any) -> None:
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self.__lock:
+            self.__cache[name] = data
+            self.__dirty.add(name)
+
+    def flush(self) -> int:
+        """Write the dirty values back, returns how many were written."""
+        with self.__lock:
+            if (len(self.__dirty) == 0):
+                return 0
+
+            dirty = {name: self.__cache[name] for name in self.__dirty}
+            self.__dirty.clear()
+
+        try:
+            with self.db.transaction() as transaction:
+                for name, data in dirty.items():
+                    transaction.upsert(STATES_TABLE, self.__encode(name, data), ['name'])
+
+        except Exception:
+            # Keep them dirty for the next flush, the cache has the latest values
+            with self.__lock:
+                self.__dirty.update(dirty.keys())
+            raise
+
+        return len(dirty)
+
+
+def read_watermarks(db: IDBCommon) -> Dict[str, Tuple[bytes, str, str]]:
+    """`{source: (pickled value, display, updated)}` of a data database, empty before the first run."""
+    try:
+        _, results = db.select(WATERMARKS_TABLE, "")
+
+    except DBExceptions.TBNotExistsError:
+        return {}
+
+    return {source: (value, display, updated) for source, value, display, updated in results}
+
+
+class Watermarks():
+    """Committed watermarks of a spider. They live in the data database, next to the rows,
+    and are written in the same transaction as the rows they cover.
+    """
+    def __init__(self, db: IDBCommon) -> None:
+        self.db = db
+
+        self.__committed: Dict[str, Any] = {}
+        # Written in the flush transaction, not committed yet
+        self.__in_flight: Dict[str, Any] = {}
+
+    def init_table(self) -> None:
+        self.db.create_table(
+            WATERMARKS_TABLE,
+            list({'source': 'source', 'value': b'\x00', 'display': 'display', 'updated': "2024-10-25 12:00:00"}.items()),
+            primary_keys=['source']
+        )
+
+        self.__committed = {source: pickle.loads(value) for source, (value, _, _) in read_watermarks(self.db).items()}
+
+    def get(self, source: str) -> Any:
+        if (source in self.__in_flight):
+            return self.__in_flight[source]
+
+        return self.__committed.get(source)
+
+    def write(self, transaction: IDBCommon, values: Dict[str, Any]) -> None:
+        self.__in_flight = values
+        updated = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        for source, value in values.items():
+            transaction.upsert(WATERMARKS_TABLE, {
+                'source': source,
+                'value': pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL),
+                'display': str(value)[:250],
+                'updated': updated
+            }, ['source'])
+
+    def mark_committed(self) -> None:
+        self.__committed.update(self.__in_flight)
+        self.__in_flight = {}
@@ -4,15 +4,21 @@
 @File    :   crontab.py
 @Time    :   2024/10/28 01:01:26
 @Author  :   MuliMuri
-@Version :   1.0
+@Version :   1.1
 @Desc    :   Decode cron expression
 '''
 
 
+import calendar
+
 from datetime import datetime, timedelta
-from itertools import product
-from threading import Timer
-from typing import Any, Callable, Iterable, List, Mapping, Optional, Union
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+# No schedule repeats with a period longer than the 400 years Gregorian cycle,
+# but any real expression that can fire at all fires within the next 28 years.
+MAX_SEARCH_YEARS = 28
 
 
 def parse_cron_field(field: str, min_val: int, max_val: int) -> List:
@@ -51,49 +57,240 @@ def parse_cron_field(field: str, min_val: int, max_val: int) -> List:
     return sorted(values)
 
 
-def get_next_run(cron_expression: str) -> Union[datetime, None]:
-    now = datetime.now()
-    second_field, minute_field, hour_field, \
-        day_field, month_field, weekday_field = cron_expression.split()
+def _to_bits(values: Iterable[int], min_val: int, max_val: int) -> int:
+    bits = 0
+    for value in values:
+        if (value < min_val or value > max_val):
+            raise ValueError(f"Cron value {value} out of range [{min_val}, {max_val}].")
+        bits |= 1 << value
+
+    return bits
+
+
+def _next_bit(bits: int, value: int) -> int:
+    """Smallest set bit >= value, or -1."""
+    masked = bits >> value
+    if (masked == 0):
+        return -1
+
+    return value + (masked & -masked).bit_length() - 1
+
+
+def _prev_bit(bits: int, value: int) -> int:
+    """Largest set bit <= value, or -1."""
+    if (value < 0):
+        return -1
+
+    return (bits & ((1 << (value + 1)) - 1)).bit_length() - 1
+
+
+class CronSchedule():
+    """A compiled 6 fields cron expression: `second minute hour day month weekday`.
+
+    Every field is kept as a bitset, next and previous fire times are found field by field
+    with carries, instead of walking through every candidate second.
+    Day and weekday follow the Vixie cron rule: when neither of them starts with `*`,
+    a day matches if either of them matches, otherwise both have to match.
+    """
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if (len(fields) != 6):
+            raise ValueError(f"Cron expression '{expression}' must have 6 fields.")
+
+        second_field, minute_field, hour_field, \
+            day_field, month_field, weekday_field = fields
+
+        self.expression = expression
+
+        self.seconds = _to_bits(parse_cron_field(second_field, 0, 59), 0, 59)
+        self.minutes = _to_bits(parse_cron_field(minute_field, 0, 59), 0, 59)
+        self.hours = _to_bits(parse_cron_field(hour_field, 0, 23), 0, 23)
+        self.days = _to_bits(parse_cron_field(day_field, 1, 31), 1, 31)
+        self.months = _to_bits(parse_cron_field(month_field, 1, 12), 1, 12)
+
+        # 0=Sunday | 6=Saturday, 7 is accepted as Sunday too
+        weekdays = _to_bits(parse_cron_field(weekday_field, 0, 7), 0, 7)
+        if (weekdays & (1 << 7)):
+            weekdays = (weekdays | 1) & 0x7F
+        self.weekdays = weekdays
+
+        self.is_day_any = day_field.startswith('*')
+        self.is_weekday_any = weekday_field.startswith('*')
+
+        self.__month_days_cache: Dict[Tuple[int, int], int] = {}
+
+    def __repr__(self) -> str:
+        return f"CronSchedule('{self.expression}')"
+
+    def __days_of_month(self, year: int, month: int) -> int:
+        """Bitset of the matched days in a month."""
+        cached = self.__month_days_cache.get((year, month))
+        if (cached is not None):
+            return cached
+
+        first_weekday, days_count = calendar.monthrange(year, month)
+        valid_days = ((1 << days_count) - 1) << 1
+
+        # Python Monday=0 to cron Sunday=0
+        first_weekday = (first_weekday + 1) % 7
+
+        weekday_days = 0
+        for weekday in range(7):
+            if (not self.weekdays & (1 << weekday)):
+                continue
+
+            day = (weekday - first_weekday) % 7 + 1
+            while day <= days_count:
+                weekday_days |= 1 << day
+                day += 7
+
+        if (self.is_day_any or self.is_weekday_any):
+            # A plain `*` has every bit set, a step like `*/2` still restricts
+            matched = self.days & weekday_days
+
+        else:
+            matched = self.days | weekday_days
 
-    seconds = parse_cron_field(second_field, 0, 59)
-    minutes = parse_cron_field(minute_field, 0, 59)
-    hours = parse_cron_field(hour_field, 0, 23)
-    days = parse_cron_field(day_field, 1, 31)
-    months = parse_cron_field(month_field, 1, 12)
-    weekdays = parse_cron_field(weekday_field, 0, 6)  # 0=Sunday | 6=Saturday
+        matched &= valid_days
+        self.__month_days_cache[(year, month)] = matched
 
-    # Search next match time
-    for day_offset in range(0, 365):
-        potential_time = now + timedelta(days=day_offset)
+        return matched
 
-        # Check Month, Day, Week
-        if (
-            potential_time.month in months
-            and potential_time.day in days
-            and ((potential_time.weekday() + 1) % 7) in weekdays
-        ):
+    def matches(self, time: datetime) -> bool:
+        return bool(
+            self.months & (1 << time.month)
+            and self.__days_of_month(time.year, time.month) & (1 << time.day)
+            and self.hours & (1 << time.hour)
+            and self.minutes & (1 << time.minute)
+            and self.seconds & (1 << time.second)
+        )
 
-            for hour, minute, second in product(hours, minutes, seconds):
-                next_time = potential_time.replace(hour=hour, minute=minute, second=second, microsecond=0)
-                if (next_time > now):
-                    return next_time
+    def next_fire(self, after: Optional[datetime] = None) -> Optional[datetime]:
+        """The first fire time strictly after `after` (default: now)."""
+        if (after is None):
+            after = datetime.now()
 
-    return None
+        time = after.replace(microsecond=0) + timedelta(seconds=1)
+        year, month, day = time.year, time.month, time.day
+        hour, minute, second = time.hour, time.minute, time.second
 
+        while year <= after.year + MAX_SEARCH_YEARS:
+            next_month = _next_bit(self.months, month)
+            if (next_month == -1):
+                year, month, day, hour, minute, second = year + 1, 1, 1, 0, 0, 0
+                continue
 
-def cron_to_timer(cron_expression: str,
-                  task: Callable,
-                  args: Optional[Iterable[Any]] = None,
-                  kwargs: Optional[Mapping[str, Any]] = None) -> Union[Timer, None]:
+            if (next_month != month):
+                month, day, hour, minute, second = next_month, 1, 0, 0, 0
+
+            next_day = _next_bit(self.__days_of_month(year, month), day)
+            if (next_day == -1):
+                month, day, hour, minute, second = month + 1, 1, 0, 0, 0
+                if (month > 12):
+                    year, month = year + 1, 1
+                continue
+
+            if (next_day != day):
+                day, hour, minute, second = next_day, 0, 0, 0
+
+            next_hour = _next_bit(self.hours, hour)
+            if (next_hour == -1):
+                day, hour, minute, second = day + 1, 0, 0, 0
+                continue
+
+            if (next_hour != hour):
+                hour, minute, second = next_hour, 0, 0
+
+            next_minute = _next_bit(self.minutes, minute)
+            if (next_minute == -1):
+                hour, minute, second = hour + 1, 0, 0
+                continue
+
+            if (next_minute != minute):
+                minute, second = next_minute, 0
+
+            next_second = _next_bit(self.seconds, second)
+            if (next_second == -1):
+                minute, second = minute + 1, 0
+                continue
+
+            return datetime(year, month, day, hour, minute, next_second, tzinfo=after.tzinfo)
 
-    next_run = get_next_run(cron_expression)
-    if (next_run is None):
-        # Log or print
-        print("Cannot analysis cron expression.")
         return None
 
-    sec_delay = (next_run - datetime.now()).total_seconds()
-    timer = Timer(sec_delay, task, args=args, kwargs=kwargs)
+    def prev_fire(self, before: Optional[datetime] = None) -> Optional[datetime]:
+        """The last fire time strictly before `before` (default: now)."""
+        if (before is None):
+            before = datetime.now()
+
+        time = before - timedelta(seconds=1) if before.microsecond == 0 else before.replace(microsecond=0)
+        year, month, day = time.year, time.month, time.day
+        hour, minute, second = time.hour, time.minute, time.second
+
+        while year >= before.year - MAX_SEARCH_YEARS:
+            prev_month = _prev_bit(self.months, month)
+            if (prev_month == -1):
+                year, month, day, hour, minute, second = year - 1, 12, 31, 23, 59, 59
+                continue
+
+            if (prev_month != month):
+                month, hour, minute, second = prev_month, 23, 59, 59
+                day = calendar.monthrange(year, month)[1]
+
+            prev_day = _prev_bit(self.__days_of_month(year, month), day)
+            if (prev_day == -1):
+                month, hour, minute, second = month - 1, 23, 59, 59
+                if (month < 1):
+                    year, month = year - 1, 12
+                day = calendar.monthrange(year, month)[1]
+                continue
+
+            if (prev_day != day):
+                day, hour, minute, second = prev_day, 23, 59, 59
+
+            prev_hour = _prev_bit(self.hours, hour)
+            if (prev_hour == -1):
+                day, hour, minute, second = day - 1, 23, 59, 59
+                continue
+
+            if (prev_hour != hour):
+                hour, minute, second = prev_hour, 59, 59
+
+            prev_minute = _prev_bit(self.minutes, minute)
+            if (prev_minute == -1):
+                hour, minute, second = hour - 1, 59, 59
+                continue
+
+            if (prev_minute != minute):
+                minute, second = prev_minute, 59
+
+            prev_second = _prev_bit(self.seconds, second)
+            if (prev_second == -1):
+                minute, second = minute - 1, 59
+                continue
+
+            return datetime(year, month, day, hour, minute, prev_second, tzinfo=before.tzinfo)
+
+        return None
+
+    def iter_fires(self, start: Optional[datetime] = None, count: Optional[int] = None) -> Iterator[datetime]:
+        """Yield the next `count` fire times after `start`, endless if `count` is None."""
+        fire_time = start
+        fired = 0
+
+        while count is None or fired < count:
+            fire_time = self.next_fire(fire_time)
+            if (fire_time is None):
+                return
+
+            yield fire_time
+            fired += 1
+
+
+@lru_cache(maxsize=1024)
+def compile_cron(cron_expression: str) -> CronSchedule:
+    return CronSchedule(cron_expression)
+
 
-    return timer
+def get_next_run(cron_expression: str, now: Optional[datetime] = None) -> Union[datetime, None]:
+    return compile_cron(cron_expression).next_fire(now)
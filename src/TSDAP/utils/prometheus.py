@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   prometheus.py
+@Time    :   2026/10/19 14:58:10
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Prometheus text exposition format and a local metrics endpoint
+'''
+
+
+import logging
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def __escape_label_value(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if (len(labels) == 0):
+        return ""
+
+    return "{" + ",".join(f'{name}="{__escape_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def format_value(value: float) -> str:
+    if (value == float("inf")):
+        return "+Inf"
+
+    if (float(value).is_integer()):
+        return str(int(value))
+
+    return repr(float(value))
+
+
+class MetricFamily():
+    def __init__(self, name: str, metric_type: str, help_text: str) -> None:
+        self.name = name
+        self.metric_type = metric_type
+        self.help_text = help_text
+
+        self.samples: List[Tuple[str, Dict[str, str], float]] = []
+
+    def add_sample(self, labels: Dict[str, str], value: float, suffix: str = "") -> None:
+        self.samples.append((suffix, labels, value))
+
+    def add_histogram(self,
+                      labels: Dict[str, str],
+                      cumulative: Sequence[Tuple[float, int]],
+                      total: float,
+                      count: int) -> None:
+
+        for bound, bucket_count in cumulative:
+            self.add_sample(dict(labels, le=format_value(bound)), bucket_count, "_bucket")
+
+        self.add_sample(labels, total, "_sum")
+        self.add_sample(labels, count, "_count")
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}"
+        ]
+
+        for suffix, labels, value in self.samples:
+            lines.append(f"{self.name}{suffix}{format_labels(labels)} {format_value(value)}")
+
+        return "\n".join(lines)
+
+
+def render(families: Iterable[MetricFamily]) -> str:
+    return "\n".join(family.render() for family in families) + "\n"
+
+
+class MetricsServer():
+    """Serve `GET /metrics` from a daemon thread, every scrape calls `collect_func`."""
+    def __init__(self,
+                 collect_func: Callable[[], Iterable[MetricFamily]],
+                 port: int,
+                 host: str = "127.0.0.1") -> None:
+
+        self.collect_func = collect_func
+
+        collect = self.__collect
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if (self.path.split('?')[0] != "/metrics"):
+                    self.send_error(404)
+                    return
+
+                body = collect()
+
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                # Keep scrapes out of the console
+                pass
+
+        self.http_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.http_server.daemon_threads = True
+
+        self.server_thread: Optional[Thread] = None
+
+    def __collect(self) -> bytes:
+        try:
+            return render(self.collect_func()).encode("utf-8")
+
+        except Exception:
+            logging.error("Unable to collect metrics.", exc_info=True)
+            return b""
+
+    @property
+    def port(self) -> int:
+        return self.http_server.server_address[1]
+
+    def start(self) -> None:
+        self.server_thread = Thread(target=self.http_server.serve_forever,
+                                    name="metrics_server",
+                                    daemon=True)
+        self.server_thread.start()
+
+    def stop(self) -> None:
+        self.http_server.shutdown()
+        self.http_server.server_close()
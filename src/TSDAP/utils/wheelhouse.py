@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   wheelhouse.py
+@Time    :   2026/10/19 10:12:31
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Local wheel cache and per-package site directories
+'''
+
+
+import os
+import shutil
+import subprocess
+import sys
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Tuple
+
+
+LOCK_FILENAME = "requirements.lock"
+
+
+def __pip(args: List[str], quiet: bool = False) -> None:
+    output = subprocess.DEVNULL if quiet else None
+    subprocess.check_call([sys.executable, "-m", "pip"] + args, stdout=output, stderr=output)
+
+
+def resolve_wheels(requirements: List[str], wheelhouse_dir: str) -> None:
+    """Make sure every requirement (and its dependencies) has a wheel in the wheelhouse.
+    The local wheelhouse is tried first, so nothing touches the network once the wheels are cached.
+    """
+    if (len(requirements) == 0):
+        return
+
+    os.makedirs(wheelhouse_dir, exist_ok=True)
+
+    base_args = ["wheel", "--quiet", "--wheel-dir", wheelhouse_dir, "--find-links", wheelhouse_dir]
+
+    try:
+        __pip(base_args + ["--no-index"] + requirements, quiet=True)
+
+    except subprocess.CalledProcessError:
+        # Some wheels are missing, download or build them.
+        __pip(base_args + requirements)
+
+
+def read_lock_file(env_dir: str) -> Optional[List[str]]:
+    lock_path = os.path.join(env_dir, LOCK_FILENAME)
+    if (not os.path.isfile(lock_path)):
+        return None
+
+    with open(lock_path, 'r', encoding='utf-8') as fp:
+        return [line.strip() for line in fp if line.strip()]
+
+
+def __collect_pins(site_dir: str) -> List[str]:
+    pins = []
+    for entry in os.listdir(site_dir):
+        if (not entry.endswith(".dist-info")):
+            continue
+
+        name, version = entry[:-len(".dist-info")].rsplit('-', 1)
+        pins.append(f"{name}=={version}")
+
+    return sorted(pins, key=str.lower)
+
+
+def build_site_dir(requirements: List[str], wheelhouse_dir: str, env_dir: str) -> List[str]:
+    """Install requirements from the wheelhouse into `<env_dir>/site`, without any index access.
+    If the env directory already has a lock file, the pinned versions are installed instead,
+    so every machine sharing the wheelhouse gets the same environment.
+
+    Returns the pinned requirements.
+    """
+    site_dir = os.path.join(env_dir, "site")
+    building_dir = f"{site_dir}.building"
+
+    locked = read_lock_file(env_dir)
+
+    shutil.rmtree(building_dir, ignore_errors=True)
+    os.makedirs(building_dir)
+
+    if (locked is not None and len(locked) != 0):
+        __pip(["install", "--quiet", "--no-index", "--no-deps", "--find-links", wheelhouse_dir,
+               "--target", building_dir] + locked)
+
+    elif (locked is None and len(requirements) != 0):
+        __pip(["install", "--quiet", "--no-index", "--find-links", wheelhouse_dir,
+               "--target", building_dir] + requirements)
+
+    pins = __collect_pins(building_dir)
+
+    # Swap the new site directory in place
+    shutil.rmtree(site_dir, ignore_errors=True)
+    os.replace(building_dir, site_dir)
+
+    with open(os.path.join(env_dir, LOCK_FILENAME), 'w', encoding='utf-8') as fp:
+        fp.writelines(f"{pin}\n" for pin in pins)
+
+    return pins
+
+
+def build_site_dirs(jobs: Iterable[Tuple[List[str], str]], wheelhouse_dir: str, max_workers: int = 4) -> None:
+    """Build many `(requirements, env_dir)` environments in parallel."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(build_site_dir, requirements, wheelhouse_dir, env_dir)
+            for requirements, env_dir in jobs
+        ]
+
+        for future in futures:
+            future.result()
+
+
+def get_site_dir(env_dir: str) -> str:
+    return os.path.join(env_dir, "site")
+
+
+def is_site_dir_ready(env_dir: str) -> bool:
+    return os.path.isdir(get_site_dir(env_dir)) and os.path.isfile(os.path.join(env_dir, LOCK_FILENAME))
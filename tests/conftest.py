@@ -15,6 +15,7 @@ import sys
 
 
 sys.path.append(os.path.join('src'))
+sys.path.append(os.path.join('src', 'TSDAP'))
 logging.captureWarnings(True)
 
 
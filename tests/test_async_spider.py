@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_async_spider.py
+@Time    :   2026/10/20 15:58:12
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Async spiders on the event loop of their context
+'''
+
+
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from multiprocessing import Event
+from typing import Any, List
+
+import pytest
+
+from spider.buffer import RowBuffers
+from spider.context import SpiderContext
+from spider.control import ControlBlock, ControlSlots, LocalControl
+from spider.metrics import ContainerMetrics
+from spider.spider import IAsyncSpider
+
+
+class FakeValue():
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def get(self) -> Any:
+        return self.value
+
+    def set(self, value: Any) -> None:
+        self.value = value
+
+
+class FakeShares():
+    def __init__(self) -> None:
+        self.is_dog_trigger = FakeValue(False)
+
+
+class RecordingSpider(IAsyncSpider):
+    def __init__(self) -> None:
+        super().__init__()
+
+        self.events: List[str] = []
+        self.started = threading.Event()
+
+    async def run(self) -> None:
+        self.events.append("run")
+        self.started.set()
+
+        try:
+            await asyncio.sleep(60)
+
+        except asyncio.CancelledError:
+            self.events.append("cancelled")
+            raise
+
+    async def unload(self) -> None:
+        # Awaited, not only called
+        await asyncio.sleep(0.01)
+        self.events.append("unloaded")
+
+
+def bare_context(spider: IAsyncSpider, max_rows: int = 100) -> SpiderContext:
+    # Only what an async spider touches, nothing is loaded from a package
+    context = SpiderContext.__new__(SpiderContext)
+    context.spider_name = "test"
+    context.logger = logging.getLogger("test_async_spider")
+    context.exception_occurred = Event()
+    context.row_buffers = RowBuffers(max_rows)
+    context.metrics = ContainerMetrics()
+    context.spider_shares = FakeShares()
+    context.control = LocalControl(ControlBlock())
+    context.is_daemon = False
+    context.WATCH_DOG_MAX_TIME = 60
+    context.dog_deadline = float("inf")
+    context.ASYNC_CONCURRENCY = 100
+    context.event_loop = None
+    context.async_main_task = None
+
+    context.thread_spider_main = spider
+    spider._bind_context(context)
+
+    return context
+
+
+def test_fan_out_bounds_the_concurrency_and_keeps_the_order():
+    context = bare_context(RecordingSpider())
+    state = {'active': 0, 'peak': 0}
+
+    async def fetch(value: int) -> int:
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+
+        await asyncio.sleep(random.uniform(0, 0.01))
+
+        state['active'] -= 1
+        return value * 2
+
+    results = asyncio.run(context.thread_spider_main.fan_out(fetch, range(30), limit=4))
+
+    assert results == [value * 2 for value in range(30)]
+    assert state['peak'] == 4
+
+
+def test_fan_out_raises_the_first_error():
+    context = bare_context(RecordingSpider())
+    cancelled = []
+
+    async def fetch(value: int) -> int:
+        if (value == 3):
+            raise ValueError("bad page")
+
+        try:
+            await asyncio.sleep(60)
+
+        except asyncio.CancelledError:
+            cancelled.append(value)
+            raise
+
+        return value
+
+    with pytest.raises(ValueError):
+        asyncio.run(context.thread_spider_main.fan_out(fetch, range(10), limit=5))
+
+    # The others in flight are cancelled, the items left are never started
+    assert sorted(cancelled) == [0, 1, 2, 4]
+
+
+@pytest.mark.parametrize("trigger", ["stop", "watch dog"])
+def test_stop_cancels_run_then_awaits_unload(trigger):
+    spider = RecordingSpider()
+    context = bare_context(spider)
+
+    thread = threading.Thread(target=context._SpiderContext__run_async_spider, daemon=True)
+    thread.start()
+    assert spider.started.wait(5)
+
+    if (trigger == "stop"):
+        context.control.set(ControlSlots.STOP)
+    else:
+        context.dog_deadline = time.monotonic() - 1
+        context._SpiderContext__check_dog()
+
+        assert context.control.stop
+        assert context.spider_shares.is_dog_trigger.get()
+
+    # As the context loop does on a stop
+    context._SpiderContext__cancel_async_spider()
+
+    thread.join(5)
+    assert not thread.is_alive()
+    assert spider.events == ["run", "cancelled", "unloaded"]
+    assert not context.exception_occurred.is_set()
+
+
+def test_write_data_waits_for_room_in_the_executor():
+    spider = RecordingSpider()
+    context = bare_context(spider, max_rows=2)
+    calls = []
+
+    original_put_row = context.row_buffers.put_row
+
+    def put_row(table_name, data, block=True):
+        calls.append((block, threading.current_thread() is loop_thread))
+        return original_put_row(table_name, data, block)
+
+    context.row_buffers.put_row = put_row
+
+    async def write_when_full() -> int:
+        # Room left, buffered at once on the loop
+        await spider.write_data("t", {'a': 1})
+        await spider.write_data("t", {'a': 2})
+        assert calls == [(False, True), (False, True)]
+
+        # Full, the write waits in a thread until the context drains the buffers
+        threading.Timer(0.2, context.row_buffers.drain).start()
+        write_task = asyncio.ensure_future(spider.write_data("t", {'a': 3}))
+
+        ticks = 0
+        while not write_task.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+        await write_task
+        return ticks
+
+    loop_thread = threading.current_thread()
+    ticks = asyncio.run(write_when_full())
+
+    # The loop kept running meanwhile
+    assert ticks >= 10
+    assert calls[2:] == [(False, True), (True, False)]
+    assert len(context.row_buffers) == 1
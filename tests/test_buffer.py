@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_buffer.py
+@Time    :   2026/10/20 11:05:19
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Row buffers, their back pressure, drain and requeue
+'''
+
+
+import os
+import threading
+import time
+
+from spider.buffer import RowBuffers
+
+
+def drained_rows(row_buffers: RowBuffers):
+    buffers, watermarks = row_buffers.drain()
+    return ({(buffer.table_name, buffer.column_names): buffer.rows() for buffer in buffers}, watermarks)
+
+
+def test_rows_are_grouped_by_table_and_columns():
+    row_buffers = RowBuffers(100)
+
+    row_buffers.put_row("t", {'a': 1, 'b': "x"})
+    row_buffers.put_rows("t", ("a", "b"), [(2, "y"), (3, "z")])
+    row_buffers.put_columns("t", ("a",), [[4, 5]])
+    row_buffers.put_row("u", {'a': 6})
+
+    assert len(row_buffers) == 6
+    assert drained_rows(row_buffers) == ({
+        ("t", ("a", "b")): [(1, "x"), (2, "y"), (3, "z")],
+        ("t", ("a",)): [(4,), (5,)],
+        ("u", ("a",)): [(6,)]
+    }, {})
+    assert len(row_buffers) == 0
+
+
+def test_watermarks_drain_with_the_rows():
+    row_buffers = RowBuffers(100)
+
+    row_buffers.put_row("t", {'a': 1})
+    row_buffers.put_watermark("feed", 10)
+    row_buffers.put_watermark("feed", 11)
+
+    assert row_buffers.get_watermark("feed") == 11
+    assert drained_rows(row_buffers) == ({("t", ("a",)): [(1,)]}, {'feed': 11})
+    assert row_buffers.get_watermark("feed") is None
+
+
+def test_full_buffers_block_writers_until_drained():
+    row_buffers = RowBuffers(2)
+    row_buffers.put_rows("t", ("a",), [(1,), (2,)])
+
+    assert row_buffers.full()
+    assert not row_buffers.put_row("t", {'a': 3}, block=False)
+
+    writer = threading.Thread(target=row_buffers.put_row, args=("t", {'a': 3}))
+    writer.start()
+    writer.join(0.2)
+    assert writer.is_alive()
+
+    assert drained_rows(row_buffers)[0] == {("t", ("a",)): [(1,), (2,)]}
+
+    writer.join(2)
+    assert not writer.is_alive()
+    assert drained_rows(row_buffers)[0] == {("t", ("a",)): [(3,)]}
+
+
+def test_wait_full_wakes_up_when_filled():
+    row_buffers = RowBuffers(3)
+
+    assert not row_buffers.wait_full(0.05)
+
+    timer = threading.Timer(0.1, row_buffers.put_rows, args=("t", ("a",), [(1,), (2,), (3,)]))
+    timer.start()
+
+    start_time = time.monotonic()
+    assert row_buffers.wait_full(5)
+    assert time.monotonic() - start_time < 2
+
+    timer.join()
+
+
+def test_wakeup_fd_interrupts_wait_full():
+    row_buffers = RowBuffers(3)
+
+    timer = threading.Timer(0.1, os.write, args=(row_buffers.wakeup_fd(), b"\0"))
+    timer.start()
+
+    start_time = time.monotonic()
+    assert not row_buffers.wait_full(5)
+    assert time.monotonic() - start_time < 2
+
+    timer.join()
+
+    # The wake up is consumed, the next wait times out again
+    assert not row_buffers.wait_full(0.05)
+
+
+def test_requeue_goes_ahead_of_newer_rows():
+    row_buffers = RowBuffers(100)
+    row_buffers.put_rows("t", ("a",), [(1,), (2,)])
+    row_buffers.put_watermark("feed", 2)
+    row_buffers.put_watermark("other", 5)
+
+    buffers, watermarks = row_buffers.drain()
+
+    # Written while the failed flush was running
+    row_buffers.put_row("t", {'a': 3})
+    row_buffers.put_row("u", {'b': 4})
+    row_buffers.put_watermark("feed", 3)
+
+    row_buffers.requeue(buffers, watermarks)
+
+    assert len(row_buffers) == 4
+    assert drained_rows(row_buffers) == ({
+        ("t", ("a",)): [(1,), (2,), (3,)],
+        ("u", ("b",)): [(4,)]
+    }, {'feed': 3, 'other': 5})
+
+
+def test_requeue_past_the_cap_wakes_up_the_context():
+    row_buffers = RowBuffers(2)
+    row_buffers.put_rows("t", ("a",), [(1,), (2,)])
+    buffers, watermarks = row_buffers.drain()
+
+    row_buffers.requeue(buffers, watermarks)
+
+    assert row_buffers.full()
+    assert row_buffers.wait_full(0)
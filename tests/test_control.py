@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_control.py
+@Time    :   2026/10/20 16:31:50
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Control flags of a container and their signal to its process
+'''
+
+
+import select
+import socket
+import time
+
+from multiprocessing import Event, Process
+
+import pytest
+
+from spider.control import CONTROL_SIGNAL, ControlBlock, ControlSlots, LocalControl
+
+
+# The mirror is refreshed by the signal only, the container loop would find it within seconds
+CHILD_POLL_INTERVAL = 5
+
+pytestmark = pytest.mark.skipif(CONTROL_SIGNAL is None, reason="needs the control signal")
+
+
+def listening(control: ControlBlock, ready) -> None:
+    wake_reader, wake_writer = socket.socketpair()
+    wake_writer.setblocking(False)
+
+    local = LocalControl(control)
+    local.listen(wake_writer.fileno())
+    ready.set()
+
+    # As the container waits on its buffers
+    while not local.stop:
+        if (select.select([wake_reader], [], [], CHILD_POLL_INTERVAL)[0]):
+            wake_reader.recv(4096)
+
+    control.set(ControlSlots.FLUSHED)
+
+
+def sleeping(control: ControlBlock, ready) -> None:
+    ready.set()
+    time.sleep(60)
+
+
+def start_process(target, control: ControlBlock) -> Process:
+    ready = Event()
+
+    process = Process(target=target, args=(control, ready), daemon=True)
+    process.start()
+    assert ready.wait(10)
+
+    return process
+
+
+def wait_slot(control: ControlBlock, slot: ControlSlots, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while not control.get(slot):
+        if (time.monotonic() > deadline):
+            return False
+        time.sleep(0.005)
+
+    return True
+
+
+def test_notify_refreshes_the_mirror_of_the_container():
+    control = ControlBlock()
+    process = start_process(listening, control)
+
+    try:
+        assert control.get(ControlSlots.LISTENING)
+
+        # Written, but the container is not told
+        control.set(ControlSlots.STOP)
+        assert not wait_slot(control, ControlSlots.FLUSHED, 0.2)
+
+        start_time = time.monotonic()
+        control.notify(process.pid)
+
+        assert wait_slot(control, ControlSlots.FLUSHED, 1)
+        assert time.monotonic() - start_time < 1
+
+        process.join(5)
+        assert process.exitcode == 0
+
+    finally:
+        process.kill()
+
+
+def test_notify_skips_a_container_not_listening():
+    control = ControlBlock()
+    process = start_process(sleeping, control)
+
+    try:
+        # The signal would kill it, no handler is installed yet
+        control.notify(process.pid)
+        process.join(0.2)
+
+        assert process.is_alive()
+
+    finally:
+        process.kill()
+        process.join(5)
+
+
+def test_notify_on_an_exited_process_is_a_no_op():
+    control = ControlBlock()
+    process = start_process(listening, control)
+
+    control.set(ControlSlots.STOP)
+    control.notify(process.pid)
+    process.join(5)
+    assert process.exitcode == 0
+
+    # Still marked as listening, the process is gone
+    assert control.get(ControlSlots.LISTENING)
+    control.notify(process.pid)
+
+    # Never the process group of the caller
+    control.notify(0)
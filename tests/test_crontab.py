@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_crontab.py
+@Time    :   2026/10/20 09:12:40
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   CronSchedule against a brute force search
+'''
+
+
+import random
+import zlib
+
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+import pytest
+
+from utils.crontab import CronSchedule, parse_cron_field
+
+
+# Leap days and impossible dates need a long horizon
+BRUTE_FORCE_DAYS = 366 * 29
+
+SECOND_FIELDS = ["0", "*/15", "5,35", "10-12", "*"]
+MINUTE_FIELDS = ["0", "*/20", "7", "58-59", "*"]
+HOUR_FIELDS = ["0", "*/6", "23", "9-17", "*"]
+DAY_FIELDS = ["*", "1", "15", "31", "*/10", "29", "1-7"]
+MONTH_FIELDS = ["*", "2", "*/3", "12", "1-6"]
+WEEKDAY_FIELDS = ["*", "0", "1-5", "*/3", "6,7"]
+
+
+class BruteForce():
+    """Checks every day, then every time of the matched days, in order."""
+    def __init__(self, expression: str) -> None:
+        second_field, minute_field, hour_field, day_field, month_field, weekday_field = expression.split()
+
+        self.seconds = parse_cron_field(second_field, 0, 59)
+        self.minutes = parse_cron_field(minute_field, 0, 59)
+        self.hours = parse_cron_field(hour_field, 0, 23)
+        self.days = set(parse_cron_field(day_field, 1, 31))
+        self.months = set(parse_cron_field(month_field, 1, 12))
+        self.weekdays = {weekday % 7 for weekday in parse_cron_field(weekday_field, 0, 7)}
+
+        self.is_day_star = day_field.startswith('*')
+        self.is_weekday_star = weekday_field.startswith('*')
+
+    def day_matches(self, day: date) -> bool:
+        if (day.month not in self.months):
+            return False
+
+        is_day = day.day in self.days
+        is_weekday = day.isoweekday() % 7 in self.weekdays
+
+        if (self.is_day_star or self.is_weekday_star):
+            return is_day and is_weekday
+
+        return is_day or is_weekday
+
+    def times(self, day: date, is_reversed: bool = False):
+        hours = reversed(self.hours) if is_reversed else self.hours
+        for hour in hours:
+            minutes = reversed(self.minutes) if is_reversed else self.minutes
+            for minute in minutes:
+                seconds = reversed(self.seconds) if is_reversed else self.seconds
+                for second in seconds:
+                    yield datetime.combine(day, time(hour, minute, second))
+
+    def next_fire(self, after: datetime) -> Optional[datetime]:
+        start = after.replace(microsecond=0) + timedelta(seconds=1)
+
+        day = start.date()
+        for _ in range(BRUTE_FORCE_DAYS):
+            if (self.day_matches(day)):
+                for fire_time in self.times(day):
+                    if (fire_time >= start):
+                        return fire_time
+
+            day += timedelta(days=1)
+
+        return None
+
+    def prev_fire(self, before: datetime) -> Optional[datetime]:
+        day = before.date()
+        for _ in range(BRUTE_FORCE_DAYS):
+            if (self.day_matches(day)):
+                for fire_time in self.times(day, is_reversed=True):
+                    if (fire_time < before):
+                        return fire_time
+
+            day -= timedelta(days=1)
+
+        return None
+
+
+def random_expressions(count: int, seed: int):
+    rand = random.Random(seed)
+
+    return [
+        " ".join([
+            rand.choice(SECOND_FIELDS), rand.choice(MINUTE_FIELDS), rand.choice(HOUR_FIELDS),
+            rand.choice(DAY_FIELDS), rand.choice(MONTH_FIELDS), rand.choice(WEEKDAY_FIELDS)
+        ])
+        for _ in range(count)
+    ]
+
+
+def random_times(count: int, seed: int):
+    rand = random.Random(seed)
+    start = datetime(2023, 1, 1)
+
+    times = [
+        start + timedelta(seconds=rand.randrange(8 * 365 * 86400), microseconds=rand.choice([0, 250000]))
+        for _ in range(count)
+    ]
+
+    # Ends of days, months, years and a leap day
+    times += [datetime(2026, 12, 31, 23, 59, 59), datetime(2028, 2, 28, 23, 59, 59), datetime(2028, 2, 29, 12)]
+
+    return times
+
+
+@pytest.mark.parametrize("expression", random_expressions(60, 27))
+def test_next_fire_matches_brute_force(expression):
+    schedule = CronSchedule(expression)
+    brute_force = BruteForce(expression)
+
+    for after in random_times(4, zlib.crc32(expression.encode())):
+        assert schedule.next_fire(after) == brute_force.next_fire(after), after
+
+
+@pytest.mark.parametrize("expression", random_expressions(60, 28))
+def test_prev_fire_matches_brute_force(expression):
+    schedule = CronSchedule(expression)
+    brute_force = BruteForce(expression)
+
+    for before in random_times(4, zlib.crc32(expression.encode())):
+        assert schedule.prev_fire(before) == brute_force.prev_fire(before), before
+
+
+@pytest.mark.parametrize("expression", [
+    "0 0 0 29 2 *",         # Leap days only
+    "0 0 0 13 * 5",         # 13th or Friday
+    "0 0 0 */2 * *",        # A step is a restriction too
+    "0 0 0 * * */2",
+    "0 0 12 31 */2 *",
+    "30 30 6 1-7 * 1",
+])
+def test_sparse_expressions(expression):
+    schedule = CronSchedule(expression)
+    brute_force = BruteForce(expression)
+
+    after = datetime(2026, 10, 20, 9, 0, 0)
+    for _ in range(5):
+        fire_time = schedule.next_fire(after)
+        assert fire_time == brute_force.next_fire(after)
+        assert schedule.prev_fire(fire_time) == brute_force.prev_fire(fire_time)
+        after = fire_time
+
+
+def test_impossible_expression_never_fires():
+    schedule = CronSchedule("0 0 0 30 2 *")
+
+    assert schedule.next_fire(datetime(2026, 1, 1)) is None
+    assert schedule.prev_fire(datetime(2026, 1, 1)) is None
+
+
+def test_fire_times_are_strict():
+    schedule = CronSchedule("0 * * * * *")
+    fire_time = datetime(2026, 10, 20, 9, 30, 0)
+
+    assert schedule.matches(fire_time)
+    assert schedule.next_fire(fire_time) == fire_time + timedelta(minutes=1)
+    assert schedule.prev_fire(fire_time) == fire_time - timedelta(minutes=1)
+
+
+def test_sunday_as_seven():
+    assert CronSchedule("0 0 0 * * 7").weekdays == CronSchedule("0 0 0 * * 0").weekdays
+
+
+def test_iter_fires():
+    fire_times = list(CronSchedule("*/20 * * * * *").iter_fires(datetime(2026, 10, 20, 9, 0, 0), 4))
+
+    assert fire_times == [datetime(2026, 10, 20, 9, 0, second) for second in (20, 40)] + \
+        [datetime(2026, 10, 20, 9, 1, second) for second in (0, 20)]
+
+
+def test_invalid_field_count():
+    with pytest.raises(ValueError):
+        CronSchedule("* * * * *")
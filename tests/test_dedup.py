@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_dedup.py
+@Time    :   2026/10/20 12:16:40
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Bloom filter bounds and table deduplication
+'''
+
+
+import os
+
+import pytest
+
+from database import SQLite
+from database.common import RetIndices
+from spider.dedup import MAX_INDEX_NAME, ScalableBloomFilter, TableDedup, encode_key
+
+
+ERROR_RATE = 0.01
+
+
+def key(index: int) -> bytes:
+    return encode_key((index, f"name-{index}"))
+
+
+def may_contain(bloom_filter: ScalableBloomFilter, key: bytes) -> bool:
+    # Unlike `add` the lookup leaves the filter as it is
+    digest = ScalableBloomFilter.digest(key)
+    return any(bloom_slice.contains(digest) for bloom_slice in bloom_filter.slices)
+
+
+def false_positive_rate(bloom_filter: ScalableBloomFilter, start: int, samples: int) -> float:
+    return sum(may_contain(bloom_filter, key(index)) for index in range(start, start + samples)) / samples
+
+
+@pytest.fixture
+def bloom_filter(tmp_path):
+    bloom_filter = ScalableBloomFilter(str(tmp_path), "items", 1000, ERROR_RATE, 1 << 30)
+
+    yield bloom_filter
+
+    bloom_filter.close()
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLite(str(tmp_path))
+    db.create_database("data")
+    db.switch_database("data")
+    db.create_table("items", [("id", 1), ("name", "name")], primary_keys=["id"])
+
+    yield db
+
+    db.close()
+
+
+def test_no_false_negatives(bloom_filter):
+    # A new key is only reported as seen on a false positive
+    assert sum(bloom_filter.add(key(index)) for index in range(3000)) <= 3000 * ERROR_RATE * 1.5
+    assert all(bloom_filter.add(key(index)) for index in range(3000))
+    assert bloom_filter.count <= 3000
+
+
+def test_false_positive_rate_is_bounded(bloom_filter):
+    # 1000 + 2000 + 4000 + 8000, four slices are full
+    for index in range(15000):
+        bloom_filter.add(key(index))
+
+    assert len(bloom_filter.slices) == 4
+
+    # The tightening keeps the whole filter under the configured rate, with slack for the sampling
+    assert false_positive_rate(bloom_filter, 1 << 20, 40000) <= ERROR_RATE * 1.5
+
+
+def test_rate_holds_at_every_slice(bloom_filter):
+    added = 0
+    for slices in (1, 2, 3):
+        while len(bloom_filter.slices) < slices or bloom_filter.slices[-1].count < bloom_filter.slices[-1].capacity:
+            bloom_filter.add(key(added))
+            added += 1
+
+        assert false_positive_rate(bloom_filter, 1 << 20, 20000) <= ERROR_RATE * 1.5
+
+
+def test_capped_filter_stops_growing(tmp_path):
+    bloom_filter = ScalableBloomFilter(str(tmp_path), "capped", 1000, ERROR_RATE, 4096)
+
+    for index in range(5000):
+        bloom_filter.add(key(index))
+
+    # The first slice only, the later keys raise its rate instead of the memory
+    assert len(bloom_filter.slices) == 1
+    assert bloom_filter.size <= 4096
+    assert all(may_contain(bloom_filter, key(index)) for index in range(5000))
+
+    bloom_filter.close()
+
+
+def test_filter_is_reopened(tmp_path, bloom_filter):
+    assert bloom_filter.is_new
+
+    for index in range(2500):
+        bloom_filter.add(key(index))
+    count = bloom_filter.count
+    bloom_filter.close()
+
+    reopened = ScalableBloomFilter(str(tmp_path), "items", 1000, ERROR_RATE, 1 << 30)
+
+    assert not reopened.is_new
+    assert len(reopened.slices) == 2
+    assert reopened.count == count
+    assert all(may_contain(reopened, key(index)) for index in range(2500))
+
+    reopened.close()
+
+
+def test_damaged_filter_is_dropped(tmp_path, bloom_filter):
+    bloom_filter.add(key(1))
+    bloom_filter.close()
+
+    with open(os.path.join(str(tmp_path), "items.0.bloom"), 'r+b') as fp:
+        fp.write(b"BROKEN!!")
+
+    reopened = ScalableBloomFilter(str(tmp_path), "items", 1000, ERROR_RATE, 1 << 30)
+
+    assert reopened.is_new
+    assert reopened.slices == []
+    assert not any(name.endswith(".bloom") for name in os.listdir(str(tmp_path)))
+
+    reopened.close()
+
+
+def test_fill_reads_the_keys_in_chunks(db, bloom_filter, monkeypatch):
+    db.insert_many("items", ("id", "name"), [(index, f"name-{index}") for index in range(25)])
+
+    chunks = []
+    original_select_columns = db.select_columns
+
+    def select_columns(table_name, column_names, limit, after):
+        chunks.append((tuple(column_names), limit, after))
+        return original_select_columns(table_name, column_names, limit, after)
+
+    monkeypatch.setattr(db, "select_columns", select_columns)
+
+    TableDedup("items", ("id", "name"), bloom_filter).fill(db, chunk_rows=10)
+
+    # Each chunk goes on from the last key of the previous one
+    assert chunks == [(("id", "name"), 10, None), (("id", "name"), 10, (9, "name-9")), (("id", "name"), 10, (19, "name-19"))]
+    assert bloom_filter.count == 25
+    assert all(may_contain(bloom_filter, key(index)) for index in range(25))
+
+
+def test_filter_drops_the_duplicates(db, bloom_filter):
+    db.insert_many("items", ("id", "name"), [(1, "name-1"), (2, "name-2")])
+
+    dedup = TableDedup("items", ("id", "name"), bloom_filter)
+    dedup.fill(db)
+
+    rows = [(1, "name-1"), (3, "name-3"), (3, "name-3"), (2, "other")]
+    assert dedup.filter(db, ("id", "name"), rows) == [(3, "name-3"), (2, "other")]
+
+
+def test_filter_asks_the_table_on_a_possible_hit(db, bloom_filter):
+    dedup = TableDedup("items", ("id", "name"), bloom_filter)
+
+    # In the filter but not in the table, e.g. a rolled back flush
+    bloom_filter.add(key(7))
+
+    assert dedup.filter(db, ("id", "name"), [(7, "name-7")]) == [(7, "name-7")]
+
+
+def test_rows_without_the_keys_are_kept(db, bloom_filter):
+    dedup = TableDedup("items", ("id", "name"), bloom_filter)
+
+    assert dedup.filter(db, ("id",), [(1,), (1,)]) == [(1,), (1,)]
+
+
+def query_plan(db: SQLite, sql: str, data=()) -> str:
+    return " ".join(row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}", data)[RetIndices.RESULT])
+
+
+def test_table_check_uses_the_key_index(db, bloom_filter, monkeypatch):
+    db.create_table("pages", [("url", "url"), ("title", "title")])
+    db.insert_many("pages", ("url", "title"), [(f"/page/{index}", "title") for index in range(100)])
+
+    dedup = TableDedup("pages", ("url",), bloom_filter)
+    assert dedup.create_index(db)
+    assert dedup.create_index(db)
+
+    checks = []
+    original_execute = db.execute
+
+    def execute(sql, data=()):
+        if (sql.startswith("SELECT 1")):
+            checks.append((sql, data))
+        return original_execute(sql, data)
+
+    monkeypatch.setattr(db, "execute", execute)
+
+    dedup.fill(db)
+    assert dedup.filter(db, ("url", "title"), [("/page/1", "again")]) == []
+
+    assert len(checks) == 1
+    monkeypatch.setattr(db, "execute", original_execute)
+    assert f"USING COVERING INDEX {dedup.index_name}" in query_plan(db, *checks[0])
+
+
+def test_long_index_names_are_shortened(bloom_filter):
+    dedup = TableDedup("t" * 60, ("key_a", "key_b"), bloom_filter)
+    other = TableDedup("t" * 60, ("key_a", "key_c"), bloom_filter)
+
+    assert len(dedup.index_name) == MAX_INDEX_NAME
+    assert dedup.index_name != other.index_name
+
+
+def test_fill_walks_the_key_index(db, bloom_filter, monkeypatch):
+    db.create_table("pages", [("site", "site"), ("path", "path")])
+    rows = [(f"site-{site}", f"/{path}") for site in range(3) for path in range(10)] + [("site-0", "/0")]
+    db.insert_many("pages", ("site", "path"), rows)
+
+    dedup = TableDedup("pages", ("site", "path"), bloom_filter)
+    dedup.create_index(db)
+
+    queries = []
+    original_execute = db.execute
+
+    def execute(sql, data=()):
+        if (sql.startswith("SELECT `site`")):
+            queries.append((sql, data))
+        return original_execute(sql, data)
+
+    monkeypatch.setattr(db, "execute", execute)
+
+    # Chunk ends fall inside the runs of one site
+    dedup.fill(db, chunk_rows=4)
+
+    monkeypatch.setattr(db, "execute", original_execute)
+    assert all(may_contain(bloom_filter, encode_key(row)) for row in rows)
+    assert bloom_filter.count == 30
+    assert len(queries) == 8
+
+    # Neither a sort nor skipped rows, the chunk starts in the index
+    plan = query_plan(db, *queries[-1])
+    assert f"INDEX {dedup.index_name}" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_fill_skips_null_keys(db, bloom_filter):
+    db.create_table("pages", [("url", "url")])
+    db.insert_many("pages", ("url",), [("/a",), (None,), ("/b",)])
+
+    TableDedup("pages", ("url",), bloom_filter).fill(db, chunk_rows=1)
+
+    assert bloom_filter.count == 2
@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_http.py
+@Time    :   2026/10/20 12:41:25
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   HTTP client and its response cache against a local server
+'''
+
+
+import asyncio
+import gzip
+import threading
+import time
+import zlib
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from spider.http import HttpClient
+from spider.http_cache import HttpCache
+from spider.metrics import ContainerMetrics
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Answers with the route of the test, `route(handler, hits)` where `hits` counts the requests of the path."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def reply(self, status: int, body: bytes = b"", headers=None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        path = self.path.partition("?")[0]
+        self.body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+        with self.server.lock:
+            self.server.hits[path] += 1
+            hits = self.server.hits[path]
+
+        route = self.server.routes.get(path)
+        if (route is None):
+            self.reply(404)
+        else:
+            route(self, hits)
+
+    do_POST = do_GET
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.routes = {}
+    server.hits = Counter()
+    server.lock = threading.Lock()
+    server.url = f"http://127.0.0.1:{server.server_port}"
+
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def metrics():
+    return ContainerMetrics()
+
+
+@pytest.fixture
+def client(metrics):
+    client = HttpClient(backoff=0.01, timeout=5, metrics=metrics)
+
+    yield client
+
+    client.close()
+
+
+@pytest.fixture
+def cached_client(tmp_path, metrics):
+    client = HttpClient(backoff=0.01, timeout=5, metrics=metrics,
+                        cache=HttpCache(str(tmp_path / "cache"), 1 << 20), cache_enabled=True)
+
+    yield client
+
+    client.close()
+
+
+def unavailable(times: int, retry_after: str = "0"):
+    def route(handler: Handler, hits: int) -> None:
+        if (hits <= times):
+            handler.reply(503, b"busy", {'Retry-After': retry_after})
+        else:
+            handler.reply(200, b"ok")
+
+    return route
+
+
+def test_unavailable_answers_are_retried(server, client, metrics):
+    server.routes["/flaky"] = unavailable(2)
+
+    response = client.get(server.url + "/flaky")
+
+    assert response.status == 200
+    assert response.text() == "ok"
+    assert server.hits["/flaky"] == 3
+    assert metrics.snapshot()['http_retries'] == 2
+    assert metrics.snapshot()['http_errors'] == 0
+
+
+def test_retries_give_up_with_the_last_answer(server, metrics):
+    server.routes["/down"] = unavailable(100)
+    client = HttpClient(retries=2, backoff=0.01, metrics=metrics)
+
+    response = client.get(server.url + "/down")
+    client.close()
+
+    assert response.status == 503
+    assert not response.ok
+    assert server.hits["/down"] == 3
+    assert metrics.snapshot()['http_errors'] == 1
+
+
+def test_retry_after_is_honoured(server, client):
+    server.routes["/later"] = unavailable(1, retry_after="0.3")
+
+    start_time = time.monotonic()
+    assert client.get(server.url + "/later").status == 200
+    assert time.monotonic() - start_time >= 0.3
+
+
+def test_dropped_connection_is_retried_for_get_only(server, client):
+    def drop_first(handler: Handler, hits: int) -> None:
+        if (hits == 1):
+            # No answer at all
+            handler.close_connection = True
+        else:
+            handler.reply(200, handler.body or b"ok")
+
+    server.routes["/drop"] = drop_first
+    assert client.get(server.url + "/drop").text() == "ok"
+    assert server.hits["/drop"] == 2
+
+    # On a new connection, a kept alive one is tried once more as it may just have expired
+    server.routes["/drop-post"] = drop_first
+    post_client = HttpClient(backoff=0.01, timeout=5)
+    with pytest.raises(OSError):
+        post_client.post(server.url + "/drop-post", data=b"payload")
+    post_client.close()
+
+    assert server.hits["/drop-post"] == 1
+
+
+def test_connections_are_kept_alive(server, client, metrics):
+    server.routes["/page"] = lambda handler, hits: handler.reply(200, b"page")
+
+    for _ in range(5):
+        client.get(server.url + "/page")
+
+    assert metrics.snapshot()['http_connections_opened'] == 1
+    assert metrics.snapshot()['http_connections_reused'] == 4
+
+
+@pytest.mark.parametrize("max_connections", [1, 3])
+def test_requests_per_host_are_capped(server, client, max_connections):
+    state = {'active': 0, 'peak': 0}
+
+    def slow(handler: Handler, hits: int) -> None:
+        with server.lock:
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+
+        time.sleep(0.1)
+
+        with server.lock:
+            state['active'] -= 1
+
+        handler.reply(200)
+
+    server.routes["/slow"] = slow
+    client.set_host_limits("127.0.0.1", max_connections=max_connections)
+
+    threads = [threading.Thread(target=client.get, args=(server.url + "/slow",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert server.hits["/slow"] == 8
+    assert state['peak'] == max_connections
+    assert client.pool_stats()[f"http://127.0.0.1:{server.server_port}"][0] == max_connections
+
+
+def test_compressed_bodies_are_decoded(server, client):
+    text = b"compressed body " * 200
+
+    server.routes["/gzip"] = lambda handler, hits: handler.reply(200, gzip.compress(text), {'Content-Encoding': "gzip"})
+    server.routes["/deflate"] = lambda handler, hits: handler.reply(200, zlib.compress(text), {'Content-Encoding': "deflate"})
+
+    assert "gzip" in client.headers['Accept-Encoding']
+    assert client.get(server.url + "/gzip").body == text
+    assert client.get(server.url + "/deflate").body == text
+
+
+def test_async_requests(server, client):
+    server.routes["/page"] = lambda handler, hits: handler.reply(200, b"page")
+
+    async def fetch_all():
+        return await asyncio.gather(*(client.aget(server.url + "/page") for _ in range(4)))
+
+    assert [response.text() for response in asyncio.run(fetch_all())] == ["page"] * 4
+
+
+def etag_route(versions):
+    """Answers the current version of `versions` with its ETag, or a 304 for a matching `If-None-Match`."""
+    def route(handler: Handler, hits: int) -> None:
+        etag = f'"v{len(versions)}"'
+        headers = {'ETag': etag, 'Cache-Control': "no-cache"}
+
+        if (handler.headers.get("If-None-Match") == etag):
+            handler.reply(304, headers=headers)
+        else:
+            handler.reply(200, gzip.compress(versions[-1]), dict(headers, **{'Content-Encoding': "gzip"}))
+
+    return route
+
+
+def test_not_modified_is_served_from_the_cache(server, cached_client, metrics):
+    server.routes["/etag"] = etag_route([b"page v1" * 100])
+
+    first = cached_client.get(server.url + "/etag")
+    second = cached_client.get(server.url + "/etag")
+
+    assert not first.from_cache
+    assert second.from_cache
+    assert second.status == 200
+    assert second.body == first.body == b"page v1" * 100
+    assert server.hits["/etag"] == 2
+
+    snapshot = metrics.snapshot()
+    assert (snapshot['http_cache_misses'], snapshot['http_cache_revalidations'], snapshot['http_cache_hits']) == (1, 1, 0)
+
+
+def test_changed_resource_replaces_the_cached_one(server, cached_client):
+    versions = [b"page v1"]
+    server.routes["/etag"] = etag_route(versions)
+
+    cached_client.get(server.url + "/etag")
+    versions.append(b"page v2")
+
+    changed = cached_client.get(server.url + "/etag")
+    assert not changed.from_cache
+    assert changed.body == b"page v2"
+
+    again = cached_client.get(server.url + "/etag")
+    assert again.from_cache
+    assert again.body == b"page v2"
+
+
+def test_last_modified_is_revalidated(server, cached_client):
+    def route(handler: Handler, hits: int) -> None:
+        if (handler.headers.get("If-Modified-Since") == "Mon, 19 Oct 2026 10:00:00 GMT"):
+            handler.reply(304)
+        else:
+            handler.reply(200, b"dated", {'Last-Modified': "Mon, 19 Oct 2026 10:00:00 GMT", 'Cache-Control': "max-age=0"})
+
+    server.routes["/dated"] = route
+
+    assert [cached_client.get(server.url + "/dated").from_cache for _ in range(3)] == [False, True, True]
+    assert server.hits["/dated"] == 3
+
+
+def test_fresh_response_skips_the_server(server, cached_client, metrics):
+    server.routes["/fresh"] = lambda handler, hits: handler.reply(200, b"fresh", {'Cache-Control': "max-age=60"})
+
+    assert [cached_client.get(server.url + "/fresh").from_cache for _ in range(3)] == [False, True, True]
+    assert server.hits["/fresh"] == 1
+    assert metrics.snapshot()['http_cache_hits'] == 2
+
+    # A `no-cache` request goes to the server anyway
+    cached_client.get(server.url + "/fresh", headers={'Cache-Control': "no-cache"})
+    assert server.hits["/fresh"] == 2
+
+
+def test_uncacheable_responses_are_not_stored(server, cached_client):
+    server.routes["/private"] = lambda handler, hits: handler.reply(200, b"x", {'Cache-Control': "no-store", 'ETag': '"a"'})
+
+    assert [cached_client.get(server.url + "/private").from_cache for _ in range(2)] == [False, False]
+    assert server.hits["/private"] == 2
+
+
+def test_cache_can_be_turned_off(server, cached_client):
+    server.routes["/fresh"] = lambda handler, hits: handler.reply(200, b"fresh", {'Cache-Control': "max-age=60"})
+    cached_client.get(server.url + "/fresh")
+
+    assert not cached_client.get(server.url + "/fresh", cache=False).from_cache
+
+    cached_client.set_host_cache("127.0.0.1", False)
+    assert not cached_client.get(server.url + "/fresh").from_cache
+    assert server.hits["/fresh"] == 3
+
+
+def test_cache_outlives_the_client(server, tmp_path):
+    server.routes["/etag"] = etag_route([b"kept"])
+
+    client = HttpClient(cache=HttpCache(str(tmp_path / "cache"), 1 << 20), cache_enabled=True)
+    client.get(server.url + "/etag")
+    client.close()
+
+    reopened = HttpClient(cache=HttpCache(str(tmp_path / "cache"), 1 << 20), cache_enabled=True)
+    response = reopened.get(server.url + "/etag")
+    reopened.close()
+
+    assert response.from_cache
+    assert response.body == b"kept"
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_manager.py
+@Time    :   2026/10/20 14:06:52
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Container starts of the spider manager
+'''
+
+
+import os
+import subprocess
+import threading
+
+from typing import Any, Dict, List
+
+import pytest
+
+from runtime import RuntimeContext as ctx
+from spider.common import ContainerStatus
+from spider.manager import SpiderManager
+from utils.wheelhouse import LOCK_FILENAME, get_site_dir
+
+
+PACKAGE_ID = "a" * 32
+CONTAINER_ID = "c" * 32
+
+
+def failing_pip(*args, **kwargs) -> None:
+    raise subprocess.CalledProcessError(1, "pip")
+
+
+def building_pip(requirements: List[str], wheelhouse_dir: str, env_dir: str) -> List[str]:
+    os.makedirs(get_site_dir(env_dir), exist_ok=True)
+    with open(os.path.join(env_dir, LOCK_FILENAME), 'w', encoding='utf-8') as fp:
+        fp.write("\n".join(requirements))
+
+    return requirements
+
+
+class FakeProcess():
+    """Takes the place of the container process, the context is never run."""
+    started: List[Dict[str, Any]] = []
+
+    def __init__(self, target=None, name=None, args=({},), daemon=False) -> None:
+        self.context_infos = args[0]
+        self.exitcode = 0
+        self.alive = True
+
+    def start(self) -> None:
+        FakeProcess.started.append(self.context_infos)
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def join(self, timeout=None) -> None:
+        pass
+
+    def terminate(self) -> None:
+        pass
+
+
+class FakeValue():
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def get(self) -> Any:
+        return self.value
+
+
+class FakeShares():
+    def __init__(self) -> None:
+        self.ret_code = FakeValue(0)
+
+
+class FakeSyncManager():
+    def __init__(self) -> None:
+        self.is_shutdown = False
+
+    def shutdown(self) -> None:
+        self.is_shutdown = True
+
+
+def dead_context(name: str) -> Dict[str, Any]:
+    process = FakeProcess()
+    process.alive = False
+
+    return {
+        'name': name,
+        'cron': "0 0 * * * *",
+        'manager': FakeSyncManager(),
+        'shares': FakeShares(),
+        'process': process
+    }
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    ctx.initialize()
+    ctx.process_set_global("Runtimes.DB_ROOT_DIR", str(tmp_path / "db"))
+    ctx.multiprocess_set_global("Spiders.PACKAGE_ROOT_DIR", str(tmp_path / "packages"))
+    ctx.multiprocess_set_global("Spiders.CONTAINER_ROOT_DIR", str(tmp_path / "containers"))
+    for directory in ("db/spider", "packages", "containers"):
+        os.makedirs(tmp_path / directory)
+
+    # The background rebuild of the missing environments fails
+    monkeypatch.setattr("spider.manager.build_site_dirs", failing_pip)
+    monkeypatch.setattr("spider.manager.build_site_dir", failing_pip)
+    monkeypatch.setattr("spider.manager.resolve_wheels", failing_pip)
+    monkeypatch.setattr("spider.manager.Process", FakeProcess)
+    FakeProcess.started = []
+
+    manager = SpiderManager()
+
+    manager.packages_db.insert("infos", {
+        'Name': "demo", 'Tag': "1.0", 'ID': PACKAGE_ID, 'Created': "2026-10-20 14:00:00",
+        'Size': 1024, 'Author': "author", 'Desc': "description"
+    })
+    manager.packages_db.insert("runtimes", {
+        'ID': PACKAGE_ID, 'Entry': "demo/main", 'Daemon': True, 'Envs': "{}", 'Dependencies': '["requests"]'
+    })
+    manager.packages_db.insert("schedules", {'ID': PACKAGE_ID, 'Cron': "0 0 * * * *"})
+
+    manager.container_registry.add({
+        'ID': CONTAINER_ID, 'Package': "demo:1.0", 'Created': "2026-10-20 14:00:00", 'Name': "demo_spider",
+        'Status': ContainerStatus.CREATED.value, 'RetCode': 0, 'Entry': "demo/main", 'Daemon': True, 'Envs': "{}",
+        'Cron': "0 0 * * * *", 'NextRun': "", 'Overlap': "skip", 'Jitter': 0
+    })
+
+    manager.package_envs_thread.join()
+
+    return manager
+
+
+def test_start_fails_without_the_package_env(manager, capsys):
+    assert not manager.start("demo_spider")
+
+    assert "Unable to prepare dependencies of package 'demo:1.0'" in capsys.readouterr().out
+    assert FakeProcess.started == []
+    assert manager.container_registry.get(CONTAINER_ID)['Status'] == ContainerStatus.CREATED.value
+
+
+def test_start_builds_the_missing_env(manager, monkeypatch):
+    monkeypatch.setattr("spider.manager.build_site_dir", building_pip)
+
+    assert manager.start("demo_spider")
+
+    env_dir = os.path.join(manager.env_root_dir, PACKAGE_ID)
+    assert [infos['container_site_dir'] for infos in FakeProcess.started] == [get_site_dir(env_dir)]
+    assert manager.container_registry.get(CONTAINER_ID)['Status'] == ContainerStatus.RUNNING.value
+
+
+def test_exit_does_not_wait_for_the_monitor(manager, monkeypatch):
+    contexts = {container_id: dead_context(container_id) for container_id in ("d" * 32, "e" * 32)}
+
+    def failing_update(container_id: str, **fields) -> None:
+        raise RuntimeError("database is locked")
+
+    # Every exit fails to be recorded, and the processes are already gone
+    monkeypatch.setattr(manager.container_registry, "update", failing_update)
+    monkeypatch.setattr(manager.shutdown_coordinator, "shutdown", lambda context_combines: [])
+
+    with manager.spider_contexts_lock:
+        manager.spider_contexts.update(contexts)
+
+    exit_thread = threading.Thread(target=manager.safety_exit, daemon=True)
+    exit_thread.start()
+    exit_thread.join(5)
+
+    assert not exit_thread.is_alive()
+    assert manager.spider_contexts == {}
+    assert all(context['manager'].is_shutdown for context in contexts.values())
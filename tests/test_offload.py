@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_offload.py
+@Time    :   2026/10/20 15:24:08
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Worker processes of a spider and their shared memory blocks
+'''
+
+
+import os
+import time
+
+from typing import Set, Tuple
+
+import pytest
+
+import spider.offload as offload
+
+from spider.offload import SpiderProcessPool
+
+
+SHM_THRESHOLD = 1024
+SHM_DIR = "/dev/shm"
+
+pytestmark = pytest.mark.skipif(not offload.IS_SHARED_MEMORY_USABLE or not os.path.isdir(SHM_DIR),
+                                reason="needs POSIX shared memory")
+
+
+def shm_blocks() -> Set[str]:
+    return {name for name in os.listdir(SHM_DIR) if name.startswith("psm_")}
+
+
+def describe(value) -> Tuple[str, int, int]:
+    """Type and size of the argument as the worker got it, with the blocks alive meanwhile."""
+    return (type(value).__name__, len(value), len(shm_blocks()))
+
+
+def repeat(value, times: int):
+    return value * times
+
+
+def square(value: int) -> int:
+    time.sleep((value % 3) * 0.01)
+    return value * value
+
+
+@pytest.fixture
+def pool():
+    pool = SpiderProcessPool(2, SHM_THRESHOLD)
+
+    yield pool
+
+    pool.shutdown()
+
+
+@pytest.mark.parametrize("value", [b"\x00\xff" * SHM_THRESHOLD, "páge " * SHM_THRESHOLD])
+def test_large_arguments_go_through_shared_memory(pool, value):
+    before = shm_blocks()
+
+    name, size, blocks = pool.submit(describe, value).result(10)
+
+    # The worker reads the value back from the block the container left for it
+    assert (name, size) == (type(value).__name__, len(value))
+    assert blocks > len(before)
+    assert shm_blocks() == before
+
+
+@pytest.mark.parametrize("value", [b"\x00\xff", "páge "])
+def test_large_results_go_through_shared_memory(pool, value, monkeypatch):
+    taken = []
+    original_take = offload._take
+
+    def take(result):
+        taken.append(type(result))
+        return original_take(result)
+
+    monkeypatch.setattr(offload, "_take", take)
+    before = shm_blocks()
+
+    result = pool.submit(repeat, value, SHM_THRESHOLD).result(10)
+
+    assert result == value * SHM_THRESHOLD
+    assert taken == [offload._SharedPayload]
+
+    # The block is unlinked once the result is read
+    assert shm_blocks() == before
+
+
+def test_small_values_stay_in_the_pipes(pool, monkeypatch):
+    taken = []
+    original_take = offload._take
+
+    def take(result):
+        taken.append(type(result))
+        return original_take(result)
+
+    monkeypatch.setattr(offload, "_take", take)
+
+    assert pool.submit(describe, b"small").result(10)[:2] == ("bytes", 5)
+    assert pool.submit(repeat, "ab", 2).result(10) == "abab"
+    assert taken == [tuple, str]
+
+
+def test_many_tasks_leave_no_blocks(pool):
+    before = shm_blocks()
+
+    futures = [pool.submit(repeat, bytes([index]) * SHM_THRESHOLD, 2) for index in range(20)]
+
+    assert [future.result(10) for future in futures] == [bytes([index]) * SHM_THRESHOLD * 2 for index in range(20)]
+    assert shm_blocks() == before
+    assert not pool.busy()
+
+
+def test_shutdown_cancels_the_tasks_and_terminates_the_workers():
+    pool = SpiderProcessPool(1, SHM_THRESHOLD)
+    worker_pid = pool.submit(os.getpid).result(10)
+
+    before = shm_blocks()
+    futures = [pool.submit(time.sleep, 10)] + [pool.submit(describe, b"x" * SHM_THRESHOLD) for _ in range(3)]
+    assert pool.stats() == (1, 4)
+
+    start_time = time.monotonic()
+    pool.shutdown()
+
+    assert time.monotonic() - start_time < 5
+    assert all(future.cancelled() for future in futures)
+    assert pool.stats() == (1, 0)
+    assert shm_blocks() == before
+
+    with pytest.raises(ProcessLookupError):
+        os.kill(worker_pid, 0)
+
+    # Refused without touching the terminated workers
+    assert pool.submit(describe, b"x" * SHM_THRESHOLD).cancelled()
+    assert shm_blocks() == before
+
+
+def test_map_keeps_the_order(pool):
+    assert list(pool.map(square, range(20))) == [value * value for value in range(20)]
+    assert list(pool.map(repeat, ["a", "b"], [2, 3])) == ["aa", "bbb"]
+
+
+def test_map_submits_one_window_ahead(pool):
+    pulled = []
+
+    def inputs():
+        for value in range(100):
+            pulled.append(value)
+            yield value
+
+    results = pool.map(square, inputs())
+
+    assert next(results) == 0
+    assert len(pulled) == pool.max_workers * 2
+
+    results.close()
+    assert len(pulled) == pool.max_workers * 2
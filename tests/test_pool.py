@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_pool.py
+@Time    :   2026/10/20 14:58:31
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Worker thread pool of a spider
+'''
+
+
+import random
+import sys
+import threading
+import time
+import warnings
+
+from concurrent.futures import CancelledError
+
+import pytest
+
+from spider.pool import PooledThread, SpiderThreadPool
+from spider.spider import SpiderWarnings
+
+
+@pytest.fixture
+def gate():
+    gate = threading.Event()
+
+    yield gate
+
+    # Never leave a worker blocked behind a failed test
+    gate.set()
+
+
+def submit_in_thread(pool: SpiderThreadPool, func, *args):
+    submitted = {}
+    thread = threading.Thread(target=lambda: submitted.update(future=pool.submit(func, *args)), daemon=True)
+    thread.start()
+
+    return (thread, submitted)
+
+
+def test_submit_blocks_when_the_queue_is_full(gate):
+    pool = SpiderThreadPool(1, 2, "test")
+
+    running = pool.submit(gate.wait)
+    queued = [pool.submit(lambda index=index: index) for index in range(2)]
+
+    thread, submitted = submit_in_thread(pool, lambda: "last")
+    thread.join(0.2)
+    assert thread.is_alive()
+    assert pool.stats()[2] == 2
+
+    gate.set()
+    thread.join(5)
+    assert not thread.is_alive()
+
+    assert running.result(5)
+    assert [future.result(5) for future in queued] == [0, 1]
+    assert submitted['future'].result(5) == "last"
+
+
+def test_shutdown_cancels_the_queue_and_releases_submitters(gate):
+    pool = SpiderThreadPool(1, 1, "test")
+
+    running = pool.submit(gate.wait)
+    queued = pool.submit(lambda: "queued")
+    thread, submitted = submit_in_thread(pool, lambda: "blocked")
+    thread.join(0.2)
+    assert thread.is_alive()
+
+    pool.shutdown()
+
+    thread.join(5)
+    assert not thread.is_alive()
+    assert submitted['future'].cancelled()
+    assert queued.cancelled()
+    assert pool.submit(lambda: "late").cancelled()
+
+    # The running task finishes
+    gate.set()
+    assert running.result(5)
+
+
+def test_task_errors_reach_on_exception():
+    errors = []
+    pool = SpiderThreadPool(2, 4, "test", on_exception=errors.append)
+
+    def fail():
+        raise ValueError("bad page")
+
+    future = pool.submit(fail)
+
+    assert isinstance(future.exception(5), ValueError)
+    assert [str(error) for error in errors] == ["bad page"]
+
+
+def test_stop_checkpoint_cancels_the_task():
+    errors = []
+    pool = SpiderThreadPool(1, 1, "test", on_exception=errors.append)
+
+    future = pool.submit(sys.exit)
+
+    with pytest.raises(CancelledError):
+        future.result(5)
+    assert errors == []
+
+
+def test_map_keeps_the_order():
+    pool = SpiderThreadPool(4, 2, "test")
+
+    def slow_square(value: int) -> int:
+        time.sleep(random.uniform(0, 0.01))
+        return value * value
+
+    assert list(pool.map(slow_square, range(50))) == [value * value for value in range(50)]
+    assert list(pool.map(lambda a, b: a + b, [1, 2, 3], [10, 20, 30])) == [11, 22, 33]
+
+
+def test_map_submits_one_window_ahead():
+    pool = SpiderThreadPool(2, 3, "test")
+    pulled = []
+
+    def inputs():
+        for value in range(100):
+            pulled.append(value)
+            yield value
+
+    results = pool.map(lambda value: value, inputs())
+
+    assert next(results) == 0
+    assert len(pulled) == pool.max_workers + pool.max_queue
+
+    results.close()
+    assert len(pulled) == pool.max_workers + pool.max_queue
+
+
+def test_pooled_thread_runs_on_the_pool(gate):
+    pool = SpiderThreadPool(1, 1, "test")
+    thread = PooledThread(pool, gate.wait, name="fetch")
+
+    thread.start()
+    assert thread.is_alive()
+
+    gate.set()
+    thread.join(5)
+    assert not thread.is_alive()
+
+    with pytest.raises(RuntimeError):
+        thread.start()
+
+
+def test_repeated_name_warns(gate):
+    pool = SpiderThreadPool(4, 4, "test")
+    PooledThread(pool, gate.wait, name="fetch").start()
+
+    with pytest.warns(SpiderWarnings.ThreadRepeatWarning) as records:
+        PooledThread(pool, gate.wait, name="fetch").start()
+
+    # Reported at the caller of `start`
+    assert records[0].filename == __file__
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        PooledThread(pool, gate.wait, name="parse").start()
+
+
+def test_busy_pool_warns(gate):
+    pool = SpiderThreadPool(1, 4, "test")
+    PooledThread(pool, gate.wait).start()
+
+    with pytest.warns(SpiderWarnings.ThreadLimitWarning):
+        PooledThread(pool, gate.wait).start()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_profiler.py
+@Time    :   2026/10/20 15:41:57
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Profile requests of a spider container
+'''
+
+
+import logging
+
+from typing import Any
+
+from spider.context import SpiderContext
+from spider.control import ControlBlock, ControlSlots, LocalControl
+
+
+class FakeValue():
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def get(self) -> Any:
+        return self.value
+
+    def set(self, value: Any) -> None:
+        self.value = value
+
+
+class FakeShares():
+    def __init__(self, spider_db_dir: str) -> None:
+        self.spider_db_dir = FakeValue(spider_db_dir)
+        self.profile_report = FakeValue("")
+
+
+def profiling_context(spider_db_dir: str) -> SpiderContext:
+    # Only what the profiler touches, the spider itself is never loaded
+    context = SpiderContext.__new__(SpiderContext)
+    context.logger = logging.getLogger("test_profiler")
+    context.spider_shares = FakeShares(spider_db_dir)
+    context.control = LocalControl(ControlBlock())
+    context.control.set(ControlSlots.PROFILE)
+
+    return context
+
+
+def test_profile_writes_the_report(tmp_path):
+    context = profiling_context(str(tmp_path / "db"))
+
+    context._SpiderContext__profile(0.05)
+
+    assert not context.control.profile
+    assert "Collapsed stacks written to" in context.spider_shares.profile_report.get()
+    assert len(list((tmp_path / "db").glob("profile-*.collapsed"))) == 1
+
+
+def test_failed_profile_is_reported(tmp_path):
+    # The directory of the stacks can't be created under a file
+    (tmp_path / "db").write_text("")
+    context = profiling_context(str(tmp_path / "db" / "spider"))
+
+    context._SpiderContext__profile(0.05)
+
+    # Cleared all the same, the context loop would start the profiler again otherwise
+    assert not context.control.profile
+    assert context.spider_shares.profile_report.get().startswith("Unable to profile the spider:")
+
+
+def test_profiler_errors_are_reported(tmp_path, monkeypatch):
+    def failing_run(self, seconds: float) -> None:
+        raise RuntimeError("no frames")
+
+    monkeypatch.setattr("spider.context.SamplingProfiler.run", failing_run)
+    context = profiling_context(str(tmp_path))
+
+    context._SpiderContext__profile(0.05)
+
+    assert not context.control.profile
+    assert "no frames" in context.spider_shares.profile_report.get()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_registry.py
+@Time    :   2026/10/20 10:21:36
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Lookups and write-through of the container registry
+'''
+
+
+from typing import Any, Dict
+
+import pytest
+
+from database import SQLite
+from spider.registry import CONTAINER_TABLES, ContainerRegistry
+
+
+def new_record(container_id: str, name: str) -> Dict[str, Any]:
+    return {
+        'ID': container_id,
+        'Package': "demo:1.0",
+        'Created': "2026-10-20 10:00:00",
+        'Name': name,
+        'Status': 0,
+        'RetCode': 0,
+        'Entry': "demo/main",
+        'Daemon': False,
+        'Envs': "{}",
+        'Cron': "0 0 * * * *",
+        'NextRun': "",
+        'Overlap': "skip",
+        'Jitter': 0
+    }
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLite(str(tmp_path))
+    db.create_database("containers")
+    db.switch_database("containers")
+
+    record = new_record("0" * 32, "name")
+    for table_name, columns in CONTAINER_TABLES.items():
+        db.create_table(table_name, [(column, record[column]) for column in columns], primary_keys=["ID"])
+
+    yield db
+
+    db.close()
+
+
+@pytest.fixture
+def registry(db):
+    registry = ContainerRegistry(db)
+    registry.load()
+
+    for container_id, name in (("aa11", "alpha"), ("aa22", "beta"), ("bb33", "gamma")):
+        registry.add(new_record(container_id, name))
+
+    return registry
+
+
+def test_match_by_name_and_prefix(registry):
+    assert registry.match("beta") == ["aa22"]
+    assert registry.match("bb") == ["bb33"]
+    assert registry.match("aa") == ["aa11", "aa22"]
+    assert registry.match("cc") == []
+
+
+def test_name_wins_over_prefix(registry):
+    registry.add(new_record("cc44", "aa"))
+
+    assert registry.match("aa") == ["cc44"]
+
+
+def test_records_are_copies(registry):
+    registry.get("aa11")['Name'] = "changed"
+
+    assert registry.get("aa11")['Name'] == "alpha"
+    assert registry.is_name_exists("alpha")
+
+
+def test_update_writes_through(db, registry):
+    registry.update("aa11", Status=1, NextRun="2026-10-21 00:00:00")
+
+    assert registry.get("aa11")['Status'] == 1
+
+    reloaded = ContainerRegistry(db)
+    reloaded.load()
+    assert reloaded.get("aa11")['Status'] == 1
+    assert reloaded.get("aa11")['NextRun'] == "2026-10-21 00:00:00"
+
+
+def test_remove_deletes_every_table(db, registry):
+    registry.remove("aa22")
+
+    assert registry.get("aa22") is None
+    assert registry.match("beta") == []
+    assert registry.match("aa") == ["aa11"]
+
+    for table_name in CONTAINER_TABLES:
+        assert db.select(table_name, "WHERE ID='aa22'")[1] == []
+
+
+def test_record_written_behind_the_registry(db, registry):
+    # Another handle of the same database, the registry only finds it with a query
+    other = ContainerRegistry(db)
+    other.add(new_record("dd55", "delta"))
+
+    assert registry.get("dd55") is None
+    assert registry.match("delta") == ["dd55"]
+    assert registry.get("dd55")['Name'] == "delta"
+
+
+def test_load_joins_all_tables(db, registry):
+    reloaded = ContainerRegistry(db)
+    reloaded.load()
+
+    assert sorted(record['ID'] for record in reloaded.all()) == ["aa11", "aa22", "bb33"]
+    assert reloaded.get("bb33") == registry.get("bb33")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_runtime.py
+@Time    :   2026/10/20 16:14:36
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Shared globals of the runtime context across processes
+'''
+
+
+from multiprocessing import Pipe, Process
+from typing import Any, Dict, List
+
+import pytest
+
+from runtime import RuntimeContext as ctx
+
+
+def child(multiprocess_globals, multiprocess_version, conn) -> None:
+    # As a container process starts
+    ctx.multiprocess_attach(multiprocess_globals, multiprocess_version)
+
+    notifications: List[Dict[str, Any]] = []
+    ctx.multiprocess_subscribe(notifications.append)
+
+    conn.send(ctx.multiprocess_get_global("Test.VALUE"))
+
+    while True:
+        command = conn.recv()
+        if (command == "get"):
+            conn.send(ctx.multiprocess_get_global("Test.VALUE"))
+
+        elif (command == "refresh"):
+            conn.send((ctx.multiprocess_refresh(), ctx.multiprocess_get_global("Test.VALUE")))
+
+        elif (command == "notifications"):
+            conn.send(notifications)
+
+        else:
+            return
+
+
+@pytest.fixture
+def subscribed():
+    ctx.initialize()
+    notifications: List[Dict[str, Any]] = []
+    ctx.multiprocess_subscribe(notifications.append)
+
+    yield notifications
+
+    ctx._multiprocess_subscribers.remove(notifications.append)
+
+
+def ask(conn, command: str) -> Any:
+    conn.send(command)
+    assert conn.poll(10)
+    return conn.recv()
+
+
+def test_child_sees_updates_after_a_refresh():
+    ctx.initialize()
+    ctx.multiprocess_set_global("Test.VALUE", 1)
+
+    conn, child_conn = Pipe()
+    process = Process(target=child, args=(ctx._multiprocess_globals, ctx._multiprocess_version, child_conn), daemon=True)
+    process.start()
+
+    try:
+        assert conn.poll(10)
+        assert conn.recv() == 1
+
+        ctx.multiprocess_set_global("Test.VALUE", 2)
+
+        # The snapshot of the child is only replaced by its own refresh
+        assert ask(conn, "get") == 1
+        assert ask(conn, "refresh") == (True, 2)
+        assert ask(conn, "get") == 2
+        assert ask(conn, "refresh") == (False, 2)
+
+        # Two versions between the refreshes, one notification with both changes
+        ctx.multiprocess_set_global("Test.VALUE", 3)
+        ctx.multiprocess_set_global("Test.OTHER", "x")
+        assert ask(conn, "refresh") == (True, 3)
+        assert ask(conn, "refresh") == (False, 3)
+
+        assert ask(conn, "notifications") == [{'Test.VALUE': 2}, {'Test.VALUE': 3, 'Test.OTHER': "x"}]
+
+    finally:
+        conn.send("exit")
+        process.join(10)
+
+    assert process.exitcode == 0
+
+
+def test_subscribers_are_notified_once_per_version(subscribed):
+    version = ctx.multiprocess_version()
+
+    ctx.multiprocess_set_global("Test.WORKERS", 4)
+    ctx.multiprocess_set_global("Test.WORKERS", 8)
+
+    # The writer refreshed at each write already
+    assert not ctx.multiprocess_refresh()
+    assert ctx.multiprocess_version() == version + 2
+    assert subscribed == [{'Test.WORKERS': 4}, {'Test.WORKERS': 8}]
+
+
+def test_unchanged_values_are_left_out(subscribed):
+    ctx.multiprocess_set_global("Test.NAME", "spider")
+    ctx.multiprocess_set_global("Test.NAME", "spider")
+
+    assert subscribed == [{'Test.NAME': "spider"}, {}]
+    assert ctx.multiprocess_get_global("Test.NAME") == "spider"
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_scheduler.py
+@Time    :   2026/10/20 09:48:05
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Ordering, misfires and overlaps of the cron scheduler
+'''
+
+
+import threading
+import time
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from spider.common import OverlapPolicy
+from spider.scheduler import SpiderScheduler
+
+
+# Never fires during a test, only restored fire times do
+YEARLY = "0 0 0 1 1 *"
+
+
+class FakeManager():
+    def __init__(self, is_launched: bool = True) -> None:
+        self.is_launched = is_launched
+
+        self.launched: List[str] = []
+        self.running: Set[str] = set()
+        self.persisted: Dict[str, Optional[datetime]] = {}
+
+        self.condition = threading.Condition()
+
+    def launch(self, container_id: str) -> bool:
+        with self.condition:
+            self.launched.append(container_id)
+            self.condition.notify_all()
+
+            if (self.is_launched):
+                self.running.add(container_id)
+
+            return self.is_launched
+
+    def is_running(self, container_id: str) -> bool:
+        with self.condition:
+            return container_id in self.running
+
+    def persist(self, container_id: str, next_run: Optional[datetime]) -> None:
+        with self.condition:
+            self.persisted[container_id] = next_run
+            self.condition.notify_all()
+
+    def wait_launched(self, count: int, timeout: float = 5) -> List[str]:
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.launched) >= count, timeout)
+            return list(self.launched)
+
+
+def new_scheduler(manager: FakeManager, max_running: int = 0) -> SpiderScheduler:
+    return SpiderScheduler(manager.launch, manager.is_running, manager.persist, max_running)
+
+
+def test_missed_runs_start_in_schedule_order():
+    manager = FakeManager()
+    scheduler = new_scheduler(manager, max_running=1)
+
+    now = datetime.now()
+    try:
+        for index, container_id in enumerate(["c", "a", "b"]):
+            scheduler.add(container_id, YEARLY, next_run=now - timedelta(minutes=index + 1))
+
+        assert manager.wait_launched(1) == ["b"]
+
+        # The cap holds the others until the running one exits
+        time.sleep(0.2)
+        assert manager.launched == ["b"]
+
+        for expected in (["b", "a"], ["b", "a", "c"]):
+            container_id = manager.launched[-1]
+            manager.running.discard(container_id)
+            scheduler.notify_exit(container_id)
+
+            assert manager.wait_launched(len(expected)) == expected
+
+    finally:
+        scheduler.stop()
+
+
+def test_misfire_is_coalesced_and_rearmed():
+    manager = FakeManager()
+    scheduler = new_scheduler(manager)
+
+    try:
+        scheduler.add("a", YEARLY, next_run=datetime.now() - timedelta(days=3))
+
+        assert manager.wait_launched(1) == ["a"]
+        time.sleep(0.2)
+        assert manager.launched == ["a"]
+
+        # Re-armed from now on, not from the missed fire time
+        next_run = manager.persisted["a"]
+        assert next_run is not None and next_run > datetime.now()
+        assert (next_run.month, next_run.day, next_run.hour) == (1, 1, 0)
+
+    finally:
+        scheduler.stop()
+
+
+def test_new_schedule_waits_for_its_fire_time():
+    manager = FakeManager()
+    scheduler = new_scheduler(manager)
+
+    try:
+        scheduler.add("a", "* * * * * *")
+
+        launched_at = datetime.now()
+        assert manager.wait_launched(1) == ["a"]
+        assert datetime.now() - launched_at < timedelta(seconds=1.5)
+
+    finally:
+        scheduler.stop()
+
+
+def test_overlapping_run_is_skipped():
+    manager = FakeManager()
+    manager.running.add("a")
+    scheduler = new_scheduler(manager)
+
+    try:
+        scheduler.add("a", YEARLY, next_run=datetime.now() - timedelta(seconds=1))
+
+        time.sleep(0.5)
+        assert manager.launched == []
+        assert scheduler.is_scheduled("a")
+
+    finally:
+        scheduler.stop()
+
+
+def test_overlapping_run_is_queued():
+    manager = FakeManager()
+    manager.running.add("a")
+    scheduler = new_scheduler(manager)
+
+    try:
+        scheduler.add("a", YEARLY, OverlapPolicy.QUEUE, next_run=datetime.now() - timedelta(seconds=1))
+
+        time.sleep(0.5)
+        assert manager.launched == []
+
+        manager.running.discard("a")
+        scheduler.notify_exit("a")
+        assert manager.wait_launched(1) == ["a"]
+
+    finally:
+        scheduler.stop()
+
+
+def test_failed_launch_stays_armed():
+    manager = FakeManager(is_launched=False)
+    scheduler = new_scheduler(manager)
+
+    try:
+        scheduler.add("a", "* * * * * *")
+
+        # Fires again on the following seconds
+        assert manager.wait_launched(2, timeout=5) == ["a", "a"]
+        assert scheduler.is_scheduled("a")
+
+    finally:
+        scheduler.stop()
+
+
+def test_removed_container_is_not_launched():
+    manager = FakeManager()
+    scheduler = new_scheduler(manager)
+
+    try:
+        scheduler.add("a", "* * * * * *")
+        scheduler.remove("a")
+
+        time.sleep(1.5)
+        assert manager.launched == []
+        assert manager.persisted["a"] is None
+
+    finally:
+        scheduler.stop()
+
+
+def test_persist_runs_outside_of_the_lock():
+    scheduler: Optional[SpiderScheduler] = None
+    calls = []
+
+    def persist(container_id: str, next_run: Optional[datetime]) -> None:
+        # Another thread would wait forever if the scheduler lock was held here
+        thread = threading.Thread(target=scheduler.is_scheduled, args=(container_id,))
+        thread.start()
+        thread.join(2)
+
+        calls.append(not thread.is_alive())
+
+    scheduler = SpiderScheduler(lambda container_id: True, lambda container_id: False, persist)
+    try:
+        scheduler.add("a", YEARLY)
+        scheduler.remove("a")
+
+        assert calls == [True, True]
+
+    finally:
+        scheduler.stop()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_shutdown.py
+@Time    :   2026/10/20 14:37:10
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Parallel stop of container processes
+'''
+
+
+import signal
+import sys
+import time
+
+from multiprocessing import Event, Process
+from typing import Any, Dict
+
+import pytest
+
+from spider.control import ControlBlock, ControlSlots
+from spider.shutdown import ShutdownCoordinator, ShutdownOutcome
+
+
+TIMEOUT = 0.5
+TERMINATE_TIMEOUT = 0.5
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="needs POSIX signals")
+
+
+def cooperative(control: ControlBlock, ready) -> None:
+    ready.set()
+    while not control.get(ControlSlots.STOP):
+        time.sleep(0.01)
+
+    control.set(ControlSlots.FLUSHED)
+
+
+def ignoring_stop(control: ControlBlock, ready) -> None:
+    def on_sigterm(signum, frame) -> None:
+        # Rows are still flushed on SIGTERM, as the container does
+        control.set(ControlSlots.FLUSHED)
+        sys.exit(143)
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+    ready.set()
+    while True:
+        time.sleep(0.01)
+
+
+def ignoring_sigterm(control: ControlBlock, ready) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    ready.set()
+    while True:
+        time.sleep(0.01)
+
+
+class FakeShares():
+    def __init__(self, control: ControlBlock) -> None:
+        self.control = control
+
+
+def start_container(target) -> Dict[str, Any]:
+    control = ControlBlock()
+    ready = Event()
+
+    process = Process(target=target, args=(control, ready), daemon=True)
+    process.start()
+    assert ready.wait(10)
+
+    return {'name': target.__name__, 'shares': FakeShares(control), 'process': process}
+
+
+def test_each_container_ends_at_its_own_stage():
+    context_combines = [
+        (target.__name__, start_container(target)) for target in (cooperative, ignoring_stop, ignoring_sigterm)
+    ]
+
+    start_time = time.monotonic()
+    results = ShutdownCoordinator(TIMEOUT, TERMINATE_TIMEOUT).shutdown(context_combines)
+    elapsed = time.monotonic() - start_time
+
+    outcomes = {result.container_id: (result.outcome, result.is_flushed, result.exitcode) for result in results}
+    assert outcomes == {
+        'cooperative': (ShutdownOutcome.STOPPED, True, 0),
+        'ignoring_stop': (ShutdownOutcome.TERMINATED, True, 143),
+        'ignoring_sigterm': (ShutdownOutcome.KILLED, False, -signal.SIGKILL)
+    }
+
+    # One deadline for all of them, the kill itself is immediate
+    assert elapsed < TIMEOUT + TERMINATE_TIMEOUT + 0.5
+    assert all(not combine['process'].is_alive() for _, combine in context_combines)
+
+    seconds = {result.container_id: result.seconds for result in results}
+    assert seconds['cooperative'] < TIMEOUT
+    assert TIMEOUT <= seconds['ignoring_stop'] < TIMEOUT + TERMINATE_TIMEOUT
+    assert seconds['ignoring_sigterm'] >= TIMEOUT + TERMINATE_TIMEOUT
+
+
+def test_cooperative_containers_do_not_wait_for_the_deadline():
+    context_combines = [(f"c{index}", start_container(cooperative)) for index in range(4)]
+
+    start_time = time.monotonic()
+    results = ShutdownCoordinator(10, 10).shutdown(context_combines)
+
+    assert time.monotonic() - start_time < 2
+    assert all(result.outcome == ShutdownOutcome.STOPPED and result.is_flushed for result in results)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_sqlite.py
+@Time    :   2026/10/20 10:43:12
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Shared SQLite connections and per-thread database selection
+'''
+
+
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from database import SQLite
+from database.sqlite import ConnectionRegistry
+
+
+@pytest.fixture
+def root_dir(tmp_path):
+    db = SQLite(str(tmp_path))
+    for database_name in ("a", "b", "c", "d"):
+        db.create_database(database_name)
+
+    yield str(tmp_path)
+
+    for database_name in ("a", "b", "c", "d"):
+        ConnectionRegistry.close(str(tmp_path), database_name)
+
+
+def is_closed(connection: sqlite3.Connection) -> bool:
+    try:
+        connection.execute("SELECT 1")
+
+    except sqlite3.ProgrammingError:
+        return True
+
+    return False
+
+
+def test_connection_is_shared(root_dir):
+    first = ConnectionRegistry.acquire(root_dir, "a")
+    second = ConnectionRegistry.acquire(os.path.join(root_dir, "."), "a")
+    ConnectionRegistry.release(first)
+    ConnectionRegistry.release(second)
+
+    assert first is second
+    assert first is not ConnectionRegistry.acquire(root_dir, "b")
+
+
+def test_close_opens_a_new_connection(root_dir):
+    entry = ConnectionRegistry.acquire(root_dir, "a")
+    ConnectionRegistry.release(entry)
+
+    ConnectionRegistry.close(root_dir, "a")
+    assert is_closed(entry.connection)
+
+    reopened = ConnectionRegistry.acquire(root_dir, "a")
+    ConnectionRegistry.release(reopened)
+    assert reopened is not entry
+
+
+def test_idle_connections_are_evicted_first(root_dir, monkeypatch):
+    monkeypatch.setattr(ConnectionRegistry, "MAX_CONNECTIONS", 2)
+
+    busy = ConnectionRegistry.acquire(root_dir, "a")
+    idle = ConnectionRegistry.acquire(root_dir, "b")
+    ConnectionRegistry.release(idle)
+
+    ConnectionRegistry.acquire(root_dir, "c")
+
+    # The oldest one is still used, the idle one goes
+    assert not is_closed(busy.connection)
+    assert is_closed(idle.connection)
+
+    ConnectionRegistry.release(busy)
+
+
+def test_instances_share_the_data(root_dir):
+    writer = SQLite(root_dir)
+    writer.switch_database("a")
+    writer.create_table("t", [("value", 1)])
+    writer.insert("t", {'value': 1})
+
+    reader = SQLite(root_dir)
+    reader.switch_database("a")
+
+    assert reader.select("t")[1] == [(1,)]
+
+
+def test_selected_database_is_per_thread(root_dir):
+    db = SQLite(root_dir)
+    db.switch_database("a")
+
+    seen = {}
+
+    def switch() -> None:
+        db.switch_database("b")
+        seen['switched'] = db._curr_database_name
+
+    def read() -> None:
+        seen['default'] = db._curr_database_name
+
+    for target in (switch, read):
+        thread = threading.Thread(target=target)
+        thread.start()
+        thread.join()
+
+    # Another thread switching changes neither the creating thread nor the default
+    assert seen == {'switched': "b", 'default': "a"}
+    assert db._curr_database_name == "a"
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_child_opens_its_own_connection(root_dir):
+    parent_entry = ConnectionRegistry.acquire(root_dir, "a")
+    ConnectionRegistry.release(parent_entry)
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if (pid == 0):
+        try:
+            child_entry = ConnectionRegistry.acquire(root_dir, "a")
+            ConnectionRegistry.release(child_entry)
+            os.write(write_fd, b"1" if child_entry is not parent_entry else b"0")
+
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    try:
+        assert os.read(read_fd, 1) == b"1"
+
+    finally:
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+
+    # The parent keeps using its connection
+    assert not is_closed(parent_entry.connection)
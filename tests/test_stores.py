@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_stores.py
+@Time    :   2026/10/20 11:32:47
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Write-back state store of a spider
+'''
+
+
+import base64
+import pickle
+
+import pytest
+
+from database import SQLite
+from database.common import RetIndices
+from spider.stores import COMPRESS_THRESHOLD, LEGACY_STORES_TABLE, STATES_TABLE, StateStore
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = SQLite(str(tmp_path))
+    db.create_database("spider")
+    db.switch_database("spider")
+
+    yield db
+
+    db.close()
+
+
+@pytest.fixture
+def store(db):
+    store = StateStore(db)
+    store.init_table()
+
+    return store
+
+
+def stored_rows(db: SQLite):
+    return db.execute(f"SELECT name, compressed FROM `{STATES_TABLE}` ORDER BY name")[RetIndices.RESULT]
+
+
+def test_values_wait_for_flush(db, store):
+    store.set("page", {'number': 1})
+
+    assert store.get("page") == {'number': 1}
+    assert stored_rows(db) == []
+
+    assert store.flush() == 1
+    assert store.flush() == 0
+    assert stored_rows(db) == [("page", 0)]
+
+    assert StateStore(db).get("page") == {'number': 1}
+
+
+def test_later_changes_do_not_leak_in(store):
+    value = {'seen': [1]}
+    store.set("state", value)
+    value['seen'].append(2)
+
+    assert store.get("state") == {'seen': [1]}
+
+
+def test_last_write_wins(db, store):
+    store.set("page", 1)
+    store.flush()
+    store.set("page", 2)
+    store.set("page", 3)
+
+    assert store.flush() == 1
+    assert StateStore(db).get("page") == 3
+
+
+def test_big_values_are_compressed(db, store):
+    store.set("big", "x" * COMPRESS_THRESHOLD * 2)
+    store.flush()
+
+    assert stored_rows(db) == [("big", 1)]
+    assert StateStore(db).get("big") == "x" * COMPRESS_THRESHOLD * 2
+
+
+def test_missing_value_is_none(store):
+    assert store.get("missing") is None
+
+
+def test_failed_flush_keeps_values_dirty(db, store, monkeypatch):
+    store.set("a", 1)
+    store.set("b", 2)
+
+    upserts = []
+
+    def failing_upsert(table_name, data, primary_keys):
+        upserts.append(data['name'])
+        if (len(upserts) == 2):
+            raise RuntimeError("disk full")
+
+        return original_upsert(table_name, data, primary_keys)
+
+    original_upsert = db.upsert
+    monkeypatch.setattr(db, "upsert", failing_upsert)
+
+    with pytest.raises(RuntimeError):
+        store.flush()
+
+    # The first upsert was rolled back with the transaction
+    assert stored_rows(db) == []
+
+    monkeypatch.setattr(db, "upsert", original_upsert)
+    assert store.flush() == 2
+    assert stored_rows(db) == [("a", 0), ("b", 0)]
+
+
+def test_legacy_stores_are_migrated(db):
+    db.create_table(LEGACY_STORES_TABLE, [('name', "name"), ('store_data', "data")])
+    db.insert(LEGACY_STORES_TABLE, {
+        'name': "legacy",
+        'store_data': base64.b64encode(pickle.dumps({'page': 7})).decode()
+    })
+
+    store = StateStore(db)
+    store.init_table()
+
+    assert store.get("legacy") == {'page': 7}
+    assert not db.is_table_exists(LEGACY_STORES_TABLE)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+'''
+@File    :   test_watermarks.py
+@Time    :   2026/10/20 11:58:03
+@Author  :   MuliMuri
+@Version :   1.0
+@Desc    :   Watermarks committed atomically with their rows
+'''
+
+
+import uuid
+
+import pytest
+
+from database import IDBCommon, MySQL, SQLite
+from spider.stores import Watermarks, read_watermarks
+
+
+MYSQL_CONFIG = ("localhost", 3306, "root", "password")
+
+
+def flush(db: IDBCommon, watermarks: Watermarks, rows, values, fail: bool = False) -> None:
+    """The flush of a container: the rows and the watermarks in one transaction."""
+    with db.transaction() as transaction:
+        transaction.insert_many("items", ("id", "name"), rows)
+        watermarks.write(transaction, values)
+
+        if (fail):
+            raise RuntimeError("flush interrupted")
+
+    watermarks.mark_committed()
+
+
+def committed(db: IDBCommon):
+    reloaded = Watermarks(db)
+    reloaded.init_table()
+
+    return {source: reloaded.get(source) for source in read_watermarks(db)}
+
+
+def stored_rows(db: IDBCommon):
+    # MySQL returns tuples, SQLite lists
+    return list(db.select("items", "")[1])
+
+
+def prepare(db: IDBCommon) -> Watermarks:
+    db.create_table("items", [("id", 1), ("name", "name")], primary_keys=["id"])
+
+    watermarks = Watermarks(db)
+    watermarks.init_table()
+
+    return watermarks
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    db = SQLite(str(tmp_path))
+    db.create_database("data")
+    db.switch_database("data")
+
+    yield db
+
+    db.close()
+
+
+@pytest.fixture
+def mysql_db():
+    try:
+        db = MySQL(*MYSQL_CONFIG)
+
+    except Exception:
+        pytest.skip("needs a MySQL server")
+
+    database_name = f"tsdap_test_{uuid.uuid4().hex[:8]}"
+    db.create_database(database_name)
+    db.switch_database(database_name)
+
+    yield db
+
+    db.drop_database(database_name)
+    db.close()
+
+
+@pytest.fixture(params=["sqlite", "mysql"])
+def db(request):
+    return request.getfixturevalue(f"{request.param}_db")
+
+
+def test_watermark_commits_with_its_rows(db):
+    watermarks = prepare(db)
+
+    flush(db, watermarks, [(1, "a"), (2, "b")], {'feed': 2})
+
+    assert stored_rows(db) == [(1, "a"), (2, "b")]
+    assert watermarks.get("feed") == 2
+    assert committed(db) == {'feed': 2}
+
+
+def test_failed_flush_rolls_back_rows_and_watermark(db):
+    watermarks = prepare(db)
+    flush(db, watermarks, [(1, "a")], {'feed': 1})
+
+    with pytest.raises(RuntimeError):
+        flush(db, watermarks, [(2, "b")], {'feed': 2}, fail=True)
+
+    assert stored_rows(db) == [(1, "a")]
+    assert committed(db) == {'feed': 1}
+
+
+def test_database_error_aborts_the_flush(db):
+    watermarks = prepare(db)
+    flush(db, watermarks, [(1, "a")], {'feed': 1})
+
+    # The duplicate key fails the batch, it must raise instead of rolling back quietly
+    with pytest.raises(Exception):
+        flush(db, watermarks, [(2, "b"), (1, "again")], {'feed': 2})
+
+    assert stored_rows(db) == [(1, "a")]
+    assert committed(db) == {'feed': 1}
+
+    # The connection is usable again, outside of a transaction
+    flush(db, watermarks, [(3, "c")], {'feed': 3})
+    assert committed(db) == {'feed': 3}
+
+
+def test_in_flight_watermark_is_visible(sqlite_db):
+    watermarks = prepare(sqlite_db)
+
+    with sqlite_db.transaction() as transaction:
+        watermarks.write(transaction, {'feed': 5})
+        assert watermarks.get("feed") == 5
+
+    watermarks.mark_committed()
+    assert watermarks.get("feed") == 5
+
+
+def test_mysql_error_outside_of_a_transaction_is_returned(mysql_db):
+    prepare(mysql_db)
+    mysql_db.insert("items", {'id': 1, 'name': "a"})
+
+    assert not mysql_db.insert_many("items", ("id", "name"), [(1, "again")])
+    assert stored_rows(mysql_db) == [(1, "a")]